@@ -1,25 +1,29 @@
 import os
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from typing import Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Body, Depends, Query, Response
 from bson import ObjectId
 from dotenv import load_dotenv
 
-from app.core.database import user_collection
+from app.core.dashboard_stats import GLOBAL_SCOPE, get_summary, rebuild_dashboard_stats, record_user_changes
+from app.core.database import for_listings, user_collection
+from app.core.mailer import enqueue_email
+from app.core.model_registry import MODEL_DIR, model_registry
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, fetch_page
+from app.core.storage import blob_store
+from app.core.tokens import require_roles, revocation_list
 
 load_dotenv()
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(require_roles("admin"))])
 
-# --- HELPER FUNCTION: SEND EMAILS ---
-def send_status_email(to_email: str, doctor_name: str, status: str):
-    sender_email = os.getenv("MAIL_USERNAME")
-    sender_password = os.getenv("MAIL_PASSWORD")
-    smtp_server = os.getenv("MAIL_SERVER", "smtp.gmail.com")
-    smtp_port = int(os.getenv("MAIL_PORT", 587))
+ADMIN_USER_FIELDS = {
+    "fullName": 1, "email": 1, "phone": 1, "role": 1,
+    "status": 1, "specialization": 1, "degree_path": 1
+}
 
+# --- HELPER FUNCTION: SEND EMAILS ---
+async def send_status_email(to_email: str, doctor_name: str, status: str):
     if status == "Approved":
         subject = "Doctor Account Approved"
         body = f"""Hello Dr. {doctor_name},
@@ -46,28 +50,40 @@ We sincerely appreciate your time and interest.
 Best Regards,
 Hair Follicle Detection AI Team"""
 
-    msg = MIMEMultipart()
-    msg["From"] = sender_email
-    msg["To"] = to_email
-    msg["Subject"] = subject
-    msg.attach(MIMEText(body, "plain"))
+    # Queued in the mail outbox; the background sender delivers and retries it
+    await enqueue_email(to_email, subject, body)
 
-    try:
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(sender_email, sender_password)
-        server.send_message(msg)
-        server.quit()
-    except Exception as e:
-        print("EMAIL ERROR:", e)
-        raise HTTPException(status_code=500, detail=f"Email sending failed: {str(e)}")
+# --- HELPER FUNCTION: RELEASE UPLOADED FILES ---
+async def release_user_files(user: dict):
+    # The degree and the saved profile picture each hold one blob reference;
+    # `profileImage` itself is never released, it may name someone else's blob
+    for field in ("degree_path", "profileImageRef"):
+        if user.get(field):
+            await blob_store.release(user[field])
 
 
 # --- ROUTES ---
 
 @router.get("/users")
-async def get_all_users():
-    users = await user_collection.find().to_list(1000)
+async def get_all_users(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    role: Optional[str] = None,
+    status: Optional[str] = None
+):
+    query = {}
+    if role:
+        query["role"] = role
+    if status:
+        query["status"] = status
+
+    # The body stays a plain list for existing clients; the cursor for the
+    # next page travels in a header (the admin dashboard's "Load More")
+    users, next_cursor = await fetch_page(for_listings(user_collection), query, ADMIN_USER_FIELDS, limit, after)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
     return [
         {
             "id": str(user["_id"]),
@@ -82,6 +98,16 @@ async def get_all_users():
         for user in users
     ]
 
+@router.get("/summary")
+async def get_admin_summary(days: int = Query(30, ge=1, le=366)):
+    # Served from the precomputed counters instead of listing every user
+    return await get_summary(GLOBAL_SCOPE, days)
+
+@router.post("/summary/rebuild")
+async def rebuild_summary():
+    await rebuild_dashboard_stats()
+    return {"status": "success", "message": "Dashboard statistics rebuilt"}
+
 @router.put("/verify-doctor/{user_id}")
 async def verify_doctor(user_id: str, data: dict):
     status = data.get("status")
@@ -95,24 +121,49 @@ async def verify_doctor(user_id: str, data: dict):
         raise HTTPException(status_code=404, detail="Doctor not found")
 
     # Call our clean helper function to handle the email
-    send_status_email(doctor.get("email"), doctor.get("fullName"), status)
+    await send_status_email(doctor.get("email"), doctor.get("fullName"), status)
 
     if status == "Approved":
         await user_collection.update_one(
             {"_id": ObjectId(user_id)},
             {"$set": {"status": "Approved"}}
         )
+        await record_user_changes([(doctor, {**doctor, "status": "Approved"})])
     elif status == "Rejected":
         await user_collection.delete_one({"_id": ObjectId(user_id)})
+        await record_user_changes([(doctor, None)])
+        await revocation_list.revoke_user(user_id)
+        await release_user_files(doctor)
 
     return {"status": "success", "message": f"Doctor {status.lower()} successfully"}
 
 @router.delete("/delete-user/{user_id}")
 async def delete_user(user_id: str):
-    result = await user_collection.delete_one({"_id": ObjectId(user_id)})
+    user = await user_collection.find_one_and_delete({"_id": ObjectId(user_id)})
     
     # Edge case handled: Let the user know if the ID didn't match anyone
-    if result.deleted_count == 0:
+    if user is None:
         raise HTTPException(status_code=404, detail="User not found")
+    await record_user_changes([(user, None)])
+    await revocation_list.revoke_user(user_id)
+    await release_user_files(user)
         
-    return {"status": "success", "message": "User deleted"}
\ No newline at end of file
+    return {"status": "success", "message": "User deleted"}
+
+@router.post("/model/reload")
+async def reload_model(data: dict = Body(default={})):
+    # Loads and warms up the new file before swapping, so requests keep being
+    # served by the current model until the new one is ready. Only files in
+    # the model directory can be loaded. Applies to this process only, or with
+    # INFERENCE_MODE=remote to the inference service every worker shares.
+    file_name = data.get("file")
+    path = os.path.join(MODEL_DIR, os.path.basename(file_name)) if file_name else None
+
+    try:
+        version = await model_registry.load(path)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model reload failed: {e}")
+
+    return {"status": "success", "message": f"Model version {version} is now serving", "model": model_registry.status()}
\ No newline at end of file
@@ -1,16 +1,18 @@
-import os
 import re
-import shutil
 import secrets
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 
-from fastapi import APIRouter, HTTPException, Body, UploadFile, File, Form
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Body, Depends, UploadFile, File, Form
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
+from app.core.dashboard_stats import record_user_changes
 from app.core.database import user_collection
+from app.core.mailer import enqueue_email, mail_configured
+from app.core.security import authenticate, password_hasher
+from app.core.tokens import current_user, issue_access_token, revocation_list
+from app.core.uploads import DEGREE_UPLOAD, save_upload
+from app.core.users import name_taken, normalize_name
 
 load_dotenv()
 router = APIRouter()
@@ -34,33 +36,23 @@ class PatientSignupSchema(BaseModel):
     password: str
 
 # --- HELPER FUNCTION: SEND RESET EMAIL ---
-def send_reset_email(to_email: str, reset_token: str):
-    sender_email = os.getenv("MAIL_USERNAME")
-    sender_password = os.getenv("MAIL_PASSWORD")
-    smtp_server = os.getenv("MAIL_SERVER", "smtp.gmail.com")
-    smtp_port = int(os.getenv("MAIL_PORT", 587))
-
-    if not sender_email or not sender_password:
-        raise HTTPException(status_code=500, detail="Server email configuration is missing or invalid.")
-
+async def send_reset_email(to_email: str, reset_token: str):
     reset_link = f"http://localhost:5173/reset-password/{reset_token}"
-    msg = MIMEMultipart()
-    msg['From'] = sender_email
-    msg['To'] = to_email
-    msg['Subject'] = "HFD AI Portal - Password Reset"
-    
     body = f"Hello,\n\nYou requested a password reset. Click the link below to securely set a new password:\n\n{reset_link}\n\nIf you did not request this, please ignore this email."
-    msg.attach(MIMEText(body, 'plain'))
-
-    try:
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(sender_email, sender_password)
-        server.send_message(msg)
-        server.quit()
-    except Exception as e:
-        print(f"Email Error: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to send email: {str(e)}")
+    # Queued in the mail outbox; the background sender delivers and retries it
+    await enqueue_email(to_email, "HFD AI Portal - Password Reset", body)
+
+# --- HELPER FUNCTION: ISSUE SESSION ---
+def session_response(user: dict):
+    access_token, claims = issue_access_token(user)
+    return {
+        "status": "success", 
+        "role": user.get("role"),
+        "fullName": user.get("fullName"),
+        "accessToken": access_token,
+        "tokenType": "bearer",
+        "expiresAt": claims["exp"]
+    }
 
 # --- ROUTES ---
 
@@ -71,16 +63,21 @@ async def signup_patient(data: PatientSignupSchema):
     existing_user = await user_collection.find_one({"email": data.email})
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
+    # Scans and dashboards are addressed by name, so names are unique per role
+    if await name_taken(data.fullName, "patient"):
+        raise HTTPException(status_code=400, detail="A patient with this name is already registered")
     
     patient_dict = {
         "fullName": data.fullName, 
+        "nameKey": normalize_name(data.fullName),
         "email": data.email, 
         "phone": data.phone,
-        "password": data.password, 
+        "password": await password_hasher.hash(data.password), 
         "role": "patient", 
         "status": "Active"
     }
     await user_collection.insert_one(patient_dict)
+    await record_user_changes([(None, patient_dict)])
     return {"status": "success", "message": "Patient registered successfully"}
 
 @router.post("/signup/doctor")
@@ -97,43 +94,55 @@ async def signup_doctor(
     existing_user = await user_collection.find_one({"email": email})
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
+    if await name_taken(fullName, "doctor"):
+        raise HTTPException(status_code=400, detail="A doctor with this name is already registered")
     
-    upload_dir = "static/uploads/degrees"
-    os.makedirs(upload_dir, exist_ok=True)
-    file_name = f"{email.replace('@', '_')}_{degree.filename}"
-    file_path = os.path.join(upload_dir, file_name)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(degree.file, buffer)
+    upload = await save_upload(degree, **DEGREE_UPLOAD)
     
     doctor_dict = {
         "fullName": fullName, 
+        "nameKey": normalize_name(fullName),
         "email": email, 
         "phone": phone, 
-        "password": password,
+        "password": await password_hasher.hash(password),
         "specialization": specialization, 
-        "degree_path": f"/{file_path}", 
+        "degree_path": upload["url"], 
         "role": "doctor", 
         "status": "Pending" 
     }
     await user_collection.insert_one(doctor_dict)
+    await record_user_changes([(None, doctor_dict)])
     return {"status": "success", "message": "Doctor registered. Awaiting Admin approval."}
 
 @router.post("/login")
 async def login_user(credentials: LoginSchema):
-    user = await user_collection.find_one({"email": credentials.email})
+    # Fresh account lookup + scrypt verify off the event loop; legacy plaintext
+    # passwords are rehashed on the first successful login
+    user = await authenticate(credentials.email, credentials.password)
     
-    if not user or user["password"] != credentials.password:
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     if user.get("role") == "doctor" and user.get("status") == "Pending":
         raise HTTPException(status_code=403, detail="Account pending admin verification.")
     
-    return {
-        "status": "success", 
-        "role": user.get("role"),
-        "fullName": user.get("fullName")
-    }
+    return session_response(user)
+
+@router.post("/refresh")
+async def refresh_session(claims: dict = Depends(current_user)):
+    # Re-reads the account once per token lifetime, so a role or approval
+    # change reaches the claims at the next refresh
+    user = await user_collection.find_one({"_id": ObjectId(claims["sub"])}, {"role": 1, "status": 1, "fullName": 1})
+    if not user:
+        raise HTTPException(status_code=401, detail="Account no longer exists.")
+    if user.get("role") == "doctor" and user.get("status") == "Pending":
+        raise HTTPException(status_code=403, detail="Account pending admin verification.")
+    return session_response(user)
+
+@router.post("/logout")
+async def logout_user(claims: dict = Depends(current_user)):
+    await revocation_list.revoke_token(claims)
+    return {"status": "success", "message": "Logged out."}
 
 @router.post("/forgot-password")
 async def forgot_password(request: dict = Body(...)):
@@ -144,6 +153,9 @@ async def forgot_password(request: dict = Body(...)):
     user = await user_collection.find_one({"email": email})
     if not user:
         raise HTTPException(status_code=404, detail="Email not registered.")
+    # Queuing a message that can never be delivered would still report success
+    if not mail_configured():
+        raise HTTPException(status_code=500, detail="Server email configuration is missing or invalid.")
     
     reset_token = secrets.token_urlsafe(32)
     await user_collection.update_one(
@@ -151,7 +163,7 @@ async def forgot_password(request: dict = Body(...)):
         {"$set": {"reset_token": reset_token}}
     )
     
-    send_reset_email(email, reset_token)
+    await send_reset_email(email, reset_token)
     return {"status": "success", "message": "Reset link sent successfully."}
 
 @router.post("/reset-password/{token}")
@@ -169,8 +181,10 @@ async def reset_password(token: str, data: dict = Body(...)):
     await user_collection.update_one(
         {"_id": user["_id"]},
         {
-            "$set": {"password": new_password},
+            "$set": {"password": await password_hasher.hash(new_password)},
             "$unset": {"reset_token": ""} 
         }
     )
+    # Sessions opened with the old password end here
+    await revocation_list.revoke_user(str(user["_id"]))
     return {"status": "success", "message": "Password updated securely."}
\ No newline at end of file
@@ -1,191 +1,462 @@
+import asyncio
 import os
-import shutil
 import uuid
 from datetime import datetime
+from typing import List, Optional
 
-import numpy as np
-from PIL import Image
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-
-from app.core.database import db
-
-# --- AI MODEL INITIALIZATION ---
-hair_model = None
-try:
-    import tensorflow as tf
-    MODEL_PATH = "ai_model/hair_model.h5"
-    if os.path.exists(MODEL_PATH):
-        hair_model = tf.keras.models.load_model(MODEL_PATH)
-        print("✅ AI Model Loaded Successfully!")
-    else:
-        print(f"⚠️ AI Model file not found at: {MODEL_PATH}")
-except Exception as e:
-    print(f"⚠️ AI Model Loading Error: {e}")
-
-router = APIRouter()
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Query
+from pydantic import BaseModel
+
+from app.core.dashboard_stats import doctor_scope, get_summary, record_scan_changes
+from app.core.config import EXPLAIN_SCANS
+from app.core.database import db, for_listings
+from app.core.derivatives import create_scan_derivatives, load_tensor
+from app.core.explanations import save_heatmap
+from app.core.hashing import hash_file
+from app.core.inference import BatchInferenceEngine, InferenceExecutor, format_prediction
+from app.core.jobs import (
+    JOB_DONE, ScanWorkerPool, claim_scan, claim_scans, finish_scans,
+    pending_scan_ids, requeue_scan, run_scan_job, get_job_status
+)
+from app.core.metrics import span
+from app.core.model_registry import model_registry, remote_engine
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, fetch_page
+from app.core.prediction_cache import PredictionCache
+from app.core.progression import TREND_UNITS, history_scope, record_stage_points, stage_changes, stage_trend
+from app.core.tokens import current_user, owner_filter, owner_id, owns_scan, require_roles, require_same_user, require_scan_access
+from app.core.preprocessing import load_model_input
+from app.core.storage import blob_store, key_from_url
+from app.core.uploads import SCAN_UPLOAD, PROFILE_UPLOAD, save_upload
+from app.core.users import normalize_name, resolve_user_id
+
+# Decode and predict run on a bounded thread pool, never on the event loop,
+# and concurrent scans share one batched forward pass instead of one predict() each.
+# In remote mode decoding stays here and the batches run in the inference service
+inference_executor = InferenceExecutor()
+if remote_engine is not None:
+    inference_engine = remote_engine
+else:
+    inference_engine = BatchInferenceEngine(model_registry.predict, inference_executor, explain_fn=model_registry.predict_with_heatmaps)
+prediction_cache = PredictionCache()
+
+# Every route needs a session token. Profiles and the doctor directory are
+# shared with patients; everything else is for (approved) doctors and admins
+doctor_access = require_roles("doctor", "admin")
+
+router = APIRouter(dependencies=[Depends(current_user)])
 scan_collection = db["scans"]
+# Dashboard listings may be served by a secondary
+scan_listing = for_listings(scan_collection)
+
+MAX_BULK_SCANS = 500
+# Uploaded but not yet saved profile pictures remembered per account
+MAX_PENDING_PROFILE_IMAGES = 5
+
+DOCTOR_SCAN_FIELDS = {
+    "patientName": 1, "imagePath": 1, "thumbnailPath": 1, "status": 1,
+    "date": 1, "baldnessStage": 1, "confidence": 1, "topStages": 1, "heatmapPath": 1,
+    "doctorId": 1, "isDirectAnalysis": 1
+}
+PROFILE_FIELDS = {
+    "fullName": 1, "speciality": 1, "specialization": 1, "contactNumber": 1,
+    "phone": 1, "profileImage": 1, "weeklySchedule": 1
+}
+
+# --- SCHEMAS ---
+class BulkProcessSchema(BaseModel):
+    scanIds: List[str] = []
+    doctorName: Optional[str] = None
+    allPending: bool = False
 
 # --- HELPER FUNCTIONS ---
-def analyze_image_with_ai(image_path: str):
-    if hair_model is None:
-        raise HTTPException(status_code=503, detail="Pretrained AI model is not available.")
+async def _run_analysis(image_path: str, tensor_path: str = None, image_url: str = None, image_hash: str = None, explain: bool = False):
+    # Scans uploaded with derivatives skip decoding: the model-ready tensor is memory-mapped
+    if tensor_path and os.path.exists(tensor_path):
+        img_array = await inference_executor.run(load_tensor, tensor_path)
+    else:
+        img_array = await inference_executor.run(load_model_input, image_path)
+    with span("predict"):
+        predictions, heatmap, model_version = await inference_engine.predict(img_array, explain)
+    result = format_prediction(predictions, model_version)
+    if heatmap is not None:
+        heatmap_path = await save_heatmap(image_url, image_hash, heatmap, model_version)
+        if heatmap_path:
+            result["heatmapPath"] = heatmap_path
+    return result
+
+async def analyze_image_with_ai(image_path: str, image_hash: str = None, tensor_path: str = None,
+                                image_url: str = None, explain: bool = False):
+    # One model run yields the stage, its confidence, the top-k stages and the
+    # full probability vector; with `explain` (blob-stored images on a model
+    # that supports it) the same pass also yields a Grad-CAM overlay
+    if not model_registry.ready:
+        detail = "AI model is still loading." if model_registry.state == "loading" else "Pretrained AI model is not available."
+        raise HTTPException(status_code=503, detail=detail)
     
     if not os.path.exists(image_path):
         raise HTTPException(status_code=404, detail="Target scan image file missing on server.")
 
     try:
-        img = Image.open(image_path).convert("RGB")
-        img = img.resize((224, 224))
-        
-        img_array = np.array(img) / 255.0
-        img_array = np.expand_dims(img_array, axis=0)
-
-        predictions = hair_model.predict(img_array)
-        class_names = [
-            "Norwood Stage 1", "Norwood Stage 2", "Norwood Stage 3",
-            "Norwood Stage 4", "Norwood Stage 5", "Norwood Stage 6", 
-            "Norwood Stage 7"
-        ]
-        
-        predicted_index = np.argmax(predictions[0])
-        if predicted_index < len(class_names):
-            return class_names[predicted_index]
-        return "Analysis Complete"
-
+        # Identical image bytes under the same model never hit the model twice
+        if image_hash is None:
+            image_hash = await inference_executor.run(hash_file, image_path)
+        explain = explain and model_registry.supports_heatmaps and key_from_url(image_url) is not None
+        return await prediction_cache.get_or_compute(
+            image_hash, model_registry.version,
+            lambda: inference_executor.submit(_run_analysis, image_path, tensor_path, image_url, image_hash, explain),
+            explain=explain
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Prediction Error: {e}")
         raise HTTPException(status_code=500, detail="Error during AI processing.")
 
+def scan_result_fields(ai_result: dict) -> dict:
+    # What a scan document keeps of an analysis; a missing heatmap clears the
+    # overlay of an earlier model version
+    return {
+        "baldnessStage": ai_result["baldnessStage"],
+        "confidence": ai_result.get("confidence"),
+        "topStages": ai_result.get("topStages", []),
+        "probabilities": ai_result.get("probabilities", []),
+        "heatmapPath": ai_result.get("heatmapPath"),
+        "modelVersion": ai_result["modelVersion"]
+    }
+
+async def analyze_scan(scan: dict, explain: bool = EXPLAIN_SCANS):
+    local_image_path = await blob_store.local_path(scan["imagePath"])
+    tensor_path = await blob_store.local_path(scan["tensorPath"]) if scan.get("tensorPath") else None
+    ai_result = await analyze_image_with_ai(local_image_path, scan.get("imageHash"), tensor_path, scan["imagePath"], explain)
+    return scan_result_fields(ai_result)
+
+def format_profile(doctor: dict):
+    return {
+        "_id": str(doctor["_id"]),
+        "fullName": doctor.get("fullName", ""),
+        "speciality": doctor.get("speciality", doctor.get("specialization", "")),
+        "contactNumber": doctor.get("contactNumber", doctor.get("phone", "")),
+        "profileImage": doctor.get("profileImage", ""),
+        "weeklySchedule": doctor.get("weeklySchedule", [])
+    }
+
+# Background workers drain Pending scans so uploads never wait for a doctor's click
+scan_workers = ScanWorkerPool(analyze_scan)
+
 # --- ROUTES ---
 
 @router.get("/data/{doctor_name}")
-async def get_doctor_data(doctor_name: str):
-    scans_cursor = scan_collection.find({"doctorName": doctor_name})
-    all_scans = await scans_cursor.to_list(length=500)
-
-    pending_scans = []
-    completed_reports = []
+async def get_doctor_data(
+    doctor_name: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    scansAfter: Optional[str] = None,
+    reportsAfter: Optional[str] = None,
+    claims: dict = Depends(doctor_access)
+):
+    require_same_user(claims, doctor_name)
+    owned = {"doctorName": doctor_name, **owner_filter(claims, "doctorId")}
+    # Pending and Processed are paged independently, each filtered by Mongo
+    (pending, next_scans), (processed, next_reports) = await asyncio.gather(
+        fetch_page(scan_listing, {**owned, "status": "Pending"}, DOCTOR_SCAN_FIELDS, limit, scansAfter),
+        fetch_page(scan_listing, {**owned, "status": "Processed"}, DOCTOR_SCAN_FIELDS, limit, reportsAfter)
+    )
 
-    for scan in all_scans:
-        scan_data = {
+    def format_scan(scan):
+        return {
             "id": str(scan["_id"]),
             "patientName": scan.get("patientName"),
             "imagePath": scan.get("imagePath"),
+            "thumbnailPath": scan.get("thumbnailPath") or scan.get("imagePath"),
             "status": scan.get("status"),
             "date": scan.get("date"),
             "baldnessStage": scan.get("baldnessStage", ""),
+            "confidence": scan.get("confidence"),
+            "topStages": scan.get("topStages", []),
+            "heatmapPath": scan.get("heatmapPath"),
             "doctorId": scan.get("doctorId"),
             "isDirectAnalysis": scan.get("isDirectAnalysis", False)
         }
-        if scan.get("status") == "Pending":
-            pending_scans.append(scan_data)
-        elif scan.get("status") == "Processed":
-            completed_reports.append(scan_data)
 
-    return {"scans": pending_scans, "reports": completed_reports}
+    return {
+        "scans": [format_scan(scan) for scan in pending],
+        "reports": [format_scan(scan) for scan in processed],
+        "nextScansCursor": next_scans,
+        "nextReportsCursor": next_reports
+    }
+
+@router.get("/summary/{doctor_name}")
+async def get_doctor_summary(doctor_name: str, days: int = Query(30, ge=1, le=366), claims: dict = Depends(doctor_access)):
+    require_same_user(claims, doctor_name)
+    # Served from the precomputed counters: a fixed number of reads however
+    # many scans the doctor has. Counters are kept per account, so a doctor
+    # only ever sees their own, whatever name they share
+    doctor_id = await owner_id(claims, doctor_name, "doctor")
+    if not doctor_id:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    summary = await get_summary(doctor_scope(doctor_id), days)
+    return {
+        "scans": summary["scans"],
+        "byStatus": summary["byStatus"],
+        "byStage": summary["byStage"],
+        "direct": summary["direct"],
+        "daily": summary["daily"]
+    }
+
+@router.get("/progression/{doctor_name}/trend")
+async def get_panel_trend(
+    doctor_name: str,
+    unit: str = Query("month", pattern=f"^({'|'.join(TREND_UNITS)})$"),
+    days: int = Query(365, ge=1, le=3660),
+    patientName: Optional[str] = None,
+    claims: dict = Depends(doctor_access)
+):
+    require_same_user(claims, doctor_name)
+    # The whole panel, or one of its patients with patientName
+    scope = {**history_scope(patientName, doctor_name), **owner_filter(claims, "meta.doctorId")}
+    return {"unit": unit, "points": await stage_trend(scope, unit, days)}
+
+@router.get("/progression/{doctor_name}/events")
+async def get_panel_stage_changes(
+    doctor_name: str,
+    days: int = Query(365, ge=1, le=3660),
+    minConfidence: float = Query(0, ge=0, le=1),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    patientName: Optional[str] = None,
+    claims: dict = Depends(doctor_access)
+):
+    require_same_user(claims, doctor_name)
+    scope = {**history_scope(patientName, doctor_name), **owner_filter(claims, "meta.doctorId")}
+    return {"events": await stage_changes(scope, days, minConfidence, limit)}
 
 @router.put("/process-scan/{scan_id}")
-async def process_scan(scan_id: str):
-    scan = await scan_collection.find_one({"_id": ObjectId(scan_id)})
-    if not scan:
+async def process_scan(scan_id: str, wait: bool = True, explain: Optional[bool] = None, claims: dict = Depends(doctor_access)):
+    if not ObjectId.is_valid(scan_id):
+        raise HTTPException(status_code=400, detail="Invalid Scan ID format.")
+    owner = await scan_collection.find_one({"_id": ObjectId(scan_id)}, {"doctorId": 1})
+    if not owner:
         raise HTTPException(status_code=404, detail="Scan not found.")
+    require_scan_access(claims, owner)
 
-    local_image_path = scan["imagePath"].lstrip("/")
-    ai_result = analyze_image_with_ai(local_image_path)
+    # wait=false hands the scan to the background workers and returns at once
+    if not wait:
+        if not await requeue_scan(ObjectId(scan_id)):
+            raise HTTPException(status_code=409, detail="Scan is already being processed.")
+        return {"status": "queued", "message": "Scan queued for processing"}
 
-    await scan_collection.update_one(
-        {"_id": ObjectId(scan_id)},
-        {"$set": {"status": "Processed", "baldnessStage": ai_result}}
-    )
-    return {"status": "success", "message": "Scan processed successfully"}
+    scan = await claim_scan(f"request:{uuid.uuid4()}", scan_id=ObjectId(scan_id))
+    if not scan:
+        raise HTTPException(status_code=409, detail="Scan is already being processed.")
+
+    # explain overrides EXPLAIN_SCANS for this scan
+    explain = EXPLAIN_SCANS if explain is None else explain
+    result = await run_scan_job(scan, lambda scan: analyze_scan(scan, explain))
+    return {
+        "status": "success",
+        "message": "Scan processed successfully",
+        "baldnessStage": result["baldnessStage"],
+        "confidence": result["confidence"],
+        "topStages": result["topStages"],
+        "heatmapPath": result["heatmapPath"]
+    }
+
+@router.post("/process-scans")
+async def process_scans(data: BulkProcessSchema, claims: dict = Depends(doctor_access)):
+    # Claims every requested scan with one update_many, analyses them
+    # concurrently so the inference engine packs them into full batches, and
+    # writes all outcomes back with a single bulk_write
+    if data.allPending:
+        if not data.doctorName:
+            raise HTTPException(status_code=400, detail="doctorName is required with allPending.")
+        require_same_user(claims, data.doctorName)
+        scan_ids = await pending_scan_ids(data.doctorName, MAX_BULK_SCANS, owner_filter(claims, "doctorId"))
+        invalid_ids = []
+        forbidden_ids = []
+    else:
+        if not data.scanIds:
+            raise HTTPException(status_code=400, detail="Provide scanIds or doctorName with allPending.")
+        if len(data.scanIds) > MAX_BULK_SCANS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_SCANS} scans per request.")
+        scan_ids = [ObjectId(scan_id) for scan_id in dict.fromkeys(data.scanIds) if ObjectId.is_valid(scan_id)]
+        invalid_ids = [scan_id for scan_id in data.scanIds if not ObjectId.is_valid(scan_id)]
+        # Other doctors' scans are reported, never claimed
+        owners = await scan_collection.find({"_id": {"$in": scan_ids}}, {"doctorId": 1}).to_list(length=None)
+        forbidden_ids = [scan["_id"] for scan in owners if not owns_scan(claims, scan)]
+        scan_ids = [scan_id for scan_id in scan_ids if scan_id not in forbidden_ids]
+
+    batch_id = f"bulk:{uuid.uuid4()}"
+    claimed = await claim_scans(batch_id, scan_ids) if scan_ids else []
+
+    # Keep enough analyses in flight to fill the engine's batches without
+    # tripping the executor's backpressure for other users
+    limiter = asyncio.Semaphore(inference_engine.max_batch_size * 2)
+
+    async def analyze(scan):
+        async with limiter:
+            try:
+                return await analyze_scan(scan)
+            except Exception as e:
+                return e
+
+    outcomes = await asyncio.gather(*(analyze(scan) for scan in claimed))
+    await finish_scans(list(zip(claimed, outcomes)))
+
+    results = [{"id": scan_id, "status": "error", "detail": "Invalid Scan ID format."} for scan_id in invalid_ids]
+    results += [{"id": str(scan_id), "status": "error", "detail": "You do not have access to this scan."} for scan_id in forbidden_ids]
+    for scan, outcome in zip(claimed, outcomes):
+        if isinstance(outcome, Exception):
+            results.append({"id": str(scan["_id"]), "status": "error", "detail": getattr(outcome, "detail", None) or str(outcome)})
+        else:
+            results.append({
+                "id": str(scan["_id"]), "status": "success",
+                "baldnessStage": outcome["baldnessStage"], "confidence": outcome["confidence"]
+            })
+
+    claimed_ids = {scan["_id"] for scan in claimed}
+    unclaimed = [scan_id for scan_id in scan_ids if scan_id not in claimed_ids]
+    if unclaimed:
+        existing = await scan_collection.find({"_id": {"$in": unclaimed}}, {"_id": 1}).to_list(length=None)
+        existing_ids = {scan["_id"] for scan in existing}
+        for scan_id in unclaimed:
+            detail = "Scan is already being processed." if scan_id in existing_ids else "Scan not found."
+            results.append({"id": str(scan_id), "status": "error", "detail": detail})
+
+    processed = sum(result["status"] == "success" for result in results)
+    return {
+        "status": "success",
+        "processed": processed,
+        "failed": len(results) - processed,
+        "results": results
+    }
+
+@router.get("/job-status/{scan_id}")
+async def job_status(scan_id: str, claims: dict = Depends(doctor_access)):
+    if not ObjectId.is_valid(scan_id):
+        raise HTTPException(status_code=400, detail="Invalid Scan ID format.")
+    return await get_job_status(ObjectId(scan_id), claims)
 
 @router.post("/direct-analysis")
 async def direct_analysis(
     doctorName: str = Form(...),
     patientName: str = Form(...),
-    image: UploadFile = File(...)
+    image: UploadFile = File(...),
+    claims: dict = Depends(doctor_access)
 ):
-    upload_dir = "static/uploads/scans"
-    os.makedirs(upload_dir, exist_ok=True)
-
-    unique_filename = f"{uuid.uuid4()}_{image.filename}"
-    local_path = os.path.join(upload_dir, unique_filename)
-
-    with open(local_path, "wb") as buffer:
-        shutil.copyfileobj(image.file, buffer)
-
-    ai_result = analyze_image_with_ai(local_path)
-
+    require_same_user(claims, doctorName)
+    upload = await save_upload(image, **SCAN_UPLOAD)
+    derivatives = await create_scan_derivatives(upload)
+    # No scan references the upload until it is inserted, so a failed analysis
+    # (backpressure, timeout, model error) hands the reference back, as
+    # create_scan_derivatives does for an undecodable image
+    try:
+        ai_result = await analyze_image_with_ai(
+            upload["path"], upload["hash"], await blob_store.local_path(derivatives["tensorPath"]), upload["url"], EXPLAIN_SCANS
+        )
+        result = scan_result_fields(ai_result)
+    except Exception:
+        await blob_store.release(upload["url"])
+        raise
+
+    # The patient is typed in by the doctor; the scan is linked to their
+    # account only when exactly one patient has that name
     scan_doc = {
         "patientName": patientName,
-        "doctorId": "Direct",
+        "patientId": await resolve_user_id(patientName, "patient"),
+        "doctorId": await owner_id(claims, doctorName, "doctor"),
         "doctorName": doctorName,
-        "imagePath": f"/{upload_dir}/{unique_filename}",
+        "imagePath": upload["url"],
+        "imageHash": upload["hash"],
+        **derivatives,
         "status": "Processed",
-        "baldnessStage": ai_result,
+        **result,
         "isDirectAnalysis": True,
+        "jobState": JOB_DONE,
         "date": datetime.utcnow().isoformat()
     }
     await scan_collection.insert_one(scan_doc)
-    return {"status": "success"}
+    await record_scan_changes([(None, scan_doc)])
+    await record_stage_points([scan_doc])
+    return {"status": "success", **{field: result[field] for field in ("baldnessStage", "confidence", "topStages", "heatmapPath")}}
+
+@router.get("/profile/id/{doctor_id}")
+async def get_profile_by_id(doctor_id: str):
+    if not ObjectId.is_valid(doctor_id):
+        raise HTTPException(status_code=400, detail="Invalid Doctor ID format.")
+
+    doctor = await db["users"].find_one({"_id": ObjectId(doctor_id), "role": "doctor"}, PROFILE_FIELDS)
+    if not doctor:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    return format_profile(doctor)
 
 @router.get("/profile/{doctor_name}")
 async def get_profile(doctor_name: str):
-    doctor = await db["users"].find_one({
-        "fullName": {"$regex": f"^{doctor_name.strip()}$", "$options": "i"}
-    })
+    doctor = await db["users"].find_one({"nameKey": normalize_name(doctor_name), "role": "doctor"}, PROFILE_FIELDS)
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found")
-
-    return {
-        "_id": str(doctor["_id"]),
-        "fullName": doctor.get("fullName", ""),
-        "speciality": doctor.get("speciality", doctor.get("specialization", "")),
-        "contactNumber": doctor.get("contactNumber", doctor.get("phone", "")),
-        "profileImage": doctor.get("profileImage", ""),
-        "weeklySchedule": doctor.get("weeklySchedule", [])
-    }
+    return format_profile(doctor)
 
 @router.post("/upload-profile-image")
-async def upload_profile_image(file: UploadFile = File(...)):
-    upload_dir = "static/uploads/profile"
-    os.makedirs(upload_dir, exist_ok=True)
-
-    unique_filename = f"{uuid.uuid4()}_{file.filename}"
-    file_path = os.path.join(upload_dir, unique_filename)
-
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    return {"imagePath": f"/static/uploads/profile/{unique_filename}"}
+async def upload_profile_image(file: UploadFile = File(...), claims: dict = Depends(doctor_access)):
+    # The picture only holds a reference once update-profile saves it; until
+    # then the uploader may claim it, and an unclaimed one is collected
+    upload = await save_upload(file, **PROFILE_UPLOAD)
+    await db["users"].update_one(
+        {"_id": ObjectId(claims["sub"])},
+        {"$push": {"pendingProfileImages": {"$each": [upload["url"]], "$slice": -MAX_PENDING_PROFILE_IMAGES}}}
+    )
+    await blob_store.release(upload["url"])
+    return {"imagePath": upload["url"]}
+
+async def claim_profile_image(claims: dict, url: str):
+    # Only a picture this account uploaded can be saved, and saving it takes
+    # the reference the profile then holds
+    claimed = await db["users"].update_one(
+        {"_id": ObjectId(claims["sub"]), "pendingProfileImages": url},
+        {"$pull": {"pendingProfileImages": url}}
+    )
+    if not claimed.modified_count:
+        raise HTTPException(status_code=400, detail="Upload the profile picture before saving it.")
+    if not await blob_store.retain(url):
+        raise HTTPException(status_code=400, detail="The uploaded profile picture has expired. Please upload it again.")
 
 @router.put("/update-profile")
-async def update_profile(data: dict):
+async def update_profile(data: dict, claims: dict = Depends(doctor_access)):
     doctor_name = data.get("doctorName", "").strip()
     if not doctor_name:
         raise HTTPException(status_code=400, detail="Doctor name is required")
+    require_same_user(claims, doctor_name)
 
-    doctor = await db["users"].find_one({
-        "fullName": {"$regex": f"^{doctor_name}$", "$options": "i"},
-        "role": "doctor"
-    })
+    doctor = await db["users"].find_one(
+        {"nameKey": normalize_name(doctor_name), "role": "doctor"}, {"profileImage": 1, "profileImageRef": 1}
+    )
     if not doctor:
         raise HTTPException(status_code=404, detail=f"Doctor '{doctor_name}' not found in database")
 
     update_data = {
         "specialization": data.get("speciality", ""),
         "phone": data.get("contactNumber", ""),
-        "weeklySchedule": data.get("weeklySchedule", []),
-        "profileImage": data.get("profileImage", "")
+        "weeklySchedule": data.get("weeklySchedule", [])
     }
+    profile_image = data.get("profileImage") or ""
+    changed = profile_image != doctor.get("profileImage", "")
+    if changed:
+        if profile_image:
+            await claim_profile_image(claims, profile_image)
+        # `profileImageRef` is the picture the account holds a reference to
+        update_data["profileImage"] = update_data["profileImageRef"] = profile_image
 
     await db["users"].update_one({"_id": doctor["_id"]}, {"$set": update_data})
+    # The replaced picture's reference goes with it
+    if changed and doctor.get("profileImageRef"):
+        await blob_store.release(doctor["profileImageRef"])
     return {"status": "success", "message": "Doctor profile updated successfully"}
 
 @router.get("/all-doctors")
 async def get_all_doctors():
-    doctors_cursor = db["users"].find({"role": "doctor"})
+    doctors_cursor = db["users"].find(
+        {"role": "doctor"},
+        {"fullName": 1, "specialization": 1, "phone": 1, "profileImage": 1, "weeklySchedule": 1}
+    )
     doctors = await doctors_cursor.to_list(length=100)
 
     return [
@@ -0,0 +1,18 @@
+import mimetypes
+
+from fastapi import APIRouter, HTTPException
+
+from app.core.storage import PUBLIC_KEY_PATTERN, blob_store
+
+router = APIRouter()
+
+# --- ROUTES ---
+
+@router.get("/{key:path}")
+async def get_media(key: str):
+    # Keys are content hashes, so responses are cacheable forever. The bytes
+    # are sent by the proxy (X-Accel-Redirect), by sendfile, or by the bucket
+    # (presigned redirect), depending on the storage backend.
+    if not PUBLIC_KEY_PATTERN.match(key):
+        raise HTTPException(status_code=404, detail="File not found.")
+    return blob_store.backend.response(key, mimetypes.guess_type(key)[0])
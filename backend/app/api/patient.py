@@ -1,22 +1,41 @@
-import os
-import shutil
-import uuid
 from datetime import datetime
+from typing import Optional
 
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Query
 
-from app.core.database import user_collection, db
+from app.core.dashboard_stats import record_scan_changes
+from app.core.database import user_collection, db, for_listings
+from app.core.derivatives import create_scan_derivatives
+from app.core.jobs import NEW_JOB_FIELDS, get_job_status
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, fetch_page
+from app.core.progression import TREND_UNITS, history_scope, stage_changes, stage_trend
+from app.core.tokens import owner_filter, owner_id, require_roles, require_same_user
+from app.core.uploads import SCAN_UPLOAD, save_upload
 
-router = APIRouter()
+# Every route needs a patient (or admin) session token; checking it costs no
+# database round trip
+patient_access = require_roles("patient", "admin")
+
+router = APIRouter(dependencies=[Depends(patient_access)])
 scan_collection = db["scans"]
+# Dashboard listings may be served by a secondary
+scan_listing = for_listings(scan_collection)
+
+PATIENT_SCAN_FIELDS = {
+    "patientName": 1, "doctorName": 1, "imagePath": 1, "thumbnailPath": 1,
+    "status": 1, "date": 1, "baldnessStage": 1
+}
 
 # --- ROUTES ---
 
 @router.get("/doctors")
 async def get_verified_doctors():
     # Enhanced: Aligned status with admin.py ("Approved" instead of "Verified")
-    doctors_cursor = user_collection.find({"role": "doctor", "status": "Approved"})
+    doctors_cursor = user_collection.find(
+        {"role": "doctor", "status": "Approved"},
+        {"fullName": 1, "specialization": 1}
+    )
     doctors = await doctors_cursor.to_list(length=100)
     return [
         {
@@ -27,9 +46,15 @@ async def get_verified_doctors():
     ]
 
 @router.get("/data/{username}")
-async def get_patient_data(username: str):
-    scans_cursor = scan_collection.find({"patientName": username})
-    scans = await scans_cursor.to_list(length=100)
+async def get_patient_data(
+    username: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    claims: dict = Depends(patient_access)
+):
+    require_same_user(claims, username)
+    query = {"patientName": username, **owner_filter(claims, "patientId")}
+    scans, next_cursor = await fetch_page(scan_listing, query, PATIENT_SCAN_FIELDS, limit, after)
     
     formatted_scans = []
     formatted_reports = []
@@ -40,6 +65,7 @@ async def get_patient_data(username: str):
             "patientName": scan.get("patientName"),
             "doctorName": scan.get("doctorName"),
             "imagePath": scan.get("imagePath"),
+            "thumbnailPath": scan.get("thumbnailPath") or scan.get("imagePath"),
             "status": scan.get("status"),
             "date": scan.get("date")
         }
@@ -54,14 +80,40 @@ async def get_patient_data(username: str):
                 "date": scan.get("date")
             })
             
-    return {"scans": formatted_scans, "reports": formatted_reports}
+    return {"scans": formatted_scans, "reports": formatted_reports, "nextCursor": next_cursor}
+
+@router.get("/progression/{username}/trend")
+async def get_stage_trend(
+    username: str,
+    unit: str = Query("month", pattern=f"^({'|'.join(TREND_UNITS)})$"),
+    days: int = Query(365, ge=1, le=3660),
+    claims: dict = Depends(patient_access)
+):
+    require_same_user(claims, username)
+    scope = {**history_scope(patient_name=username), **owner_filter(claims, "meta.patientId")}
+    return {"unit": unit, "points": await stage_trend(scope, unit, days)}
+
+@router.get("/progression/{username}/events")
+async def get_stage_changes(
+    username: str,
+    days: int = Query(365, ge=1, le=3660),
+    minConfidence: float = Query(0, ge=0, le=1),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    claims: dict = Depends(patient_access)
+):
+    require_same_user(claims, username)
+    scope = {**history_scope(patient_name=username), **owner_filter(claims, "meta.patientId")}
+    return {"events": await stage_changes(scope, days, minConfidence, limit)}
 
 @router.post("/upload-scan")
 async def upload_scan(
     patientName: str = Form(...),
     doctorId: str = Form(...),
-    image: UploadFile = File(...)
+    image: UploadFile = File(...),
+    claims: dict = Depends(patient_access)
 ):
+    require_same_user(claims, patientName)
+
     # Enhanced: Safeguard against malformed or missing BSON ObjectIds
     if not ObjectId.is_valid(doctorId):
         raise HTTPException(status_code=400, detail="Invalid Doctor ID format.")
@@ -72,24 +124,32 @@ async def upload_scan(
         
     doctor_name = doctor.get("fullName", "Unknown")
 
-    upload_dir = "static/uploads/scans"
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    unique_filename = f"{uuid.uuid4()}_{image.filename}"
-    file_path = f"/{upload_dir}/{unique_filename}"
-    local_path = os.path.join(upload_dir, unique_filename)
-    
-    with open(local_path, "wb") as buffer:
-        shutil.copyfileobj(image.file, buffer)
+    upload = await save_upload(image, **SCAN_UPLOAD)
+    derivatives = await create_scan_derivatives(upload)
         
     scan_doc = {
         "patientName": patientName,
+        "patientId": await owner_id(claims, patientName, "patient"),
         "doctorId": doctorId,
         "doctorName": doctor_name,
-        "imagePath": file_path,
+        "imagePath": upload["url"],
+        "imageHash": upload["hash"],
+        **derivatives,
         "status": "Pending",
+        **NEW_JOB_FIELDS,
         "date": datetime.utcnow().isoformat()
     }
-    await scan_collection.insert_one(scan_doc)
+    result = await scan_collection.insert_one(scan_doc)
+    await record_scan_changes([(None, scan_doc)])
     
-    return {"status": "success", "message": "Scan uploaded and saved to database."}
\ No newline at end of file
+    return {
+        "status": "success",
+        "message": "Scan uploaded and queued for AI analysis.",
+        "scanId": str(result.inserted_id)
+    }
+
+@router.get("/scan-status/{scan_id}")
+async def get_scan_status(scan_id: str, claims: dict = Depends(patient_access)):
+    if not ObjectId.is_valid(scan_id):
+        raise HTTPException(status_code=400, detail="Invalid Scan ID format.")
+    return await get_job_status(ObjectId(scan_id), claims)
\ No newline at end of file
@@ -0,0 +1,133 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- DATABASE ---
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "hair_follicle_db")
+# Per process: a deployment opens up to (uvicorn workers x MONGO_MAX_POOL_SIZE)
+# connections per mongod, so lower this when adding workers
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 20))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 60000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+# 0 waits forever for a reply
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 20000))
+# How long a request waits for a free pooled connection before failing
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000))
+# "majority", or a node count such as "1"
+MONGO_WRITE_CONCERN = os.getenv("MONGO_WRITE_CONCERN", "majority")
+MONGO_WRITE_TIMEOUT_MS = int(os.getenv("MONGO_WRITE_TIMEOUT_MS", 10000))
+# Dashboard listings and summaries may read from secondaries; on a standalone
+# mongod "secondaryPreferred" simply reads from the primary
+MONGO_LISTING_READ_PREFERENCE = os.getenv("MONGO_LISTING_READ_PREFERENCE", "secondaryPreferred")
+# How far behind the primary a secondary may be to serve listings (-1: no limit, else >= 90)
+MONGO_LISTING_MAX_STALENESS_SECONDS = int(os.getenv("MONGO_LISTING_MAX_STALENESS_SECONDS", 90))
+MONGO_PING_TIMEOUT_SECONDS = float(os.getenv("MONGO_PING_TIMEOUT_SECONDS", 2))
+# Indexes and startup migrations are retried this often while MongoDB is unreachable
+MONGO_BOOTSTRAP_RETRY_SECONDS = float(os.getenv("MONGO_BOOTSTRAP_RETRY_SECONDS", 10))
+MONGO_APP_NAME = os.getenv("MONGO_APP_NAME", "hfd-backend")
+
+# --- AI INFERENCE ---
+MODEL_PATH = os.getenv("MODEL_PATH", "ai_model/hair_model.h5")
+# "auto" picks the backend from the model file extension (.h5/.keras, .tflite, .onnx)
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "auto")
+MODEL_NUM_THREADS = int(os.getenv("MODEL_NUM_THREADS", 0)) or None
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", 16))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", 10))
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 2))
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", 64))
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_TIMEOUT_SECONDS", 30))
+# "local": every API process loads the model. "remote": API processes send
+# tensors to one inference service (scripts/serve.py) and never import a runtime
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "local")
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", "/tmp/hfd-inference.sock")
+# Shared-memory tensor slots per API process (~600 KB each), i.e. its in-flight limit
+INFERENCE_SHM_SLOTS = int(os.getenv("INFERENCE_SHM_SLOTS", 32))
+INFERENCE_STATUS_REFRESH_SECONDS = float(os.getenv("INFERENCE_STATUS_REFRESH_SECONDS", 2))
+# Stages (with confidences) reported per scan besides the winning one
+PREDICTION_TOP_K = int(os.getenv("PREDICTION_TOP_K", 3))
+# Grad-CAM overlays for scan analyses (Keras models only; process-scan can override per request)
+EXPLAIN_SCANS = os.getenv("EXPLAIN_SCANS", "true").lower() in ("1", "true", "yes")
+
+# --- SCAN JOB QUEUE ---
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", 2))
+SCAN_LEASE_SECONDS = int(os.getenv("SCAN_LEASE_SECONDS", 120))
+SCAN_MAX_ATTEMPTS = int(os.getenv("SCAN_MAX_ATTEMPTS", 3))
+SCAN_POLL_INTERVAL_SECONDS = float(os.getenv("SCAN_POLL_INTERVAL_SECONDS", 2))
+
+# --- PREDICTION CACHE ---
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", 1024))
+PREDICTION_CACHE_TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", 3600))
+# Stored predictions not read for this long are dropped by a TTL index (those
+# of retired model versions stop being read at all)
+PREDICTION_STORE_TTL_DAYS = int(os.getenv("PREDICTION_STORE_TTL_DAYS", 30))
+
+# --- UPLOADS ---
+# Files uploaded before the blob store existed; still served from /static and
+# moved into the blob store by scripts/migrate_uploads.py
+UPLOAD_ROOT = os.getenv("UPLOAD_ROOT", "static/uploads")
+MAX_SCAN_UPLOAD_MB = float(os.getenv("MAX_SCAN_UPLOAD_MB", 15))
+MAX_DEGREE_UPLOAD_MB = float(os.getenv("MAX_DEGREE_UPLOAD_MB", 10))
+MAX_PROFILE_UPLOAD_MB = float(os.getenv("MAX_PROFILE_UPLOAD_MB", 5))
+
+# --- BLOB STORAGE ---
+# "local" keeps blobs under BLOB_ROOT; "s3" stores them in an S3-compatible
+# bucket (AWS, MinIO, ...) and keeps a local read cache under BLOB_CACHE_DIR
+# for decoding and memory-mapping. Credentials come from the usual AWS_* variables.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+BLOB_ROOT = os.getenv("BLOB_ROOT", "storage/blobs")
+BLOB_CACHE_DIR = os.getenv("BLOB_CACHE_DIR", "storage/cache")
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_PREFIX = os.getenv("S3_PREFIX", "blobs/")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+S3_REGION = os.getenv("S3_REGION") or None
+S3_PRESIGN_SECONDS = int(os.getenv("S3_PRESIGN_SECONDS", 3600))
+# With a reverse proxy in front (e.g. nginx `internal` location aliased to
+# BLOB_ROOT), /media responses hand the file to the proxy via X-Accel-Redirect
+# instead of streaming it from Python
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX", "")
+# Unreferenced blobs are kept this long before garbage collection deletes them
+BLOB_GC_GRACE_SECONDS = int(os.getenv("BLOB_GC_GRACE_SECONDS", 3600))
+
+# --- OUTBOUND EMAIL ---
+MAIL_SERVER = os.getenv("MAIL_SERVER", "smtp.gmail.com")
+MAIL_PORT = int(os.getenv("MAIL_PORT", 587))
+MAIL_USERNAME = os.getenv("MAIL_USERNAME")
+MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")
+MAIL_FROM = os.getenv("MAIL_FROM", MAIL_USERNAME or "no-reply@localhost")
+# Disable for a local SMTP stand-in (e.g. aiosmtpd) that does not speak TLS
+MAIL_STARTTLS = os.getenv("MAIL_STARTTLS", "true").lower() in ("1", "true", "yes")
+MAIL_TIMEOUT_SECONDS = float(os.getenv("MAIL_TIMEOUT_SECONDS", 15))
+MAIL_CONNECTIONS = int(os.getenv("MAIL_CONNECTIONS", 2))
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", 20))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", 6))
+MAIL_RETRY_BASE_SECONDS = float(os.getenv("MAIL_RETRY_BASE_SECONDS", 30))
+MAIL_RETRY_MAX_SECONDS = float(os.getenv("MAIL_RETRY_MAX_SECONDS", 3600))
+# A sender leases its batch for this long. By default that is one SMTP timeout
+# per message plus a margin; a sender running short stops and hands the rest back
+MAIL_LEASE_SECONDS = int(os.getenv("MAIL_LEASE_SECONDS", MAIL_BATCH_SIZE * MAIL_TIMEOUT_SECONDS + 60))
+MAIL_IDLE_SECONDS = float(os.getenv("MAIL_IDLE_SECONDS", 60))
+MAIL_POLL_INTERVAL_SECONDS = float(os.getenv("MAIL_POLL_INTERVAL_SECONDS", 5))
+
+# --- CREDENTIALS ---
+# scrypt cost: N (CPU/memory, power of two), r (block size), p (parallelism).
+# Memory per hash is 128 * N * r bytes (16 MB at the defaults). Stored hashes
+# record their own parameters, so raising these rehashes users on next login.
+PASSWORD_SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", 2 ** 14))
+PASSWORD_SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", 8))
+PASSWORD_SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", 1))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 64))
+
+# --- ACCESS TOKENS ---
+# HMAC-SHA256 key for the bearer tokens issued at login. Set it in production:
+# without it every process signs with its own random key, so tokens stop
+# working across restarts and between workers.
+ACCESS_TOKEN_SECRET = os.getenv("ACCESS_TOKEN_SECRET", "")
+ACCESS_TOKEN_TTL_SECONDS = int(os.getenv("ACCESS_TOKEN_TTL_SECONDS", 3600))
+# How often each process reloads logouts and revoked users from Mongo
+TOKEN_REVOCATION_REFRESH_SECONDS = float(os.getenv("TOKEN_REVOCATION_REFRESH_SECONDS", 15))
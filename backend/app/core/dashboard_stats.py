@@ -0,0 +1,212 @@
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+
+from app.core.database import for_listings, stats_collection, scan_collection, user_collection
+
+# --- MATERIALIZED DASHBOARD COUNTERS ---
+# `dashboard_stats` holds one summary document per scope ("global" and
+# "doctor:<doctorId>") plus one document per scope and day ("doctor:<doctorId>:2024-05-01").
+# Doctor scopes are keyed on the account id: display names are neither unique
+# nor spelled the same on every scan.
+# Every scan or user write that changes a count applies the matching $inc, so
+# a dashboard reads a fixed number of small documents however many scans exist.
+# `rebuild_dashboard_stats` recomputes everything from the raw collections with
+# $merge, for the first deploy and to repair drift after bulk edits.
+GLOBAL_SCOPE = "global"
+# Bumped when the document layout changes, so the next start rebuilds
+STATS_LAYOUT = 2
+
+def doctor_scope(doctor_id) -> str:
+    return f"doctor:{doctor_id or 'Unknown'}"
+
+def _scan_counts(scan: dict, sign: int) -> dict:
+    status = scan.get("status") or "Unknown"
+    counts = {"scans": sign, f"byStatus.{status}": sign}
+    if status == "Processed":
+        counts[f"byStage.{scan.get('baldnessStage') or 'Unknown'}"] = sign
+        if scan.get("isDirectAnalysis"):
+            counts["direct"] = sign
+    return counts
+
+def _user_counts(user: dict, sign: int) -> dict:
+    counts = {"users": sign, f"usersByRole.{user.get('role') or 'Unknown'}": sign}
+    if user.get("role") == "doctor":
+        counts[f"doctorsByStatus.{user.get('status') or 'Unknown'}"] = sign
+    return counts
+
+def _add(target: dict, counts: dict):
+    for field, value in counts.items():
+        target[field] = target.get(field, 0) + value
+
+def _today() -> str:
+    return datetime.utcnow().date().isoformat()
+
+def _scan_day(scan: dict) -> str:
+    # Scan dates are stored as UTC ISO strings
+    return (scan.get("date") or _today())[:10]
+
+async def _apply(increments: dict):
+    # One upserting bulk_write per event; a failure only costs accuracy, which
+    # a rebuild restores, so it never fails the request that triggered it.
+    # Hence the broad except: a driver or store quirk must not fail a signup
+    # or an upload either
+    operations = []
+    for doc_id, counts in increments.items():
+        counts = {field: value for field, value in counts.items() if value}
+        if counts:
+            operations.append(UpdateOne({"_id": doc_id}, {"$inc": counts}, upsert=True))
+    if not operations:
+        return
+    try:
+        await stats_collection.bulk_write(operations, ordered=False)
+    except Exception as e:
+        print(f"⚠️ Dashboard stats update failed: {e}")
+
+# --- INCREMENTAL UPDATES ---
+async def record_scan_changes(changes: list):
+    # `changes` holds (before, after) scan documents; None marks a scan that
+    # did not exist before (insert) or no longer exists after (delete)
+    increments = {}
+    for before, after in changes:
+        scan = after or before
+        scopes = [GLOBAL_SCOPE, doctor_scope(scan.get("doctorId"))]
+        delta = {}
+        if before:
+            _add(delta, _scan_counts(before, -1))
+        if after:
+            _add(delta, _scan_counts(after, 1))
+
+        for scope in scopes:
+            _add(increments.setdefault(scope, {}), delta)
+            if before is None and after:
+                _add(increments.setdefault(f"{scope}:{_scan_day(after)}", {}), {"uploads": 1})
+            if after and after.get("status") == "Processed" and (before or {}).get("status") != "Processed":
+                _add(increments.setdefault(f"{scope}:{_today()}", {}), {"processed": 1})
+    await _apply(increments)
+
+async def record_user_changes(changes: list):
+    increments = {GLOBAL_SCOPE: {}}
+    for before, after in changes:
+        if before:
+            _add(increments[GLOBAL_SCOPE], _user_counts(before, -1))
+        if after:
+            _add(increments[GLOBAL_SCOPE], _user_counts(after, 1))
+    await _apply(increments)
+
+# --- SUMMARIES ---
+async def get_summary(scope: str, days: int) -> dict:
+    today = datetime.utcnow().date()
+    day_keys = [(today - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+
+    # Dashboard reads may be served by a secondary
+    stats = for_listings(stats_collection)
+    summary = await stats.find_one({"_id": scope}) or {}
+    daily_docs = await stats.find({"_id": {"$in": [f"{scope}:{day}" for day in day_keys]}}).to_list(length=days)
+    daily = {doc["_id"].rsplit(":", 1)[1]: doc for doc in daily_docs}
+
+    return {
+        "scans": summary.get("scans", 0),
+        "byStatus": summary.get("byStatus", {}),
+        "byStage": summary.get("byStage", {}),
+        "direct": summary.get("direct", 0),
+        "daily": [
+            {"day": day, "uploads": daily.get(day, {}).get("uploads", 0), "processed": daily.get(day, {}).get("processed", 0)}
+            for day in day_keys
+        ],
+        "users": summary.get("users", 0),
+        "usersByRole": summary.get("usersByRole", {}),
+        "doctorsByStatus": summary.get("doctorsByStatus", {})
+    }
+
+# --- FULL REBUILD ---
+DAILY_ID_PATTERN = r":\d{4}-\d{2}-\d{2}$"
+SCAN_FIELDS = {"scans": "", "byStatus": "", "byStage": "", "direct": ""}
+USER_FIELDS = {"users": "", "usersByRole": "", "doctorsByStatus": ""}
+
+def _merge():
+    return {"$merge": {"into": stats_collection.name, "whenMatched": "merge", "whenNotMatched": "insert"}}
+
+def _status_pipeline(scope_expr) -> list:
+    return [
+        {"$group": {"_id": {"scope": scope_expr, "status": {"$ifNull": ["$status", "Unknown"]}}, "n": {"$sum": 1}}},
+        {"$group": {"_id": "$_id.scope", "scans": {"$sum": "$n"}, "byStatus": {"$push": {"k": "$_id.status", "v": "$n"}}}},
+        {"$project": {"scans": 1, "byStatus": {"$arrayToObject": "$byStatus"}}},
+        _merge()
+    ]
+
+def _stage_pipeline(scope_expr) -> list:
+    return [
+        {"$match": {"status": "Processed"}},
+        {"$group": {
+            "_id": {"scope": scope_expr, "stage": {"$ifNull": ["$baldnessStage", "Unknown"]}},
+            "n": {"$sum": 1},
+            "direct": {"$sum": {"$cond": [{"$eq": ["$isDirectAnalysis", True]}, 1, 0]}}
+        }},
+        {"$group": {"_id": "$_id.scope", "direct": {"$sum": "$direct"}, "byStage": {"$push": {"k": "$_id.stage", "v": "$n"}}}},
+        {"$project": {"direct": 1, "byStage": {"$arrayToObject": "$byStage"}}},
+        _merge()
+    ]
+
+def _daily_pipeline(scope_expr, field: str, match: dict, day_expr) -> list:
+    return [
+        {"$match": match},
+        {"$group": {"_id": {"scope": scope_expr, "day": day_expr}, field: {"$sum": 1}}},
+        {"$project": {"_id": {"$concat": ["$_id.scope", ":", "$_id.day"]}, field: 1}},
+        _merge()
+    ]
+
+def rebuild_pipelines() -> list:
+    doctor_expr = {"$concat": ["doctor:", {"$toString": {"$ifNull": ["$doctorId", "Unknown"]}}]}
+    upload_day = {"$substrCP": [{"$ifNull": ["$date", ""]}, 0, 10]}
+    processed_day = {"$cond": [
+        {"$eq": [{"$type": "$finishedAt"}, "date"]},
+        {"$dateToString": {"format": "%Y-%m-%d", "date": "$finishedAt"}},
+        upload_day
+    ]}
+
+    pipelines = []
+    for scope_expr in (GLOBAL_SCOPE, doctor_expr):
+        pipelines += [
+            (scan_collection, _status_pipeline(scope_expr)),
+            (scan_collection, _stage_pipeline(scope_expr)),
+            (scan_collection, _daily_pipeline(scope_expr, "uploads", {}, upload_day)),
+            (scan_collection, _daily_pipeline(scope_expr, "processed", {"status": "Processed"}, processed_day)),
+        ]
+    pipelines += [
+        (user_collection, [
+            {"$group": {"_id": {"$ifNull": ["$role", "Unknown"]}, "n": {"$sum": 1}}},
+            {"$group": {"_id": GLOBAL_SCOPE, "users": {"$sum": "$n"}, "usersByRole": {"$push": {"k": "$_id", "v": "$n"}}}},
+            {"$project": {"users": 1, "usersByRole": {"$arrayToObject": "$usersByRole"}}},
+            _merge()
+        ]),
+        (user_collection, [
+            {"$match": {"role": "doctor"}},
+            {"$group": {"_id": {"$ifNull": ["$status", "Unknown"]}, "n": {"$sum": 1}}},
+            {"$group": {"_id": GLOBAL_SCOPE, "doctorsByStatus": {"$push": {"k": "$_id", "v": "$n"}}}},
+            {"$project": {"doctorsByStatus": {"$arrayToObject": "$doctorsByStatus"}}},
+            _merge()
+        ]),
+    ]
+    return pipelines
+
+async def rebuild_dashboard_stats():
+    # Counters written while a rebuild runs can be lost, so run it when the
+    # system is quiet (startup, maintenance scripts). Doctor scopes are dropped
+    # whole, which also clears those of an older layout
+    await stats_collection.delete_many({"_id": {"$regex": DAILY_ID_PATTERN}})
+    await stats_collection.delete_many({"_id": {"$regex": "^doctor:"}})
+    await stats_collection.update_many({}, {"$unset": {**SCAN_FIELDS, **USER_FIELDS}})
+    for collection, pipeline in rebuild_pipelines():
+        await collection.aggregate(pipeline).to_list(length=None)
+    await stats_collection.update_one(
+        {"_id": GLOBAL_SCOPE}, {"$set": {"rebuiltAt": datetime.utcnow(), "layout": STATS_LAYOUT}}, upsert=True
+    )
+
+async def ensure_dashboard_stats() -> bool:
+    # First start after the counters were introduced, or after their layout
+    # changed: build them once
+    if await stats_collection.find_one({"_id": GLOBAL_SCOPE, "layout": STATS_LAYOUT}, {"_id": 1}):
+        return False
+    await rebuild_dashboard_stats()
+    return True
@@ -1,12 +1,100 @@
+import asyncio
+
 import motor.motor_asyncio
+from pymongo import ReadPreference
+from pymongo.errors import PyMongoError
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+from pymongo.write_concern import WriteConcern
+
+from app.core.config import (
+    MONGO_URL, MONGO_DB_NAME, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS,
+    MONGO_CONNECT_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS, MONGO_WRITE_CONCERN, MONGO_WRITE_TIMEOUT_MS,
+    MONGO_LISTING_READ_PREFERENCE, MONGO_LISTING_MAX_STALENESS_SECONDS, MONGO_PING_TIMEOUT_SECONDS, MONGO_APP_NAME
+)
+from app.core.metrics import MongoCommandTimer, MongoPoolMonitor
+
+# --- CLIENT ---
+# One client (and so one connection pool) per process, configured from
+# settings. connect=False defers opening sockets to the first operation, so
+# importing the app never touches the network; the FastAPI lifespan pings the
+# server on startup (`connect_database`) and closes the pool on shutdown.
+pool_monitor = MongoPoolMonitor(MONGO_MAX_POOL_SIZE)
 
-MONGO_URL = "mongodb://localhost:27017"
+def _write_concern() -> WriteConcern:
+    w = int(MONGO_WRITE_CONCERN) if MONGO_WRITE_CONCERN.isdigit() else MONGO_WRITE_CONCERN
+    return WriteConcern(w=w, wtimeout=MONGO_WRITE_TIMEOUT_MS)
 
-client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URL)
-db = client.hair_follicle_db 
+def create_client():
+    return motor.motor_asyncio.AsyncIOMotorClient(
+        MONGO_URL,
+        appname=MONGO_APP_NAME,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS or None,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        connect=False,
+        event_listeners=[MongoCommandTimer(), pool_monitor]
+    )
+
+client = create_client()
+db = client.get_database(MONGO_DB_NAME, write_concern=_write_concern())
 
 user_collection = db.users
 scan_collection = db.scans
 report_collection = db.reports
+prediction_collection = db.predictions
+mail_outbox_collection = db.mail_outbox
+stats_collection = db.dashboard_stats
+revoked_token_collection = db.revoked_tokens
+blob_collection = db.blobs
+# Time-series collection, created by ensure_indexes()
+stage_history_collection = db.stage_history
+
+# --- LISTING READS ---
+# Dashboard listings and summaries tolerate a few seconds of lag, so they may
+# be served by secondaries and keep read load off the primary. Everything
+# else (logins, job claims, writes) stays on the primary.
+_listing_mode = read_pref_mode_from_name(MONGO_LISTING_READ_PREFERENCE)
+LISTING_READ_PREFERENCE = make_read_preference(
+    _listing_mode,
+    tag_sets=None,
+    # A staleness bound only applies to modes that may read from secondaries
+    max_staleness=-1 if _listing_mode == ReadPreference.PRIMARY.mode else MONGO_LISTING_MAX_STALENESS_SECONDS
+)
+
+def for_listings(collection):
+    return collection.database.get_collection(collection.name, read_preference=LISTING_READ_PREFERENCE)
+
+# --- LIFECYCLE ---
+async def ping_database() -> bool:
+    try:
+        await asyncio.wait_for(client.admin.command("ping"), MONGO_PING_TIMEOUT_SECONDS)
+        return True
+    except (PyMongoError, asyncio.TimeoutError):
+        return False
+
+async def connect_database() -> bool:
+    if await ping_database():
+        print(f"✅ Database connection established: {MONGO_DB_NAME} (pool of up to {MONGO_MAX_POOL_SIZE} connections)")
+        return True
+    # Startup continues: the lifespan retries its database setup in the
+    # background, requests fail until the server is reachable and
+    # /health/ready reports the outage
+    print(f"⚠️ Database {MONGO_DB_NAME} is not reachable yet.")
+    return False
+
+def close_database():
+    client.close()
+    print("🔌 Database connection closed.")
 
-print("✅ Database connection established: hair_follicle_db")
\ No newline at end of file
+def database_status() -> dict:
+    return {
+        "name": MONGO_DB_NAME,
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "listingReadPreference": MONGO_LISTING_READ_PREFERENCE,
+        "pools": pool_monitor.snapshot()
+    }
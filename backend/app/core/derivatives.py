@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app.core.metrics import span
+from app.core.preprocessing import open_for_model, to_model_input
+from app.core.storage import blob_store
+
+THUMBNAIL_SIZE = (256, 256)
+THUMBNAIL_QUALITY = 80
+
+# --- UPLOAD-TIME IMAGE DERIVATIVES ---
+def derivative_paths(image_path: str) -> dict:
+    stem, _ = os.path.splitext(image_path)
+    return {"thumbnail": f"{stem}.thumb.webp", "tensor": f"{stem}.input.npy"}
+
+def generate_derivatives(image_path: str) -> dict:
+    # One draft-mode decode feeds both outputs: a WebP thumbnail for list views
+    # and the 224x224 float32 model input, saved as .npy so inference can
+    # memory-map it instead of decoding the original again. Files are written
+    # under a temporary name and renamed so readers never see partial output.
+    paths = derivative_paths(image_path)
+    img = open_for_model(image_path)
+
+    thumbnail = img.copy()
+    thumbnail.thumbnail(THUMBNAIL_SIZE)
+    tmp_thumbnail = f"{paths['thumbnail']}.part"
+    thumbnail.save(tmp_thumbnail, "WEBP", quality=THUMBNAIL_QUALITY)
+    os.replace(tmp_thumbnail, paths["thumbnail"])
+
+    tmp_tensor = f"{paths['tensor']}.part"
+    with open(tmp_tensor, "wb") as f:
+        np.save(f, to_model_input(img))
+    os.replace(tmp_tensor, paths["tensor"])
+
+    return paths
+
+def load_tensor(tensor_path: str) -> np.ndarray:
+    with span("load"):
+        return np.load(tensor_path, mmap_mode="r")
+
+async def create_scan_derivatives(upload: dict) -> dict:
+    # Also validates the upload: a file that sniffs as an image but cannot be
+    # decoded is released and rejected here rather than failing in a worker later.
+    # Derivatives are stored next to the blob and shared by every scan of the
+    # same bytes, so a repeated upload skips the decode entirely.
+    urls = derivative_paths(upload["url"])
+    if not upload.get("derivatives"):
+        try:
+            with span("upload.derivatives"):
+                paths = await run_in_threadpool(generate_derivatives, upload["path"])
+        except Exception as e:
+            print(f"Derivative Error: {e}")
+            await blob_store.release(upload["url"])
+            raise HTTPException(status_code=400, detail="Uploaded image could not be decoded.")
+
+        keys = derivative_paths(upload["key"])
+        await blob_store.store_derivatives(upload["hash"], [(keys[name], paths[name]) for name in ("thumbnail", "tensor")])
+
+    return {"thumbnailPath": urls["thumbnail"], "tensorPath": urls["tensor"]}
@@ -0,0 +1,56 @@
+import os
+
+import numpy as np
+from PIL import Image
+from starlette.concurrency import run_in_threadpool
+
+from app.core.derivatives import THUMBNAIL_QUALITY, THUMBNAIL_SIZE, derivative_paths
+from app.core.metrics import span
+from app.core.preprocessing import open_for_model
+from app.core.storage import blob_store, key_from_url, media_url
+
+# Opacity of the hottest regions; cold regions leave the photo untouched
+HEATMAP_OPACITY = 0.5
+
+# --- GRAD-CAM OVERLAYS ---
+# A heatmap is drawn over the scan's thumbnail and stored as one more
+# derivative of the image blob, keyed by model version
+# ("<hash>.cam-<version>.webp"): every scan of the same bytes under the same
+# model shares it, and it is deleted together with the image.
+def heatmap_key(image_key: str, model_version: str) -> str:
+    stem, _ = os.path.splitext(image_key)
+    return f"{stem}.cam-{model_version}.webp"
+
+def _colorize(heat: np.ndarray) -> np.ndarray:
+    # Blue (cold) -> green -> red (hot), as float RGB in 0..255
+    channels = [np.clip(1.5 - np.abs(4 * heat - offset), 0, 1) for offset in (3, 2, 1)]
+    return np.stack(channels, axis=-1) * 255
+
+def render_overlay(image_url: str, heatmap: np.ndarray, out_path: str):
+    thumbnail_path = blob_store.resolve_local_path(derivative_paths(image_url)["thumbnail"])
+    if os.path.exists(thumbnail_path):
+        with Image.open(thumbnail_path) as img:
+            base = img.convert("RGB")
+    else:
+        base = open_for_model(blob_store.resolve_local_path(image_url))
+        base.thumbnail(THUMBNAIL_SIZE)
+
+    # The low-resolution map (7x7 for most backbones) is smoothed up to the thumbnail
+    heat = Image.fromarray(np.asarray(heatmap, dtype=np.float32)).resize(base.size, Image.Resampling.BILINEAR)
+    heat = np.clip(np.asarray(heat), 0, 1)
+    alpha = (HEATMAP_OPACITY * heat)[..., None]
+    blended = np.asarray(base, dtype=np.float32) * (1 - alpha) + _colorize(heat) * alpha
+    Image.fromarray(blended.astype(np.uint8)).save(out_path, "WEBP", quality=THUMBNAIL_QUALITY)
+
+async def save_heatmap(image_url: str, image_hash: str, heatmap: np.ndarray, model_version: str):
+    # Returns the overlay's URL, or None for images stored before the blob store
+    image_key = key_from_url(image_url)
+    if not image_key:
+        return None
+
+    key = heatmap_key(image_key, model_version)
+    tmp_path = blob_store.incoming_path()
+    with span("explain.overlay"):
+        await run_in_threadpool(render_overlay, image_url, heatmap, tmp_path)
+    await blob_store.store_derivatives(image_hash, [(key, tmp_path)])
+    return media_url(key)
@@ -0,0 +1,14 @@
+import hashlib
+
+HASH_ALGORITHM = "sha256"
+CHUNK_SIZE = 1024 * 1024
+
+def new_hasher():
+    return hashlib.new(HASH_ALGORITHM)
+
+def hash_file(path: str) -> str:
+    hasher = new_hasher()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
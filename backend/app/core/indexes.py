@@ -0,0 +1,96 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import ConnectionFailure, PyMongoError
+
+from app.core.config import PREDICTION_STORE_TTL_DAYS
+from app.core.database import (
+    db, user_collection, scan_collection, prediction_collection, mail_outbox_collection,
+    revoked_token_collection, blob_collection, stage_history_collection
+)
+from app.core.progression import STAGE_HISTORY_TIMESERIES
+
+# --- TIME-SERIES COLLECTIONS ---
+# These must be created explicitly before their first insert or index,
+# which would otherwise create an ordinary collection
+TIME_SERIES_COLLECTIONS = [
+    (stage_history_collection, STAGE_HISTORY_TIMESERIES),
+]
+
+# --- INDEX DECLARATIONS ---
+# One entry per hot access pattern; `scripts/explain_queries.py` checks that
+# each endpoint query is actually served by one of these.
+INDEXES = [
+    (user_collection, [
+        # login, signup, forgot-password
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        # reset-password
+        IndexModel([("reset_token", ASCENDING)], name="reset_token", sparse=True),
+        # patient doctor picker; admin user pages by role (and status), newest first
+        IndexModel([("role", ASCENDING), ("status", ASCENDING), ("_id", DESCENDING)], name="role_status_id"),
+        IndexModel([("role", ASCENDING), ("_id", DESCENDING)], name="role_id"),
+        # doctor profile lookup by name
+        IndexModel([("nameKey", ASCENDING), ("role", ASCENDING)], name="nameKey_role"),
+    ]),
+    (scan_collection, [
+        # doctor dashboard: one keyset page per status
+        IndexModel([("doctorName", ASCENDING), ("status", ASCENDING), ("_id", DESCENDING)], name="doctor_status_id"),
+        # patient dashboard
+        IndexModel([("patientName", ASCENDING), ("_id", DESCENDING)], name="patient_id"),
+        # background workers claiming the oldest Pending scan
+        IndexModel([("status", ASCENDING), ("date", ASCENDING)], name="status_date"),
+    ]),
+    (prediction_collection, [
+        IndexModel([("imageHash", ASCENDING), ("modelVersion", ASCENDING)], name="image_model_unique", unique=True),
+        # unused entries, including every one of a retired model version
+        IndexModel([("lastUsedAt", ASCENDING)], name="lastUsedAt_ttl", expireAfterSeconds=PREDICTION_STORE_TTL_DAYS * 86400),
+    ]),
+    (mail_outbox_collection, [
+        # mail sender picking due messages
+        IndexModel([("state", ASCENDING), ("nextAttemptAt", ASCENDING)], name="state_nextAttempt"),
+        IndexModel([("workerId", ASCENDING)], name="workerId", sparse=True),
+    ]),
+    (revoked_token_collection, [
+        # an entry is dropped once every token it revokes has expired
+        IndexModel([("expiresAt", ASCENDING)], name="expiresAt_ttl", expireAfterSeconds=0),
+    ]),
+    (blob_collection, [
+        # garbage collection of unreferenced blobs
+        IndexModel([("orphanedAt", ASCENDING)], name="orphanedAt", sparse=True),
+    ]),
+    (stage_history_collection, [
+        # patient progression
+        IndexModel([("meta.patientName", ASCENDING), ("date", ASCENDING)], name="patient_date"),
+        # doctor panel progression
+        IndexModel([("meta.doctorName", ASCENDING), ("date", ASCENDING)], name="doctor_date"),
+    ]),
+]
+
+async def ensure_time_series():
+    existing = set(await db.list_collection_names())
+    for collection, options in TIME_SERIES_COLLECTIONS:
+        if collection.name in existing:
+            continue
+        try:
+            await db.create_collection(collection.name, timeseries=options)
+        except ConnectionFailure:
+            raise
+        except (PyMongoError, NotImplementedError) as e:
+            # Queries work the same on an ordinary collection (mongomock in the
+            # load test has no time-series support), only storage is less compact
+            print(f"⚠️ Could not create time-series collection {collection.name}: {e}")
+
+async def ensure_indexes():
+    # createIndexes is a no-op for indexes that already exist with the same
+    # spec, so this runs on every startup. Each index is created on its own so
+    # one failure (e.g. duplicate emails blocking the unique index) does not
+    # stop the rest.
+    await ensure_time_series()
+    for collection, indexes in INDEXES:
+        for index in indexes:
+            try:
+                await collection.create_indexes([index])
+            except ConnectionFailure:
+                # An unreachable server is the caller's to retry, not a bad index
+                raise
+            except PyMongoError as e:
+                print(f"⚠️ Could not create index {collection.name}.{index.document['name']}: {e}")
+    print("🗂️ Database indexes verified.")
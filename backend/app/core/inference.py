@@ -0,0 +1,187 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from fastapi import HTTPException
+
+from app.core.config import (
+    INFERENCE_MAX_BATCH, INFERENCE_MAX_WAIT_MS,
+    INFERENCE_WORKERS, INFERENCE_MAX_PENDING, INFERENCE_TIMEOUT_SECONDS, PREDICTION_TOP_K
+)
+from app.core.metrics import span
+
+
+# --- INFERENCE EXECUTOR ---
+# Bounded thread pool for PIL decoding and model prediction so CPU-heavy work
+# never runs on the event loop. `submit` applies admission control: once
+# `max_pending` analyses are in flight new ones are rejected with 503, and each
+# analysis is cancelled with 504 after `timeout` seconds.
+class InferenceExecutor:
+    def __init__(self, max_workers: int = INFERENCE_WORKERS, max_pending: int = INFERENCE_MAX_PENDING, timeout: float = INFERENCE_TIMEOUT_SECONDS):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self._pool = None
+
+    async def run(self, fn, *args):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        # The caller's context travels with the call so timing spans inside
+        # `fn` land in the right request's profile
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(self._pool, context.run, fn, *args)
+
+    async def submit(self, coro_fn, *args):
+        if self.pending >= self.max_pending:
+            raise HTTPException(status_code=503, detail="AI analysis queue is full. Please retry shortly.")
+
+        self.pending += 1
+        try:
+            return await asyncio.wait_for(coro_fn(*args), self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="AI analysis timed out.")
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# --- MICRO-BATCHING ENGINE ---
+# Collects single-image requests and runs them as one batched forward pass.
+# A batch is flushed as soon as `max_batch_size` images are queued or
+# `max_wait_ms` has passed since the first image of the batch arrived.
+# `predict_fn` returns `(predictions, model_version)`; each caller gets its own
+# row together with the version that produced it. Callers asking for an
+# explanation are batched separately through `explain_fn`, which returns
+# `(predictions, heatmaps, model_version)` from one forward/backward pass.
+class BatchInferenceEngine:
+    def __init__(self, predict_fn, executor: InferenceExecutor, max_batch_size: int = INFERENCE_MAX_BATCH,
+                 max_wait_ms: float = INFERENCE_MAX_WAIT_MS, explain_fn=None):
+        self.predict_fn = predict_fn
+        self.explain_fn = explain_fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._worker = None
+        self._batch_buffer = None
+
+    async def predict(self, img_array: np.ndarray, explain: bool = False):
+        # Returns (probabilities, heatmap or None, model_version)
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((img_array, explain and self.explain_fn is not None, future))
+        return await future
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        while self._queue is not None and not self._queue.empty():
+            *_, future = self._queue.get_nowait()
+            future.cancel()
+
+    def _ensure_worker(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            # Started in a fresh context: the worker serves every request, so it
+            # must not inherit the profile of the one that happened to start it
+            self._worker = contextvars.Context().run(asyncio.create_task, self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        # Callers that timed out or disconnected no longer need a result
+        batch = [item for item in batch if not item[2].done()]
+        for explain in (False, True):
+            group = [item for item in batch if item[1] == explain]
+            if group:
+                await self._run_group(group, explain)
+
+    async def _run_group(self, group, explain: bool):
+        # Stacking fails like the model call does (e.g. a tensor of another
+        # shape in the group): every caller gets the error, the loop goes on
+        try:
+            # Only one batch is in flight at a time, so the stacking buffer is reused
+            first = group[0][0]
+            if self._batch_buffer is None or self._batch_buffer.shape[1:] != first.shape:
+                self._batch_buffer = np.empty((self.max_batch_size,) + first.shape, dtype=np.float32)
+            inputs = np.stack([img_array for img_array, *_ in group], out=self._batch_buffer[:len(group)])
+            with span("predict.batch"):
+                if explain:
+                    predictions, heatmaps, model_version = await self.executor.run(self.explain_fn, inputs)
+                else:
+                    predictions, model_version = await self.executor.run(self.predict_fn, inputs)
+                    heatmaps = None
+        except Exception as e:
+            for *_, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # Rows are copied out in case a backend returns views of the reused buffer
+        if heatmaps is None:
+            heatmaps = [None] * len(group)
+        for (*_, future), row, heatmap in zip(group, predictions, heatmaps):
+            if not future.done():
+                future.set_result((np.array(row), None if heatmap is None else np.array(heatmap), model_version))
+
+
+# --- RESULT FORMATTING ---
+CLASS_NAMES = [
+    "Norwood Stage 1", "Norwood Stage 2", "Norwood Stage 3",
+    "Norwood Stage 4", "Norwood Stage 5", "Norwood Stage 6",
+    "Norwood Stage 7"
+]
+
+def to_probabilities(predictions: np.ndarray) -> np.ndarray:
+    # Models ending in a softmax already output probabilities; raw logits
+    # (e.g. from an exported graph without the final activation) are normalised
+    scores = np.asarray(predictions, dtype=np.float64)
+    if scores.min() >= 0 and abs(scores.sum() - 1) < 1e-3:
+        return scores
+    exp = np.exp(scores - scores.max())
+    return exp / exp.sum()
+
+def stage_name(index: int) -> str:
+    return CLASS_NAMES[index] if index < len(CLASS_NAMES) else "Analysis Complete"
+
+def format_prediction(predictions: np.ndarray, model_version: str, top_k: int = PREDICTION_TOP_K) -> dict:
+    probabilities = to_probabilities(predictions)
+    ranked = np.argsort(probabilities)[::-1][:max(top_k, 1)]
+    return {
+        "baldnessStage": stage_name(int(ranked[0])),
+        "confidence": round(float(probabilities[ranked[0]]), 4),
+        "topStages": [
+            {"stage": stage_name(int(i)), "confidence": round(float(probabilities[i]), 4)}
+            for i in ranked
+        ],
+        "probabilities": [round(float(p), 4) for p in probabilities],
+        "modelVersion": model_version
+    }
@@ -0,0 +1,354 @@
+import asyncio
+import itertools
+import json
+import os
+import struct
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+from fastapi import HTTPException
+
+from app.core.config import INFERENCE_MAX_BATCH, INFERENCE_SOCKET, INFERENCE_SHM_SLOTS, INFERENCE_STATUS_REFRESH_SECONDS
+from app.core.inference import BatchInferenceEngine, InferenceExecutor
+from app.core.preprocessing import MODEL_INPUT_SHAPE
+
+# --- REMOTE INFERENCE PROTOCOL ---
+# API workers talk to one inference service over a Unix socket. Each worker
+# owns a shared-memory block of INFERENCE_SHM_SLOTS model-input slots and
+# announces it once ("hello"); a prediction request then only names a slot,
+# so tensors are never serialised or sent through the socket. Messages are
+# length-prefixed JSON:
+#   {"op": "hello", "id", "shm", "slots"}        -> {"id", "status"}
+#   {"op": "predict", "id", "slot", "explain"}   -> {"id", "probabilities", "heatmap", "modelVersion"}
+#   {"op": "status", "id"}                       -> {"id", "status"}
+#   {"op": "load", "id", "path"}                 -> {"id", "version", "status"}
+# Failures come back as {"id", "error", "code"} with an HTTP status code.
+_LENGTH = struct.Struct("!I")
+SLOT_BYTES = int(np.prod(MODEL_INPUT_SHAPE)) * np.dtype(np.float32).itemsize
+
+async def read_message(reader: asyncio.StreamReader):
+    # None once the peer has closed the connection
+    try:
+        header = await reader.readexactly(_LENGTH.size)
+        return json.loads(await reader.readexactly(_LENGTH.unpack(header)[0]))
+    except asyncio.IncompleteReadError:
+        return None
+
+def write_message(writer: asyncio.StreamWriter, message: dict):
+    # One write call per frame, so concurrent replies never interleave
+    body = json.dumps(message, separators=(",", ":")).encode()
+    writer.write(_LENGTH.pack(len(body)) + body)
+
+def slot_views(shm: shared_memory.SharedMemory, slots: int) -> np.ndarray:
+    return np.ndarray((slots,) + MODEL_INPUT_SHAPE, dtype=np.float32, buffer=shm.buf)
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # The block belongs to the API worker that created it; untracked, so the
+    # service's resource tracker does not unlink it when the service exits
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no `track` argument
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+# --- INFERENCE SERVICE ---
+# The only process that loads the model. Requests from every API worker
+# land in one BatchInferenceEngine, so concurrent scans from different
+# workers still share a forward pass.
+class InferenceService:
+    def __init__(self, registry, engine: BatchInferenceEngine):
+        self.registry = registry
+        self.engine = engine
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        shm, slots, tasks = None, None, set()
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                op = message.get("op")
+                if op == "predict" and slots is not None:
+                    task = asyncio.create_task(self._predict(message, slots[message["slot"]], writer))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                elif op == "hello":
+                    shm = _attach(message["shm"])
+                    slots = slot_views(shm, message["slots"])
+                    write_message(writer, {"id": message["id"], "status": self.registry.status()})
+                elif op == "status":
+                    write_message(writer, {"id": message["id"], "status": self.registry.status()})
+                elif op == "load":
+                    task = asyncio.create_task(self._load(message, writer))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                else:
+                    write_message(writer, {"id": message.get("id"), "error": f"Unsupported request '{op}'.", "code": 400})
+                await writer.drain()
+        except (ConnectionError, json.JSONDecodeError, KeyError, IndexError) as e:
+            print(f"⚠️ Inference client dropped: {e}")
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # The views must go before the mapping can be closed; a view still
+            # queued in the engine keeps it open until garbage collection
+            slots = None
+            if shm is not None:
+                try:
+                    shm.close()
+                except BufferError:
+                    pass
+            writer.close()
+
+    async def _predict(self, message: dict, slot: np.ndarray, writer: asyncio.StreamWriter):
+        try:
+            if not self.registry.ready:
+                raise HTTPException(status_code=503, detail="AI model is still loading.")
+            probabilities, heatmap, model_version = await self.engine.predict(slot, message.get("explain", False))
+            reply = {
+                "id": message["id"],
+                "probabilities": probabilities.tolist(),
+                "heatmap": None if heatmap is None else heatmap.tolist(),
+                "modelVersion": model_version
+            }
+        except HTTPException as e:
+            reply = {"id": message["id"], "error": e.detail, "code": e.status_code}
+        except Exception as e:
+            reply = {"id": message["id"], "error": str(e), "code": 500}
+        write_message(writer, reply)
+        await writer.drain()
+
+    async def _load(self, message: dict, writer: asyncio.StreamWriter):
+        # Same rule as the admin route: only files in the model directory
+        from app.core.model_registry import MODEL_DIR
+
+        path = os.path.join(MODEL_DIR, os.path.basename(message["path"])) if message.get("path") else None
+        try:
+            version = await self.registry.load(path)
+            reply = {"id": message["id"], "version": version, "status": self.registry.status()}
+        except FileNotFoundError as e:
+            reply = {"id": message["id"], "error": str(e), "code": 404}
+        except Exception as e:
+            reply = {"id": message["id"], "error": str(e), "code": 500}
+        write_message(writer, reply)
+        await writer.drain()
+
+async def serve(socket_path: str = INFERENCE_SOCKET, registry=None):
+    # Runs until cancelled. `registry` defaults to a fresh ModelRegistry that
+    # loads MODEL_PATH in the background.
+    from app.core.model_registry import ModelRegistry
+
+    if registry is None:
+        registry = ModelRegistry()
+        registry.start_background_load()
+    executor = InferenceExecutor()
+    engine = BatchInferenceEngine(registry.predict, executor, explain_fn=registry.predict_with_heatmaps)
+    service = InferenceService(registry, engine)
+
+    if os.path.exists(socket_path):
+        try:
+            _, writer = await asyncio.open_unix_connection(socket_path)
+            writer.close()
+            raise SystemExit(f"❌ An inference service is already listening on {socket_path}")
+        except ConnectionError:
+            os.remove(socket_path)
+
+    server = await asyncio.start_unix_server(service.handle, path=socket_path)
+    # Only processes of the same user may send tensors or load models
+    os.chmod(socket_path, 0o600)
+    print(f"🧠 Inference service listening on {socket_path}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await engine.stop()
+        executor.shutdown()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+# --- API-SIDE CLIENT ---
+# Drop-in for BatchInferenceEngine in API workers (INFERENCE_MODE=remote).
+# The tensor is copied once into a free slot of this process's shared-memory
+# block. A slot is only reused once the service has answered for it, even if
+# the caller gave up waiting, so the service never reads a slot mid-rewrite.
+class RemoteInferenceEngine:
+    def __init__(self, socket_path: str = INFERENCE_SOCKET, slots: int = INFERENCE_SHM_SLOTS):
+        self.socket_path = socket_path
+        self.slots = slots
+        self.max_batch_size = INFERENCE_MAX_BATCH
+        self._shm = None
+        self._views = None
+        self._free = None
+        self._writer = None
+        self._reader_task = None
+        self._pending = {}
+        self._ids = itertools.count()
+        self._connect_lock = asyncio.Lock()
+
+    async def predict(self, img_array: np.ndarray, explain: bool = False):
+        # Returns (probabilities, heatmap or None, model_version)
+        await self._ensure_connected()
+        slot = await self._free.get()
+        try:
+            np.copyto(self._views[slot], img_array)
+        except Exception:
+            self._free.put_nowait(slot)
+            raise
+        reply = await self._send({"op": "predict", "slot": slot, "explain": explain}, slot)
+        heatmap = None if reply["heatmap"] is None else np.asarray(reply["heatmap"], dtype=np.float32)
+        return np.asarray(reply["probabilities"], dtype=np.float32), heatmap, reply["modelVersion"]
+
+    async def request(self, message: dict) -> dict:
+        await self._ensure_connected()
+        return await self._send(message)
+
+    async def stop(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+            self._reader_task = None
+        if self._shm is not None:
+            self._views = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    async def _send(self, message: dict, slot: int = None) -> dict:
+        if self._writer is None or self._writer.is_closing():
+            if slot is not None:
+                self._free.put_nowait(slot)
+            raise HTTPException(status_code=503, detail="Inference service connection lost.")
+        message_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = (future, slot)
+        try:
+            write_message(self._writer, {**message, "id": message_id})
+            await self._writer.drain()
+        except ConnectionError:
+            self._fail_pending()
+        reply = await asyncio.shield(future)
+        if "error" in reply:
+            raise HTTPException(status_code=reply["code"], detail=reply["error"])
+        return reply
+
+    async def _ensure_connected(self):
+        if self._writer is not None and not self._writer.is_closing():
+            return
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            if self._shm is None:
+                self._shm = shared_memory.SharedMemory(create=True, size=self.slots * SLOT_BYTES)
+                self._views = slot_views(self._shm, self.slots)
+                self._free = asyncio.Queue()
+                for slot in range(self.slots):
+                    self._free.put_nowait(slot)
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.socket_path)
+                write_message(writer, {"op": "hello", "id": next(self._ids), "shm": self._shm.name, "slots": self.slots})
+                await writer.drain()
+                if await read_message(reader) is None:
+                    raise ConnectionError("closed during handshake")
+            except (OSError, ConnectionError) as e:
+                raise HTTPException(status_code=503, detail=f"Inference service is not reachable: {e}")
+            self._writer = writer
+            self._reader_task = asyncio.create_task(self._read_replies(reader, writer))
+
+    async def _read_replies(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                reply = await read_message(reader)
+                if reply is None:
+                    break
+                future, slot = self._pending.pop(reply["id"], (None, None))
+                if slot is not None:
+                    self._free.put_nowait(slot)
+                if future is not None and not future.done():
+                    future.set_result(reply)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            self._fail_pending()
+
+    def _fail_pending(self):
+        # The service is gone, and with it every read of our slots
+        pending, self._pending = self._pending, {}
+        for future, slot in pending.values():
+            if slot is not None:
+                self._free.put_nowait(slot)
+            if not future.done():
+                future.set_result({"error": "Inference service connection lost.", "code": 503})
+
+
+# --- API-SIDE MODEL STATUS ---
+# Stands in for ModelRegistry in API workers: readiness, version and heatmap
+# support mirror the service's registry, polled every
+# INFERENCE_STATUS_REFRESH_SECONDS. Results always carry the version that
+# produced them, so a hot swap between polls never mislabels a prediction.
+class RemoteModelRegistry:
+    def __init__(self, engine: RemoteInferenceEngine, refresh_seconds: float = INFERENCE_STATUS_REFRESH_SECONDS):
+        self.engine = engine
+        self.refresh_seconds = refresh_seconds
+        self._status = {"state": "unreachable", "ready": False}
+        self._task = None
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._status.get("ready"))
+
+    @property
+    def state(self) -> str:
+        return self._status.get("state")
+
+    @property
+    def version(self):
+        return self._status.get("version")
+
+    @property
+    def backend(self):
+        return self._status.get("backend")
+
+    @property
+    def supports_heatmaps(self) -> bool:
+        return bool(self._status.get("heatmaps"))
+
+    def status(self) -> dict:
+        return {**self._status, "mode": "remote", "socket": self.engine.socket_path}
+
+    async def refresh(self):
+        try:
+            self._status = (await self.engine.request({"op": "status"}))["status"]
+        except HTTPException as e:
+            self._status = {"state": "unreachable", "ready": False, "error": e.detail}
+
+    async def load(self, path: str = None) -> str:
+        # Swaps the model in the service, i.e. for every API worker at once
+        try:
+            reply = await self.engine.request({"op": "load", "path": path})
+        except HTTPException as e:
+            if e.status_code == 404:
+                raise FileNotFoundError(e.detail)
+            raise RuntimeError(e.detail)
+        self._status = reply["status"]
+        return reply["version"]
+
+    def start_background_load(self):
+        # The service loads the model; this process only follows its status
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_seconds)
@@ -0,0 +1,222 @@
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from pymongo import ReturnDocument, UpdateOne
+
+from app.core.config import SCAN_WORKERS, SCAN_LEASE_SECONDS, SCAN_MAX_ATTEMPTS, SCAN_POLL_INTERVAL_SECONDS
+from app.core.dashboard_stats import record_scan_changes
+from app.core.database import scan_collection
+from app.core.progression import record_stage_points
+from app.core.tokens import require_scan_access
+
+# --- JOB STATES ---
+# `status` stays the user-facing "Pending"/"Processed" flag; `jobState` tracks
+# where a Pending scan is in the background queue.
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+NEW_JOB_FIELDS = {"jobState": JOB_QUEUED, "attempts": 0}
+
+def _lease_free(now: datetime):
+    return [{"leaseExpiresAt": None}, {"leaseExpiresAt": {"$lt": now}}]
+
+def _claim_update(worker_id: str, now: datetime):
+    return {
+        "$set": {
+            "jobState": JOB_RUNNING,
+            "workerId": worker_id,
+            "leaseExpiresAt": now + timedelta(seconds=SCAN_LEASE_SECONDS),
+            "startedAt": now
+        },
+        "$inc": {"attempts": 1}
+    }
+
+def _completion_update(result: dict):
+    return {
+        "$set": {**result, "status": "Processed", "jobState": JOB_DONE, "finishedAt": datetime.utcnow()},
+        "$unset": {"leaseExpiresAt": "", "workerId": "", "lastError": ""}
+    }
+
+def _failure_update(scan: dict, error: Exception):
+    # Backpressure from the inference executor is not the scan's fault, so the
+    # attempt is handed back instead of being counted against the retry budget
+    retry_later = isinstance(error, HTTPException) and error.status_code == 503
+    out_of_attempts = scan.get("attempts", 0) >= SCAN_MAX_ATTEMPTS and not retry_later
+
+    update = {
+        "$set": {
+            "jobState": JOB_FAILED if out_of_attempts else JOB_QUEUED,
+            "lastError": getattr(error, "detail", None) or str(error)
+        },
+        "$unset": {"leaseExpiresAt": "", "workerId": ""}
+    }
+    if retry_later:
+        update["$inc"] = {"attempts": -1}
+    return update
+
+def _owned(scan: dict):
+    return {"_id": scan["_id"], "workerId": scan["workerId"]}
+
+# --- QUEUE OPERATIONS ---
+async def claim_scan(worker_id: str, scan_id=None):
+    # Atomically lease one scan. Without `scan_id` the oldest Pending scan that
+    # still has retries left is taken; with it (a doctor clicking a scan) the
+    # scan is leased regardless of status so it can be re-analysed.
+    now = datetime.utcnow()
+    if scan_id is None:
+        query = {
+            "status": "Pending",
+            "attempts": {"$not": {"$gte": SCAN_MAX_ATTEMPTS}},
+            "$or": _lease_free(now)
+        }
+    else:
+        query = {"_id": scan_id, "$or": _lease_free(now)}
+
+    return await scan_collection.find_one_and_update(
+        query,
+        _claim_update(worker_id, now),
+        sort=[("date", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+async def claim_scans(worker_id: str, scan_ids: list) -> list:
+    # Bulk version of `claim_scan(worker_id, scan_id)`: each document is leased
+    # atomically, and scans already leased by someone else are left out
+    now = datetime.utcnow()
+    await scan_collection.update_many(
+        {"_id": {"$in": scan_ids}, "$or": _lease_free(now)},
+        _claim_update(worker_id, now)
+    )
+    return await scan_collection.find({"_id": {"$in": scan_ids}, "workerId": worker_id}).to_list(length=None)
+
+async def pending_scan_ids(doctor_name: str, limit: int, owner: dict = None) -> list:
+    # `owner` narrows the scans to one doctor account (see tokens.owner_filter)
+    cursor = scan_collection.find(
+        {"doctorName": doctor_name, **(owner or {}), "status": "Pending", "attempts": {"$not": {"$gte": SCAN_MAX_ATTEMPTS}}},
+        {"_id": 1}
+    ).sort("_id", 1).limit(limit)
+    return [scan["_id"] for scan in await cursor.to_list(length=limit)]
+
+def _completed(scan: dict, result: dict) -> dict:
+    return {**scan, **result, "status": "Processed"}
+
+async def complete_scan(scan: dict, result: dict):
+    update = await scan_collection.update_one(_owned(scan), _completion_update(result))
+    if update.modified_count:
+        await record_scan_changes([(scan, _completed(scan, result))])
+        await record_stage_points([_completed(scan, result)])
+
+async def fail_scan(scan: dict, error: Exception):
+    await scan_collection.update_one(_owned(scan), _failure_update(scan, error))
+
+async def finish_scans(outcomes: list):
+    # Writes a batch of (scan, result-or-exception) pairs back in one bulk_write
+    operations = [
+        UpdateOne(_owned(scan), _failure_update(scan, outcome) if isinstance(outcome, Exception) else _completion_update(outcome))
+        for scan, outcome in outcomes
+    ]
+    if operations:
+        await scan_collection.bulk_write(operations, ordered=False)
+        completed = [
+            (scan, _completed(scan, outcome)) for scan, outcome in outcomes
+            if not isinstance(outcome, Exception)
+        ]
+        await record_scan_changes(completed)
+        await record_stage_points([after for _, after in completed])
+
+async def requeue_scan(scan_id):
+    # Leaves a scan alone while a worker holds a live lease on it; False when
+    # the scan is missing or still being processed
+    before = await scan_collection.find_one_and_update(
+        {"_id": scan_id, "$or": _lease_free(datetime.utcnow()) + [{"jobState": JOB_FAILED}]},
+        {
+            "$set": {"status": "Pending", **NEW_JOB_FIELDS},
+            "$unset": {"leaseExpiresAt": "", "workerId": "", "lastError": ""}
+        },
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is None:
+        return False
+    await record_scan_changes([(before, {**before, "status": "Pending"})])
+    return True
+
+async def run_scan_job(scan: dict, process_fn):
+    try:
+        result = await process_fn(scan)
+    except Exception as e:
+        await fail_scan(scan, e)
+        raise
+    await complete_scan(scan, result)
+    return result
+
+async def get_job_status(scan_id, claims: dict):
+    scan = await scan_collection.find_one(
+        {"_id": scan_id},
+        {
+            "status": 1, "jobState": 1, "attempts": 1, "lastError": 1, "baldnessStage": 1, "startedAt": 1, "finishedAt": 1,
+            "patientId": 1, "doctorId": 1
+        }
+    )
+    if not scan:
+        raise HTTPException(status_code=404, detail="Scan not found.")
+    require_scan_access(claims, scan)
+
+    return {
+        "id": str(scan["_id"]),
+        "status": scan.get("status"),
+        "jobState": scan.get("jobState", JOB_DONE if scan.get("status") == "Processed" else JOB_QUEUED),
+        "attempts": scan.get("attempts", 0),
+        "maxAttempts": SCAN_MAX_ATTEMPTS,
+        "lastError": scan.get("lastError"),
+        "baldnessStage": scan.get("baldnessStage", ""),
+        "startedAt": scan.get("startedAt"),
+        "finishedAt": scan.get("finishedAt")
+    }
+
+# --- BACKGROUND WORKERS ---
+class ScanWorkerPool:
+    def __init__(self, process_fn, workers: int = SCAN_WORKERS):
+        self.process_fn = process_fn
+        self.workers = workers
+        self._tasks = []
+
+    def start(self):
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks = [
+            asyncio.create_task(self._work(f"{prefix}:{i}"))
+            for i in range(self.workers)
+        ]
+        if self._tasks:
+            print(f"🧵 Started {self.workers} scan worker(s).")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self, worker_id: str):
+        while True:
+            try:
+                scan = await claim_scan(worker_id)
+            except Exception as e:
+                print(f"Scan Worker Error: {e}")
+                await asyncio.sleep(SCAN_POLL_INTERVAL_SECONDS)
+                continue
+
+            if scan is None:
+                await asyncio.sleep(SCAN_POLL_INTERVAL_SECONDS)
+                continue
+
+            try:
+                await run_scan_job(scan, self.process_fn)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Scan {scan['_id']} failed (attempt {scan.get('attempts')}): {getattr(e, 'detail', e)}")
+                await asyncio.sleep(SCAN_POLL_INTERVAL_SECONDS)
@@ -0,0 +1,260 @@
+import asyncio
+import os
+import smtplib
+import socket
+import time
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from pymongo import UpdateOne
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import (
+    MAIL_SERVER, MAIL_PORT, MAIL_USERNAME, MAIL_PASSWORD, MAIL_FROM, MAIL_STARTTLS,
+    MAIL_TIMEOUT_SECONDS, MAIL_CONNECTIONS, MAIL_BATCH_SIZE, MAIL_MAX_ATTEMPTS,
+    MAIL_RETRY_BASE_SECONDS, MAIL_RETRY_MAX_SECONDS, MAIL_LEASE_SECONDS,
+    MAIL_IDLE_SECONDS, MAIL_POLL_INTERVAL_SECONDS
+)
+from app.core.database import mail_outbox_collection
+
+# --- OUTBOX STATES ---
+# queued -> sending -> sent, or back to queued with a later `nextAttemptAt`
+# until the attempts run out (failed). A sender that dies mid-batch leaves its
+# lease to expire, and the messages are picked up again.
+MAIL_QUEUED = "queued"
+MAIL_SENDING = "sending"
+MAIL_SENT = "sent"
+MAIL_FAILED = "failed"
+
+# A message is only started with this much of the lease left: sending it takes
+# several SMTP round trips, each allowed MAIL_TIMEOUT_SECONDS
+SEND_MARGIN_SECONDS = 4 * MAIL_TIMEOUT_SECONDS
+
+class MailDeferred(Exception):
+    # Not attempted before the lease ran short; queued again at no cost
+    pass
+
+def mail_configured() -> bool:
+    # Credentials are required unless the server is a local relay without TLS
+    # (MAIL_STARTTLS=false, e.g. aiosmtpd while testing)
+    return bool(MAIL_SERVER) and (bool(MAIL_USERNAME and MAIL_PASSWORD) or not MAIL_STARTTLS)
+
+
+# --- ENQUEUE ---
+async def enqueue_email(to_email: str, subject: str, body: str):
+    # Handlers only persist the message; delivery happens in the background
+    result = await mail_outbox_collection.insert_one({
+        "to": to_email,
+        "subject": subject,
+        "body": body,
+        "state": MAIL_QUEUED,
+        "attempts": 0,
+        "nextAttemptAt": datetime.utcnow(),
+        "createdAt": datetime.utcnow()
+    })
+    mail_sender.wake()
+    return result.inserted_id
+
+def build_message(mail: dict) -> MIMEMultipart:
+    msg = MIMEMultipart()
+    msg["From"] = MAIL_FROM
+    msg["To"] = mail["to"]
+    msg["Subject"] = mail["subject"]
+    msg.attach(MIMEText(mail["body"], "plain"))
+    return msg
+
+
+# --- SMTP CONNECTION ---
+# One long-lived connection per sender worker. It is opened on first use,
+# reused across batches, checked with NOOP after sitting idle, and dropped
+# after any transport error so the next send reconnects.
+class SmtpConnection:
+    def __init__(self):
+        self._server = None
+        self._last_used = 0.0
+
+    def send_batch(self, mails: list, deadline: float) -> list:
+        # Runs in a worker thread; returns one error (or None) per message.
+        # `deadline` (time.monotonic) is when the batch's lease runs out: past
+        # it another sender may claim the messages, so none is started late
+        outcomes = []
+        for mail in mails:
+            if time.monotonic() + SEND_MARGIN_SECONDS > deadline:
+                outcomes.extend([MailDeferred("lease ran short")] * (len(mails) - len(outcomes)))
+                break
+            try:
+                self._ensure_connected()
+                self._server.send_message(build_message(mail))
+                outcomes.append(None)
+            except Exception as e:
+                outcomes.append(e)
+                if not _is_permanent(e):
+                    # The server is unreachable or dropped us; the rest of the
+                    # batch is retried later instead of timing out one by one
+                    self.close()
+                    outcomes.extend([e] * (len(mails) - len(outcomes)))
+                    break
+            finally:
+                self._last_used = time.monotonic()
+        return outcomes
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+    def close_if_idle(self):
+        if self._server is not None and time.monotonic() - self._last_used > MAIL_IDLE_SECONDS:
+            self.close()
+
+    def _ensure_connected(self):
+        if self._server is not None:
+            try:
+                if self._server.noop()[0] == 250:
+                    return
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.close()
+
+        server = smtplib.SMTP(MAIL_SERVER, MAIL_PORT, timeout=MAIL_TIMEOUT_SECONDS)
+        try:
+            if MAIL_STARTTLS:
+                server.starttls()
+            if MAIL_USERNAME and MAIL_PASSWORD:
+                server.login(MAIL_USERNAME, MAIL_PASSWORD)
+        except Exception:
+            server.close()
+            raise
+        self._server = server
+
+def _is_permanent(error: Exception) -> bool:
+    # 5xx replies and refused recipients will fail the same way on every retry
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600 and not isinstance(error, smtplib.SMTPAuthenticationError)
+
+
+# --- OUTBOX OPERATIONS ---
+async def claim_mail_batch(worker_id: str, limit: int = MAIL_BATCH_SIZE) -> list:
+    now = datetime.utcnow()
+    due = await mail_outbox_collection.find(
+        {
+            "$or": [
+                {"state": MAIL_QUEUED, "nextAttemptAt": {"$lte": now}},
+                {"state": MAIL_SENDING, "leaseExpiresAt": {"$lt": now}}
+            ]
+        },
+        {"_id": 1}
+    ).sort("nextAttemptAt", 1).limit(limit).to_list(length=limit)
+    if not due:
+        return []
+
+    # Re-checking the state in the update keeps two senders from leasing the same message
+    await mail_outbox_collection.update_many(
+        {
+            "_id": {"$in": [mail["_id"] for mail in due]},
+            "$or": [{"state": MAIL_QUEUED}, {"state": MAIL_SENDING, "leaseExpiresAt": {"$lt": now}}]
+        },
+        {
+            "$set": {"state": MAIL_SENDING, "workerId": worker_id, "leaseExpiresAt": now + timedelta(seconds=MAIL_LEASE_SECONDS)},
+            "$inc": {"attempts": 1}
+        }
+    )
+    return await mail_outbox_collection.find({"workerId": worker_id, "state": MAIL_SENDING}).to_list(length=limit)
+
+def retry_delay(attempts: int) -> float:
+    return min(MAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), MAIL_RETRY_MAX_SECONDS)
+
+async def record_outcomes(mails: list, outcomes: list):
+    now = datetime.utcnow()
+    operations = []
+    for mail, error in zip(mails, outcomes):
+        owned = {"_id": mail["_id"], "workerId": mail["workerId"]}
+        if isinstance(error, MailDeferred):
+            update = {
+                "$set": {"state": MAIL_QUEUED, "nextAttemptAt": now},
+                "$unset": {"workerId": "", "leaseExpiresAt": ""},
+                "$inc": {"attempts": -1}
+            }
+        elif error is None:
+            update = {"$set": {"state": MAIL_SENT, "sentAt": now}, "$unset": {"workerId": "", "leaseExpiresAt": "", "lastError": ""}}
+        elif _is_permanent(error) or mail["attempts"] >= MAIL_MAX_ATTEMPTS:
+            update = {"$set": {"state": MAIL_FAILED, "lastError": str(error)}, "$unset": {"workerId": "", "leaseExpiresAt": ""}}
+        else:
+            update = {
+                "$set": {
+                    "state": MAIL_QUEUED,
+                    "lastError": str(error),
+                    "nextAttemptAt": now + timedelta(seconds=retry_delay(mail["attempts"]))
+                },
+                "$unset": {"workerId": "", "leaseExpiresAt": ""}
+            }
+        operations.append(UpdateOne(owned, update))
+    if operations:
+        await mail_outbox_collection.bulk_write(operations, ordered=False)
+
+
+# --- BACKGROUND SENDER ---
+class MailSender:
+    def __init__(self, connections: int = MAIL_CONNECTIONS):
+        self.connections = connections
+        self._tasks = []
+        self._wakeup = None
+
+    def start(self):
+        if not mail_configured():
+            print("❌ Email is not configured (MAIL_USERNAME / MAIL_PASSWORD): queued mail cannot be delivered.")
+        self._wakeup = asyncio.Event()
+        prefix = f"mail:{socket.gethostname()}:{os.getpid()}"
+        self._tasks = [
+            asyncio.create_task(self._work(f"{prefix}:{i}", SmtpConnection()))
+            for i in range(self.connections)
+        ]
+        if self._tasks:
+            print(f"📮 Started {self.connections} mail sender(s).")
+
+    def wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self, worker_id: str, connection: SmtpConnection):
+        try:
+            while True:
+                try:
+                    mails = await claim_mail_batch(worker_id)
+                    if mails:
+                        deadline = time.monotonic() + MAIL_LEASE_SECONDS
+                        outcomes = await run_in_threadpool(connection.send_batch, mails, deadline)
+                        await record_outcomes(mails, outcomes)
+                        for mail, error in zip(mails, outcomes):
+                            if error is not None and not isinstance(error, MailDeferred):
+                                print(f"EMAIL ERROR: {mail['to']} (attempt {mail['attempts']}): {error}")
+                        continue
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"Mail Sender Error: {e}")
+
+                await run_in_threadpool(connection.close_if_idle)
+                await self._wait()
+        finally:
+            connection.close()
+
+    async def _wait(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), MAIL_POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+mail_sender = MailSender()
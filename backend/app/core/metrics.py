@@ -0,0 +1,277 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+# --- METRIC TYPES ---
+# A small in-process implementation of the Prometheus text exposition format,
+# enough for counters, gauges and histograms with fixed label names. Metrics
+# are updated from the event loop and from executor threads, so every update
+# takes the metric's lock.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _label_text(self, values, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{self._label_text(values)} {_number(value)}")
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for values, (counts, total, count) in sorted(self._values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{self._label_text(values, _le(bound))} {bucket_count}")
+                lines.append(f"{self.name}_bucket{self._label_text(values, _le('+Inf'))} {count}")
+                lines.append(f"{self.name}_sum{self._label_text(values)} {_number(total)}")
+                lines.append(f"{self.name}_count{self._label_text(values)} {count}")
+        return lines
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _le(bound) -> str:
+    return f'le="{_number(bound)}"'
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+REGISTRY = []
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- APPLICATION METRICS ---
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route and status code.", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served.", ("method",))
+SPAN_LATENCY = Histogram("span_duration_seconds", "Time spent in instrumented stages (decode, predict, mongo, ...).", ("span",))
+MONGO_LATENCY = Histogram("mongo_command_duration_seconds", "MongoDB command latency.", ("command", "outcome"))
+MONGO_POOL_CONNECTIONS = Gauge("mongo_pool_connections", "Open pooled MongoDB connections.", ("address",))
+MONGO_POOL_IN_USE = Gauge("mongo_pool_connections_in_use", "Pooled MongoDB connections checked out.", ("address",))
+MONGO_POOL_WAIT = Histogram("mongo_pool_checkout_wait_seconds", "Time spent waiting for a pooled MongoDB connection.", ("address",))
+MONGO_POOL_FAILURES = Counter("mongo_pool_checkout_failures_total", "Failed MongoDB connection checkouts by reason.", ("address", "reason"))
+
+
+# --- TIMING SPANS ---
+# Every span feeds SPAN_LATENCY. While a profiled request is running, spans
+# are also summed into its breakdown; the context variable follows the request
+# into executor threads because InferenceExecutor, run_in_threadpool and Motor
+# all copy the caller's context.
+_profile = contextvars.ContextVar("profile", default=None)
+
+def record_span(name: str, seconds: float):
+    SPAN_LATENCY.observe(seconds, name)
+    _add_to_profile(name, seconds)
+
+def _add_to_profile(name: str, seconds: float):
+    profile = _profile.get()
+    if profile is not None:
+        total, count = profile.get(name, (0.0, 0))
+        profile[name] = (total + seconds, count + 1)
+
+@contextmanager
+def span(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+# --- MONGO TIMINGS ---
+class MongoCommandTimer(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, "ok")
+
+    def failed(self, event):
+        self._record(event, "error")
+
+    def _record(self, event, outcome: str):
+        seconds = event.duration_micros / 1_000_000
+        MONGO_LATENCY.observe(seconds, event.command_name, outcome)
+        _add_to_profile("mongo", seconds)
+
+
+# --- MONGO CONNECTION POOL ---
+# Feeds the pool gauges and keeps a per-server snapshot for /health. A
+# checkout that times out means every pooled connection was busy for
+# MONGO_WAIT_QUEUE_TIMEOUT_MS; that is logged (at most every
+# POOL_WARNING_INTERVAL seconds) since it is the first sign that workers x
+# pool size no longer matches the load.
+POOL_WARNING_INTERVAL = 10
+
+class MongoPoolMonitor(monitoring.ConnectionPoolListener):
+    def __init__(self, max_pool_size: int = None):
+        self.max_pool_size = max_pool_size
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._last_warning = 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {address: dict(stats) for address, stats in self._pools.items()}
+
+    def _update(self, event, field: str, amount: int = 1) -> dict:
+        address = _address(event.address)
+        with self._lock:
+            stats = self._pools.setdefault(address, {"connections": 0, "inUse": 0, "checkoutFailures": 0})
+            stats[field] += amount
+            return dict(stats)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        print(f"⚠️ MongoDB connection pool cleared for {_address(event.address)}")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._update(event, "connections")
+        MONGO_POOL_CONNECTIONS.inc(_address(event.address))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._update(event, "connections", -1)
+        MONGO_POOL_CONNECTIONS.dec(_address(event.address))
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_checked_out(self, event):
+        self._update(event, "inUse")
+        MONGO_POOL_IN_USE.inc(_address(event.address))
+        if getattr(event, "duration", None) is not None:
+            MONGO_POOL_WAIT.observe(event.duration, _address(event.address))
+
+    def connection_checked_in(self, event):
+        self._update(event, "inUse", -1)
+        MONGO_POOL_IN_USE.dec(_address(event.address))
+
+    def connection_check_out_failed(self, event):
+        stats = self._update(event, "checkoutFailures")
+        MONGO_POOL_FAILURES.inc(_address(event.address), event.reason)
+        now = time.monotonic()
+        if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT and now - self._last_warning > POOL_WARNING_INTERVAL:
+            self._last_warning = now
+            print(f"⚠️ MongoDB connection pool exhausted for {_address(event.address)}: "
+                  f"{stats['inUse']}/{self.max_pool_size} connections in use")
+
+def _address(address) -> str:
+    host, port = address
+    return f"{host}:{port}"
+
+
+# --- ASGI MIDDLEWARE ---
+PROFILE_HEADER = b"x-profile"
+
+class MetricsMiddleware:
+    # Records latency and status per route template (e.g. /api/doctor/process-scan/{scan_id}),
+    # so raw ids never become label values. Requests sent with `X-Profile: 1`
+    # get their span breakdown back in a Server-Timing header.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        profile = {} if (PROFILE_HEADER, b"1") in scope.get("headers", []) else None
+        token = _profile.set(profile)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if profile is not None:
+                    timing = _server_timing(profile, time.perf_counter() - start)
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(method)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec(method)
+            _profile.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_LATENCY.observe(time.perf_counter() - start, method, route_path)
+            HTTP_REQUESTS.inc(method, route_path, str(status_code))
+
+def _server_timing(profile: dict, elapsed: float) -> str:
+    entries = [f'{name};dur={total * 1000:.2f};desc="x{count}"' for name, (total, count) in profile.items()]
+    entries.append(f"total;dur={elapsed * 1000:.2f}")
+    return ", ".join(entries)
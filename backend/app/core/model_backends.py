@@ -0,0 +1,137 @@
+import os
+import threading
+
+import numpy as np
+
+from app.core.config import MODEL_BACKEND, MODEL_NUM_THREADS
+
+# --- INFERENCE BACKENDS ---
+# Every backend loads one model file and exposes `predict(batch) -> probabilities`
+# for a float32 NHWC batch. Runtimes are imported only when a backend is built,
+# so a TFLite or ONNX deployment never has to import TensorFlow.
+# Backends that can differentiate through the model set `supports_heatmaps`
+# and add `predict_with_heatmaps(batch) -> (probabilities, heatmaps)`.
+
+class KerasBackend:
+    name = "keras"
+
+    def __init__(self, path: str):
+        import tensorflow as tf
+
+        if MODEL_NUM_THREADS:
+            tf.config.threading.set_intra_op_parallelism_threads(MODEL_NUM_THREADS)
+        self.model = tf.keras.models.load_model(path)
+        self._explainer = self._build_explainer()
+        self.supports_heatmaps = self._explainer is not None
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        # Calling the model directly skips predict()'s per-call dataset and
+        # callback setup, which dominates at micro-batch sizes
+        return np.asarray(self.model(batch, training=False))
+
+    def _build_explainer(self):
+        # A second view of the same graph that also returns the last
+        # convolutional feature maps (the last layer with a 4-D output)
+        import tensorflow as tf
+
+        try:
+            conv_layer = next(layer for layer in reversed(self.model.layers) if len(layer.output.shape) == 4)
+            return tf.keras.Model(self.model.inputs, [conv_layer.output, self.model.output])
+        except Exception as e:
+            print(f"⚠️ Grad-CAM unavailable for this model: {e}")
+            return None
+
+    def predict_with_heatmaps(self, batch: np.ndarray):
+        # Grad-CAM for the whole batch in one forward and one backward pass.
+        # Rows are independent, so the gradient of the summed top-class scores
+        # gives every row the gradient of its own score.
+        import tensorflow as tf
+
+        with tf.GradientTape() as tape:
+            features, predictions = self._explainer(batch, training=False)
+            top_scores = tf.gather(predictions, tf.argmax(predictions, axis=1), axis=1, batch_dims=1)
+        gradients = tape.gradient(top_scores, features)
+
+        weights = tf.reduce_mean(gradients, axis=(1, 2))
+        heatmaps = tf.nn.relu(tf.einsum("bhwc,bc->bhw", features, weights))
+        heatmaps = heatmaps / (tf.reduce_max(heatmaps, axis=(1, 2), keepdims=True) + 1e-8)
+        return np.asarray(predictions), np.asarray(heatmaps)
+
+
+class TFLiteBackend:
+    name = "tflite"
+    supports_heatmaps = False
+
+    def __init__(self, path: str):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.interpreter = Interpreter(model_path=path, num_threads=MODEL_NUM_THREADS)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+        # The interpreter holds mutable tensor buffers, so one invoke at a time
+        self._lock = threading.Lock()
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input["index"], batch.shape)
+                self.interpreter.allocate_tensors()
+                self._input = self.interpreter.get_input_details()[0]
+                self._output = self.interpreter.get_output_details()[0]
+                self._batch_size = batch.shape[0]
+
+            self.interpreter.set_tensor(self._input["index"], _quantize(batch, self._input))
+            self.interpreter.invoke()
+            return _dequantize(self.interpreter.get_tensor(self._output["index"]), self._output)
+
+
+class OnnxBackend:
+    name = "onnx"
+    supports_heatmaps = False
+
+    def __init__(self, path: str):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if MODEL_NUM_THREADS:
+            options.intra_op_num_threads = MODEL_NUM_THREADS
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self._input_name: batch})[0]
+
+
+BACKENDS = {backend.name: backend for backend in (KerasBackend, TFLiteBackend, OnnxBackend)}
+EXTENSIONS = {".h5": "keras", ".keras": "keras", ".tflite": "tflite", ".onnx": "onnx"}
+
+def backend_name_for(path: str, name: str = MODEL_BACKEND) -> str:
+    if name and name != "auto":
+        return name
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in EXTENSIONS:
+        raise ValueError(f"Cannot infer a model backend for '{path}'. Set MODEL_BACKEND.")
+    return EXTENSIONS[extension]
+
+def load_backend(path: str, name: str = MODEL_BACKEND):
+    return BACKENDS[backend_name_for(path, name)](path)
+
+# --- INT8 HELPERS ---
+def _quantize(batch: np.ndarray, details: dict) -> np.ndarray:
+    if details["dtype"] == np.float32:
+        return batch
+    scale, zero_point = details["quantization"]
+    info = np.iinfo(details["dtype"])
+    return np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(details["dtype"])
+
+def _dequantize(output: np.ndarray, details: dict) -> np.ndarray:
+    if details["dtype"] == np.float32:
+        return output
+    scale, zero_point = details["quantization"]
+    return (output.astype(np.float32) - zero_point) * scale
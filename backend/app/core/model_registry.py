@@ -0,0 +1,132 @@
+import asyncio
+import os
+from datetime import datetime
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import MODEL_PATH, INFERENCE_MODE
+from app.core.hashing import hash_file
+from app.core.model_backends import load_backend
+from app.core.preprocessing import MODEL_INPUT_SHAPE
+
+MODEL_DIR = os.path.dirname(MODEL_PATH) or "."
+
+def model_version_for(path: str) -> str:
+    # Content-derived, so the same weights get the same version on every machine
+    return hash_file(path)[:12]
+
+# --- MODEL REGISTRY ---
+# Owns the live model. Runtimes (TensorFlow, TFLite, ONNX Runtime) are only
+# imported when a model is actually loaded, so importing the app (tests,
+# admin-only workers) stays cheap. The backend and its version are published
+# together as one tuple, so a hot swap is a single reference assignment and
+# every prediction is tagged with the version that actually produced it.
+class ModelRegistry:
+    def __init__(self, model_path: str = MODEL_PATH):
+        self.model_path = model_path
+        self.state = "not_loaded"
+        self.error = None
+        self.loaded_at = None
+        self._current = None
+        self._lock = asyncio.Lock()
+        self._load_task = None
+
+    @property
+    def ready(self) -> bool:
+        return self._current is not None
+
+    @property
+    def version(self):
+        return self._current[1] if self._current else None
+
+    @property
+    def backend(self):
+        return self._current[0].name if self._current else None
+
+    @property
+    def supports_heatmaps(self) -> bool:
+        return bool(self._current and getattr(self._current[0], "supports_heatmaps", False))
+
+    def predict(self, batch: np.ndarray):
+        backend, version = self._current
+        return backend.predict(batch), version
+
+    def predict_with_heatmaps(self, batch: np.ndarray):
+        # A model swapped in while the batch was queued may not support
+        # heatmaps; its predictions are returned without them
+        backend, version = self._current
+        if not getattr(backend, "supports_heatmaps", False):
+            return backend.predict(batch), None, version
+        predictions, heatmaps = backend.predict_with_heatmaps(batch)
+        return predictions, heatmaps, version
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "ready": self.ready,
+            "version": self.version,
+            "backend": self.backend,
+            "heatmaps": self.supports_heatmaps,
+            "path": self.model_path,
+            "loadedAt": self.loaded_at,
+            "error": self.error
+        }
+
+    async def load(self, path: str = None) -> str:
+        path = path or self.model_path
+        if not os.path.exists(path):
+            self.error = f"AI Model file not found at: {path}"
+            if not self.ready:
+                self.state = "failed"
+            raise FileNotFoundError(self.error)
+
+        async with self._lock:
+            if not self.ready:
+                self.state = "loading"
+            try:
+                backend, version = await run_in_threadpool(self._load_and_warm_up, path)
+            except Exception as e:
+                # A failed hot swap keeps serving the previous model
+                self.error = str(e)
+                self.state = "ready" if self.ready else "failed"
+                raise
+
+            self._current = (backend, version)
+            self.model_path = path
+            self.state = "ready"
+            self.error = None
+            self.loaded_at = datetime.utcnow().isoformat()
+            print(f"✅ AI Model Loaded Successfully! (version {version}, {backend.name} backend)")
+            return version
+
+    def start_background_load(self):
+        async def load_quietly():
+            try:
+                await self.load()
+            except Exception as e:
+                print(f"⚠️ AI Model Loading Error: {e}")
+
+        self._load_task = asyncio.create_task(load_quietly())
+
+    async def stop(self):
+        if self._load_task is not None and not self._load_task.done():
+            self._load_task.cancel()
+            await asyncio.gather(self._load_task, return_exceptions=True)
+
+    def _load_and_warm_up(self, path: str):
+        backend = load_backend(path)
+        # The first call builds the graph / allocates tensors; pay for it here, not on a scan
+        backend.predict(np.zeros((1,) + MODEL_INPUT_SHAPE, dtype=np.float32))
+        return backend, model_version_for(path)
+
+if INFERENCE_MODE == "remote":
+    # The model lives in the inference service (scripts/serve.py); this
+    # process mirrors its status and never imports a runtime
+    from app.core.inference_remote import RemoteInferenceEngine, RemoteModelRegistry
+
+    remote_engine = RemoteInferenceEngine()
+    model_registry = RemoteModelRegistry(remote_engine)
+else:
+    remote_engine = None
+    model_registry = ModelRegistry()
@@ -0,0 +1,24 @@
+from bson import ObjectId
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# --- KEYSET PAGINATION ---
+# Pages are ordered newest first by `_id`; the cursor is the `_id` of the last
+# document on the previous page. Unlike skip/limit, every page costs the same
+# index seek no matter how deep it is.
+def keyset_query(query: dict, after: str = None) -> dict:
+    if after is None:
+        return query
+    if not ObjectId.is_valid(after):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+    return {**query, "_id": {"$lt": ObjectId(after)}}
+
+async def fetch_page(collection, query: dict, projection: dict, limit: int, after: str = None):
+    # One extra document tells us whether another page exists
+    cursor = collection.find(keyset_query(query, after), projection).sort("_id", -1).limit(limit + 1)
+    docs = await cursor.to_list(length=limit + 1)
+
+    next_cursor = str(docs[limit - 1]["_id"]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
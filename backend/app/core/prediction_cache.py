@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime
+
+from app.core.cache import TTLCache
+from app.core.config import PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL_SECONDS
+from app.core.database import prediction_collection
+
+
+# --- TWO-TIER PREDICTION CACHE ---
+# Results are keyed by (image content hash, model version): an in-process LRU
+# answers repeat requests without I/O, and the `predictions` collection shares
+# results across workers and restarts. Concurrent requests for the same key
+# wait on the one computation already in flight. A request that needs a
+# heatmap only accepts a cached result that has one; results are merged into
+# the stored entry, so a later plain run never drops a stored heatmap.
+# Stored entries carry `lastUsedAt`, refreshed on every read from Mongo, and
+# expire through a TTL index once unused for PREDICTION_STORE_TTL_DAYS.
+class PredictionCache:
+    def __init__(self, max_entries: int = PREDICTION_CACHE_SIZE, ttl_seconds: float = PREDICTION_CACHE_TTL_SECONDS):
+        self._memory = TTLCache(max_entries, ttl_seconds)
+        self._inflight = {}
+
+    async def get(self, image_hash: str, model_version: str):
+        key = (image_hash, model_version)
+        result = self._memory.get(key)
+        if result is not None:
+            return result
+
+        doc = await prediction_collection.find_one_and_update(
+            {"imageHash": image_hash, "modelVersion": model_version},
+            {"$set": {"lastUsedAt": datetime.utcnow()}},
+            projection={"_id": 0, "result": 1}
+        )
+        if doc is None:
+            return None
+
+        result = {**doc["result"], "modelVersion": model_version}
+        self._memory.set(key, result)
+        return result
+
+    async def set(self, image_hash: str, model_version: str, result: dict):
+        key = (image_hash, model_version)
+        self._memory.set(key, {**(self._memory.get(key) or {}), **result})
+        await prediction_collection.update_one(
+            {"imageHash": image_hash, "modelVersion": model_version},
+            {"$set": {
+                **{f"result.{field}": value for field, value in result.items()},
+                "createdAt": datetime.utcnow(),
+                "lastUsedAt": datetime.utcnow()
+            }},
+            upsert=True
+        )
+
+    async def get_or_compute(self, image_hash: str, model_version: str, compute, explain: bool = False):
+        result = await self.get(image_hash, model_version)
+        if result is not None and (not explain or result.get("heatmapPath")):
+            return result
+
+        # Shielded so a caller that times out does not cancel the computation
+        # other callers are waiting on
+        key = (image_hash, model_version, explain)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._compute_and_store(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        return await asyncio.shield(task)
+
+    async def _compute_and_store(self, key, compute):
+        # Stored under the version that actually produced the result, in case
+        # the model was hot-swapped while this request was queued
+        result = await compute()
+        await self.set(key[0], result.get("modelVersion", key[1]), result)
+        return result
+
+    def _forget(self, key, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()
+
+async def backfill_prediction_usage() -> int:
+    # Entries stored before `lastUsedAt` existed would never expire; they get
+    # one full TTL period from now
+    result = await prediction_collection.update_many(
+        {"lastUsedAt": {"$exists": False}},
+        {"$set": {"lastUsedAt": datetime.utcnow()}}
+    )
+    return result.modified_count
@@ -0,0 +1,33 @@
+import numpy as np
+from PIL import Image
+
+from app.core.metrics import span
+
+MODEL_INPUT_SIZE = (224, 224)
+MODEL_INPUT_SHAPE = (MODEL_INPUT_SIZE[1], MODEL_INPUT_SIZE[0], 3)
+
+_SCALE = np.float32(1 / 255)
+
+# --- MODEL INPUT PREPROCESSING ---
+def open_for_model(image_path: str) -> Image.Image:
+    # draft() lets the JPEG decoder downscale in the DCT domain (by 1/2, 1/4 or
+    # 1/8) to the smallest size still >= 224x224, so a 12 MP phone photo is
+    # never fully decoded. It is a no-op for PNG/WebP.
+    with Image.open(image_path) as img:
+        img.draft("RGB", MODEL_INPUT_SIZE)
+        return img.convert("RGB")
+
+def to_model_input(img: Image.Image, out: np.ndarray = None) -> np.ndarray:
+    # Scaled pixels are written straight into a float32 buffer instead of the
+    # float64 temporary that `np.array(img) / 255.0` allocates
+    img = img.resize(MODEL_INPUT_SIZE, Image.Resampling.BICUBIC)
+    if out is None:
+        out = np.empty(MODEL_INPUT_SHAPE, dtype=np.float32)
+    np.multiply(np.asarray(img), _SCALE, out=out)
+    return out
+
+def load_model_input(image_path: str, out: np.ndarray = None) -> np.ndarray:
+    with span("decode"):
+        img = open_for_model(image_path)
+    with span("resize"):
+        return to_model_input(img, out=out)
@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta
+
+from pymongo.errors import PyMongoError
+
+from app.core.database import for_listings, stage_history_collection
+from app.core.inference import CLASS_NAMES
+
+# --- STAGE HISTORY ---
+# `stage_history` is a time-series collection with one point per completed
+# analysis: {date, meta: {patientName, patientId, doctorName, doctorId}, scanId, stage (1-7),
+# confidence, modelVersion, recordedAt}. `date` is when the scan was taken,
+# so a patient's points line up as their progression. Points are only ever
+# appended: re-analysing or re-scoring a scan adds a newer point for the same
+# scanId, and every query keeps the latest one per scan.
+STAGE_HISTORY_TIMESERIES = {"timeField": "date", "metaField": "meta", "granularity": "hours"}
+TREND_UNITS = ("day", "week", "month", "quarter", "year")
+
+def stage_number(stage_name: str):
+    # "Norwood Stage 3" -> 3; None for results that are not a Norwood stage
+    return CLASS_NAMES.index(stage_name) + 1 if stage_name in CLASS_NAMES else None
+
+def _scan_date(scan: dict) -> datetime:
+    # Scan dates are stored as UTC ISO strings
+    try:
+        return datetime.fromisoformat(scan["date"])
+    except (KeyError, TypeError, ValueError):
+        return datetime.utcnow()
+
+def stage_point(scan: dict, recorded_at: datetime = None):
+    # The history point for a processed scan, or None when it has no stage
+    stage = stage_number(scan.get("baldnessStage"))
+    if stage is None:
+        return None
+    return {
+        "date": _scan_date(scan),
+        "meta": {
+            "patientName": scan.get("patientName"), "patientId": scan.get("patientId"),
+            "doctorName": scan.get("doctorName"), "doctorId": scan.get("doctorId")
+        },
+        "scanId": str(scan["_id"]),
+        "stage": stage,
+        "confidence": scan.get("confidence"),
+        "modelVersion": scan.get("modelVersion"),
+        "recordedAt": recorded_at or datetime.utcnow()
+    }
+
+async def record_stage_points(scans: list):
+    # Like the dashboard counters, a failed write never fails the request;
+    # scripts/backfill_stage_history.py fills the gaps
+    points = [point for point in map(stage_point, scans) if point]
+    if not points:
+        return
+    try:
+        await stage_history_collection.insert_many(points, ordered=False)
+    except PyMongoError as e:
+        print(f"⚠️ Stage history update failed: {e}")
+
+
+# --- AGGREGATIONS ---
+# Both queries start from the same stages: select the window and keep each
+# scan's latest point. The database does the bucketing and the diffing, so a
+# dashboard receives a few dozen rows however many scans a panel holds.
+def history_scope(patient_name: str = None, doctor_name: str = None) -> dict:
+    scope = {}
+    if patient_name:
+        scope["meta.patientName"] = patient_name
+    if doctor_name:
+        scope["meta.doctorName"] = doctor_name
+    return scope
+
+def _latest_points(scope: dict, days: int, min_confidence: float = 0) -> list:
+    match = {**scope, "date": {"$gte": datetime.utcnow() - timedelta(days=days)}}
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"recordedAt": 1}},
+        {"$group": {
+            "_id": "$scanId",
+            "date": {"$last": "$date"},
+            "patientName": {"$last": "$meta.patientName"},
+            "stage": {"$last": "$stage"},
+            "confidence": {"$last": "$confidence"},
+            "modelVersion": {"$last": "$modelVersion"}
+        }}
+    ]
+    # Filtered after the grouping: a scan whose latest analysis is below the
+    # threshold drops out instead of falling back to an older, confident one
+    if min_confidence:
+        pipeline.append({"$match": {"confidence": {"$gte": min_confidence}}})
+    return pipeline
+
+async def stage_trend(scope: dict, unit: str = "month", days: int = 365) -> list:
+    # One row per period. Each patient is averaged first, so a patient with
+    # many scans in a period does not outweigh the rest of a panel
+    period = {"$dateTrunc": {"date": "$date", "unit": unit, "startOfWeek": "monday"}}
+    pipeline = _latest_points(scope, days) + [
+        {"$group": {
+            "_id": {"period": period, "patientName": "$patientName"},
+            "stage": {"$avg": "$stage"},
+            "minStage": {"$min": "$stage"},
+            "maxStage": {"$max": "$stage"},
+            "confidence": {"$avg": "$confidence"},
+            "scans": {"$sum": 1}
+        }},
+        {"$group": {
+            "_id": "$_id.period",
+            "averageStage": {"$avg": "$stage"},
+            "minStage": {"$min": "$minStage"},
+            "maxStage": {"$max": "$maxStage"},
+            "averageConfidence": {"$avg": "$confidence"},
+            "scans": {"$sum": "$scans"},
+            "patients": {"$sum": 1}
+        }},
+        {"$sort": {"_id": 1}},
+        {"$project": {
+            "_id": 0,
+            "period": "$_id",
+            "averageStage": {"$round": ["$averageStage", 2]},
+            "minStage": 1,
+            "maxStage": 1,
+            "averageConfidence": {"$round": ["$averageConfidence", 4]},
+            "scans": 1,
+            "patients": 1
+        }}
+    ]
+    return await for_listings(stage_history_collection).aggregate(pipeline).to_list(length=None)
+
+async def stage_changes(scope: dict, days: int = 365, min_confidence: float = 0, limit: int = 50) -> list:
+    # Scans whose stage differs from the same patient's previous scan, newest
+    # first. min_confidence drops borderline predictions before comparing, so
+    # a scan flickering between two stages does not read as progression
+    pipeline = _latest_points(scope, days, min_confidence) + [
+        {"$setWindowFields": {
+            "partitionBy": "$patientName",
+            "sortBy": {"date": 1},
+            "output": {
+                "previousStage": {"$shift": {"output": "$stage", "by": -1}},
+                "previousDate": {"$shift": {"output": "$date", "by": -1}}
+            }
+        }},
+        {"$match": {"previousStage": {"$ne": None}, "$expr": {"$ne": ["$stage", "$previousStage"]}}},
+        {"$sort": {"date": -1}},
+        {"$limit": limit},
+        {"$project": {
+            "_id": 0,
+            "scanId": "$_id",
+            "patientName": 1,
+            "date": 1,
+            "previousDate": 1,
+            "fromStage": "$previousStage",
+            "toStage": "$stage",
+            "change": {"$subtract": ["$stage", "$previousStage"]},
+            "confidence": 1,
+            "modelVersion": 1
+        }}
+    ]
+    return await for_listings(stage_history_collection).aggregate(pipeline).to_list(length=limit)
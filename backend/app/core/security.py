@@ -0,0 +1,135 @@
+import asyncio
+import base64
+import contextvars
+import hashlib
+import hmac
+import re
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+from app.core.config import (
+    PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P,
+    PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING
+)
+from app.core.database import user_collection
+from app.core.metrics import span
+
+SCHEME = "scrypt"
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+# --- PASSWORD HASHING ---
+# Hashes are stored as "scrypt$N$r$p$salt$key" (base64 salt and key), so the
+# cost can be raised later without breaking existing records. Records not of
+# that exact shape are legacy plaintext (even one that happens to start with
+# "scrypt$"); they still verify, and are flagged for rehashing.
+_B64 = r"(?:[A-Za-z0-9+/]{4})*(?:[A-Za-z0-9+/]{2}==|[A-Za-z0-9+/]{3}=|[A-Za-z0-9+/]{4})"
+HASH_PATTERN = re.compile(rf"^{SCHEME}\$[1-9][0-9]*\$[1-9][0-9]*\$[1-9][0-9]*\${_B64}\${_B64}$")
+
+def is_hashed(stored: str) -> bool:
+    return HASH_PATTERN.match(stored) is not None
+
+def _encode(raw: bytes) -> str:
+    return base64.b64encode(raw).decode("ascii")
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    # hashlib.scrypt releases the GIL, so pool threads hash in parallel
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=KEY_BYTES)
+
+def hash_password(password: str) -> str:
+    salt = secrets.token_bytes(SALT_BYTES)
+    key = _scrypt(password, salt, PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+    return f"{SCHEME}${PASSWORD_SCRYPT_N}${PASSWORD_SCRYPT_R}${PASSWORD_SCRYPT_P}${_encode(salt)}${_encode(key)}"
+
+def verify_password(password: str, stored: str):
+    # Returns (matches, needs_rehash)
+    if is_hashed(stored):
+        _, n, r, p, salt, key = stored.split("$")
+        n, r, p = int(n), int(r), int(p)
+        try:
+            matches = hmac.compare_digest(_scrypt(password, base64.b64decode(salt), n, r, p), base64.b64decode(key))
+            return matches, (n, r, p) != (PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+        except ValueError:
+            # Hash-shaped, but parameters scrypt rejects: not one of ours
+            pass
+    return hmac.compare_digest(password.encode(), stored.encode()), True
+
+# Verifying against this when the email is unknown keeps the response time
+# from revealing which emails are registered
+_DUMMY_HASH = None
+
+
+# --- HASHING POOL ---
+# Each hash costs tens of milliseconds of CPU, so it never runs on the event
+# loop. The pool is bounded, and once `max_pending` hashes are waiting new
+# logins are turned away with 503 instead of queueing without limit.
+class PasswordHasher:
+    def __init__(self, max_workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._pool = None
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            raise HTTPException(status_code=503, detail="Too many sign-in attempts in progress. Please retry shortly.")
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password")
+
+        self.pending += 1
+        try:
+            context = contextvars.copy_context()
+            with span("password_hash"):
+                return await asyncio.get_running_loop().run_in_executor(self._pool, context.run, fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, stored: str):
+        return await self._run(verify_password, password, stored)
+
+    async def verify_unknown_user(self, password: str):
+        global _DUMMY_HASH
+        if _DUMMY_HASH is None:
+            _DUMMY_HASH = await self.hash(secrets.token_urlsafe(16))
+        await self.verify(password, _DUMMY_HASH)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+password_hasher = PasswordHasher()
+
+
+# --- USER LOOKUP ---
+# Every login reads the account from Mongo (one indexed point read, small next
+# to the scrypt verify). Nothing about credentials or account status is cached
+# per process, so a password reset, rejection or deletion made through any
+# worker applies to the next login on all of them.
+AUTH_USER_FIELDS = {"email": 1, "password": 1, "role": 1, "status": 1, "fullName": 1}
+
+async def find_user_by_email(email: str):
+    return await user_collection.find_one({"email": email}, AUTH_USER_FIELDS)
+
+async def authenticate(email: str, password: str):
+    # Returns the user record, or None when the credentials do not match.
+    # Legacy plaintext and outdated-cost hashes are upgraded on success.
+    user = await find_user_by_email(email)
+    if user is None:
+        await password_hasher.verify_unknown_user(password)
+        return None
+
+    matches, needs_rehash = await password_hasher.verify(password, user.get("password") or "")
+    if not matches:
+        return None
+
+    if needs_rehash:
+        new_hash = await password_hasher.hash(password)
+        # Conditional on the old value so a concurrent password reset wins
+        await user_collection.update_one({"_id": user["_id"], "password": user["password"]}, {"$set": {"password": new_hash}})
+    return user
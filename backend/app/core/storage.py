@@ -0,0 +1,297 @@
+import mimetypes
+import os
+import re
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, RedirectResponse, Response
+from pymongo import ReturnDocument
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import (
+    STORAGE_BACKEND, BLOB_ROOT, BLOB_CACHE_DIR, S3_BUCKET, S3_PREFIX, S3_ENDPOINT_URL,
+    S3_REGION, S3_PRESIGN_SECONDS, MEDIA_ACCEL_REDIRECT_PREFIX, BLOB_GC_GRACE_SECONDS
+)
+from app.core.database import blob_collection
+
+MEDIA_PREFIX = "/media/"
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Keys served by /media: originals, thumbnails and heatmap overlays. Model
+# tensors stay internal.
+PUBLIC_KEY_PATTERN = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.thumb|\.cam-[0-9a-f]{12})?\.(jpg|png|webp|pdf)$")
+
+# --- CONTENT-ADDRESSED KEYS ---
+# A blob's key is its SHA-256 fanned out over two directory levels
+# ("3f/a2/3fa2...e1.jpg"), so no directory ever holds more than a small
+# fraction of the files and identical uploads map to the same key.
+def blob_key(content_hash: str, extension: str) -> str:
+    return f"{content_hash[:2]}/{content_hash[2:4]}/{content_hash}{extension}"
+
+def media_url(key: str) -> str:
+    return f"{MEDIA_PREFIX}{key}"
+
+def key_from_url(url: str):
+    # None for files stored before the blob store (served from /static)
+    if url and url.startswith(MEDIA_PREFIX):
+        return url[len(MEDIA_PREFIX):]
+    return None
+
+def _content_hash(key: str) -> str:
+    return os.path.basename(key).split(".", 1)[0]
+
+
+# --- STORAGE BACKENDS ---
+# Every backend stores files by key and exposes them as local paths for
+# decoding and memory-mapping (`local_path`; `cache_path` is where that copy
+# lives, without fetching it). Uploads are staged in `incoming_dir`, on the
+# same filesystem as the local copies, so `put` can rename instead of copy.
+class LocalBlobBackend:
+    name = "local"
+
+    def __init__(self, root: str = BLOB_ROOT):
+        self.root = root
+        self.incoming_dir = os.path.join(root, ".incoming")
+
+    def local_path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def cache_path(self, key: str) -> str:
+        return self.local_path(key)
+
+    def put(self, key: str, src_path: str):
+        path = self.local_path(key)
+        if os.path.abspath(src_path) == os.path.abspath(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(src_path, path)
+
+    def keep_local(self, key: str, src_path: str):
+        # The blob already exists: only repair it if the file went missing
+        if os.path.exists(self.local_path(key)):
+            os.remove(src_path)
+        else:
+            self.put(key, src_path)
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    def response(self, key: str, media_type: str):
+        headers = {"Cache-Control": IMMUTABLE, "ETag": f'"{_content_hash(key)}"'}
+        if MEDIA_ACCEL_REDIRECT_PREFIX:
+            # The proxy sends the file itself (sendfile); the worker only sends headers
+            return Response(media_type=media_type, headers={**headers, "X-Accel-Redirect": f"{MEDIA_ACCEL_REDIRECT_PREFIX}{key}"})
+        path = self.local_path(key)
+        if not os.path.exists(path):
+            raise HTTPException(status_code=404, detail="File not found.")
+        # Servers offering the ASGI pathsend extension send this with sendfile too
+        return FileResponse(path, media_type=media_type, headers=headers)
+
+
+class S3BlobBackend:
+    name = "s3"
+
+    def __init__(self, bucket: str = S3_BUCKET, prefix: str = S3_PREFIX, endpoint_url: str = S3_ENDPOINT_URL,
+                 region: str = S3_REGION, cache_dir: str = BLOB_CACHE_DIR):
+        import boto3
+
+        if not bucket:
+            raise ValueError("S3_BUCKET must be set for the s3 storage backend.")
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+        self.bucket = bucket
+        self.prefix = prefix
+        self.cache_dir = cache_dir
+        self.incoming_dir = os.path.join(cache_dir, ".incoming")
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def local_path(self, key: str) -> str:
+        # Read-through cache: the first read on this machine downloads the blob
+        path = self.cache_path(key)
+        if not os.path.exists(path):
+            from botocore.exceptions import ClientError
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+            try:
+                self.client.download_file(self.bucket, self._object_key(key), tmp_path)
+                os.replace(tmp_path, path)
+            except ClientError:
+                # Missing object: callers see a path that does not exist
+                pass
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return path
+
+    def put(self, key: str, src_path: str):
+        content_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+        self.client.upload_file(
+            src_path, self.bucket, self._object_key(key),
+            ExtraArgs={"ContentType": content_type, "CacheControl": IMMUTABLE}
+        )
+        self.keep_local(key, src_path)
+
+    def keep_local(self, key: str, src_path: str):
+        path = self.cache_path(key)
+        if os.path.abspath(src_path) == os.path.abspath(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(src_path, path)
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+        try:
+            os.remove(self.cache_path(key))
+        except FileNotFoundError:
+            pass
+
+    def response(self, key: str, media_type: str):
+        # The browser fetches the bytes from the bucket directly
+        url = self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": self._object_key(key)}, ExpiresIn=S3_PRESIGN_SECONDS
+        )
+        return RedirectResponse(url, status_code=302)
+
+
+STORAGE_BACKENDS = {backend.name: backend for backend in (LocalBlobBackend, S3BlobBackend)}
+
+def load_storage_backend(name: str = STORAGE_BACKEND):
+    if name not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend '{name}'. Use one of: {', '.join(STORAGE_BACKENDS)}.")
+    return STORAGE_BACKENDS[name]()
+
+
+# --- REFERENCE-COUNTED BLOB INDEX ---
+# `blobs` has one document per stored content hash: {key, size, contentType,
+# refCount, derivatives}. Every scan or user field pointing at a blob holds one
+# reference (a profile picture through `profileImageRef`, once saved). Storing bytes that already exist only bumps the count, and a blob
+# whose count drops to zero is marked `orphanedAt` and deleted by
+# `collect_garbage` once the grace period has passed.
+class BlobStore:
+    def __init__(self, backend=None):
+        self._backend = backend
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        # Built on first use, so importing the app never needs boto3 or S3 access
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = load_storage_backend()
+        return self._backend
+
+    def incoming_path(self) -> str:
+        os.makedirs(self.backend.incoming_dir, exist_ok=True)
+        return os.path.join(self.backend.incoming_dir, f"{uuid.uuid4()}.part")
+
+    def resolve_local_path(self, url: str) -> str:
+        # Blocking: with the s3 backend this may download the blob
+        key = key_from_url(url)
+        return self.backend.local_path(key) if key else (url or "").lstrip("/")
+
+    async def local_path(self, url: str) -> str:
+        if key_from_url(url) and self.backend.name != "local":
+            return await run_in_threadpool(self.resolve_local_path, url)
+        return self.resolve_local_path(url)
+
+    async def store(self, tmp_path: str, content_hash: str, extension: str, content_type: str, size: int) -> dict:
+        # Takes one reference and consumes `tmp_path`
+        key = blob_key(content_hash, extension)
+        before = await blob_collection.find_one_and_update(
+            {"_id": content_hash},
+            {
+                "$inc": {"refCount": 1},
+                "$unset": {"orphanedAt": ""},
+                "$setOnInsert": {"key": key, "size": size, "contentType": content_type, "createdAt": datetime.utcnow()}
+            },
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+        if before and before.get("stored"):
+            await run_in_threadpool(self.backend.keep_local, key, tmp_path)
+        else:
+            await run_in_threadpool(self.backend.put, key, tmp_path)
+            await blob_collection.update_one({"_id": content_hash}, {"$set": {"stored": True}})
+
+        return {
+            "key": key,
+            "url": media_url(key),
+            "path": self.backend.cache_path(key),
+            "derivatives": bool(before and before.get("derivatives"))
+        }
+
+    async def store_derivatives(self, content_hash: str, files: list):
+        # `files` holds (key, local path) pairs generated from the blob; they
+        # share its lifetime and are deleted with it
+        for key, path in files:
+            await run_in_threadpool(self.backend.put, key, path)
+        await blob_collection.update_one(
+            {"_id": content_hash},
+            {"$addToSet": {"derivatives": {"$each": [key for key, _ in files]}}}
+        )
+
+    async def retain(self, url: str) -> bool:
+        # Takes one more reference to a stored blob; False when there is none
+        # to take (not a blob URL, or an unreferenced upload already collected)
+        key = key_from_url(url)
+        if not key:
+            return False
+        blob = await blob_collection.find_one_and_update(
+            {"_id": _content_hash(key), "key": key},
+            {"$inc": {"refCount": 1}, "$unset": {"orphanedAt": ""}}
+        )
+        return blob is not None
+
+    async def release(self, url: str):
+        key = key_from_url(url)
+        if not key:
+            return
+        content_hash = _content_hash(key)
+        blob = await blob_collection.find_one_and_update(
+            {"_id": content_hash, "refCount": {"$gt": 0}},
+            {"$inc": {"refCount": -1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if blob and blob["refCount"] <= 0:
+            # Conditional, so a reference taken in between keeps the blob alive
+            await blob_collection.update_one(
+                {"_id": content_hash, "refCount": {"$lte": 0}},
+                {"$set": {"orphanedAt": datetime.utcnow()}}
+            )
+
+    async def purge(self, url: str):
+        # Removes a blob whatever its reference count (test fixtures, maintenance)
+        key = key_from_url(url)
+        if key:
+            await self._delete(await blob_collection.find_one_and_delete({"_id": _content_hash(key)}))
+
+    async def collect_garbage(self, grace_seconds: float = BLOB_GC_GRACE_SECONDS) -> int:
+        # An upload of the same bytes racing a deletion can lose its file, so
+        # keep the grace period well above the upload time and run it when
+        # the system is quiet (scripts/gc_blobs.py)
+        cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+        deleted = 0
+        while True:
+            blob = await blob_collection.find_one_and_delete({"refCount": {"$lte": 0}, "orphanedAt": {"$lt": cutoff}})
+            if blob is None:
+                return deleted
+            await self._delete(blob)
+            deleted += 1
+
+    async def _delete(self, blob: dict):
+        if blob is None:
+            return
+        for key in [blob["key"]] + blob.get("derivatives", []):
+            await run_in_threadpool(self.backend.delete, key)
+
+blob_store = BlobStore()
@@ -0,0 +1,194 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import time
+from datetime import datetime
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from pymongo.errors import PyMongoError
+
+from app.core.config import ACCESS_TOKEN_SECRET, ACCESS_TOKEN_TTL_SECONDS, TOKEN_REVOCATION_REFRESH_SECONDS
+from app.core.database import revoked_token_collection
+from app.core.users import normalize_name, resolve_user_id
+
+# --- ACCESS TOKENS ---
+# Compact HS256 JWTs signed with the stdlib. The claims carry everything the
+# routers authorize on (user id, role, approval status, name), so checking a
+# request costs one HMAC and no database round trip.
+_HEADER = {"alg": "HS256", "typ": "JWT"}
+
+if ACCESS_TOKEN_SECRET:
+    _SECRET = ACCESS_TOKEN_SECRET.encode()
+else:
+    _SECRET = secrets.token_bytes(32)
+    print("⚠️ ACCESS_TOKEN_SECRET is not set: using a per-process key, sessions end on restart.")
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _sign(signing_input: bytes) -> str:
+    return _b64encode(hmac.new(_SECRET, signing_input, hashlib.sha256).digest())
+
+_ENCODED_HEADER = _b64encode(json.dumps(_HEADER, separators=(",", ":")).encode())
+
+def issue_access_token(user: dict):
+    # Returns (token, claims)
+    now = time.time()
+    claims = {
+        "sub": str(user["_id"]),
+        "role": user.get("role"),
+        "status": user.get("status"),
+        "name": user.get("fullName"),
+        "iat": now,
+        "exp": int(now + ACCESS_TOKEN_TTL_SECONDS),
+        "jti": secrets.token_urlsafe(12)
+    }
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    signing_input = f"{_ENCODED_HEADER}.{payload}"
+    return f"{signing_input}.{_sign(signing_input.encode())}", claims
+
+def decode_access_token(token: str) -> dict:
+    try:
+        header, payload, signature = token.split(".")
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid session token.")
+
+    # Only tokens this API signed are accepted; the header is never trusted
+    if header != _ENCODED_HEADER or not hmac.compare_digest(signature, _sign(f"{header}.{payload}".encode())):
+        raise HTTPException(status_code=401, detail="Invalid session token.")
+
+    claims = json.loads(_b64decode(payload))
+    if claims.get("exp", 0) < time.time():
+        raise HTTPException(status_code=401, detail="Session expired. Please log in again.")
+    return claims
+
+
+# --- REVOCATION ---
+# `revoked_tokens` holds single logged-out tokens ({_id: jti}) and per-user
+# cut-offs ({_id: "user:<id>", notBefore}) written on password reset and
+# account removal. Each process keeps an in-memory copy, refreshed every
+# TOKEN_REVOCATION_REFRESH_SECONDS; revocations made by this process apply
+# at once, those made by other processes within one refresh.
+class RevocationList:
+    def __init__(self, refresh_seconds: float = TOKEN_REVOCATION_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._token_ids = set()
+        self._user_cutoffs = {}
+        self._task = None
+
+    def is_revoked(self, claims: dict) -> bool:
+        if claims.get("jti") in self._token_ids:
+            return True
+        cutoff = self._user_cutoffs.get(claims.get("sub"))
+        return cutoff is not None and claims.get("iat", 0) < cutoff
+
+    async def revoke_token(self, claims: dict):
+        self._token_ids.add(claims["jti"])
+        await revoked_token_collection.update_one(
+            {"_id": claims["jti"]},
+            {"$set": {"expiresAt": datetime.utcfromtimestamp(claims["exp"])}},
+            upsert=True
+        )
+
+    async def revoke_user(self, user_id: str):
+        # Every token issued to the user before now stops working
+        now = time.time()
+        self._user_cutoffs[user_id] = now
+        await revoked_token_collection.update_one(
+            {"_id": f"user:{user_id}"},
+            {"$set": {"notBefore": now, "expiresAt": datetime.utcfromtimestamp(now + ACCESS_TOKEN_TTL_SECONDS)}},
+            upsert=True
+        )
+
+    async def refresh(self):
+        # Expired entries are removed by the TTL index, so the whole
+        # collection stays small enough to reload every time
+        token_ids, user_cutoffs = set(), {}
+        async for entry in revoked_token_collection.find({}):
+            if entry["_id"].startswith("user:"):
+                user_cutoffs[entry["_id"][5:]] = entry["notBefore"]
+            else:
+                token_ids.add(entry["_id"])
+        self._token_ids, self._user_cutoffs = token_ids, user_cutoffs
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except PyMongoError as e:
+                print(f"⚠️ Token revocation refresh failed: {e}")
+            await asyncio.sleep(self.refresh_seconds)
+
+revocation_list = RevocationList()
+
+
+# --- FASTAPI DEPENDENCIES ---
+_bearer = HTTPBearer(auto_error=False)
+
+async def current_user(credentials: HTTPAuthorizationCredentials = Depends(_bearer)) -> dict:
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated.", headers={"WWW-Authenticate": "Bearer"})
+    claims = decode_access_token(credentials.credentials)
+    if revocation_list.is_revoked(claims):
+        raise HTTPException(status_code=401, detail="Session has been revoked. Please log in again.")
+    return claims
+
+def require_roles(*roles):
+    async def dependency(claims: dict = Depends(current_user)) -> dict:
+        if claims.get("role") not in roles:
+            raise HTTPException(status_code=403, detail="You do not have access to this resource.")
+        if claims.get("role") == "doctor" and claims.get("status") != "Approved":
+            raise HTTPException(status_code=403, detail="Account pending admin verification.")
+        return claims
+    return dependency
+
+def require_same_user(claims: dict, name: str):
+    # Patients and doctors only reach their own records; admins reach all.
+    # Names are not identities, so queries behind this check also filter on
+    # the owner id (`owner_filter`)
+    if claims.get("role") != "admin" and normalize_name(claims.get("name")) != normalize_name(name):
+        raise HTTPException(status_code=403, detail="You do not have access to this resource.")
+
+
+# --- OWNERSHIP ---
+# Scans carry the ids of the patient and doctor they belong to (`patientId`,
+# `doctorId`), and stage history points the same under `meta`. Access is
+# decided on those ids against the token's subject, never on display names.
+SCAN_OWNER_FIELDS = {"patient": "patientId", "doctor": "doctorId"}
+
+def owner_filter(claims: dict, id_field: str) -> dict:
+    # Narrows a query to the caller's own documents; admins see everything
+    return {} if claims.get("role") == "admin" else {id_field: claims.get("sub")}
+
+def owns_scan(claims: dict, scan: dict) -> bool:
+    if claims.get("role") == "admin":
+        return True
+    id_field = SCAN_OWNER_FIELDS.get(claims.get("role"))
+    return id_field is not None and scan.get(id_field) == claims.get("sub")
+
+def require_scan_access(claims: dict, scan: dict):
+    if not owns_scan(claims, scan):
+        raise HTTPException(status_code=403, detail="You do not have access to this scan.")
+
+async def owner_id(claims: dict, name: str, role: str):
+    # The id to store for the named owner: the caller's own, or for an admin
+    # acting on someone's behalf the id of the account with that name
+    if claims.get("role") == role:
+        return claims.get("sub")
+    return await resolve_user_id(name, role)
@@ -0,0 +1,142 @@
+import os
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import MAX_SCAN_UPLOAD_MB, MAX_DEGREE_UPLOAD_MB, MAX_PROFILE_UPLOAD_MB
+from app.core.hashing import CHUNK_SIZE, new_hasher
+from app.core.metrics import span
+from app.core.storage import blob_store
+
+MB = 1024 * 1024
+
+# --- FILE TYPES ---
+# Sniffed from the leading bytes; the client's filename and Content-Type are
+# never trusted.
+FILE_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png", ".png"),
+    (b"RIFF", "image/webp", ".webp"),
+    (b"%PDF-", "application/pdf", ".pdf"),
+]
+
+IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp"}
+DOCUMENT_TYPES = IMAGE_TYPES | {"application/pdf"}
+
+# --- PER-ROUTE LIMITS ---
+SCAN_UPLOAD = {"max_bytes": int(MAX_SCAN_UPLOAD_MB * MB), "allowed_types": IMAGE_TYPES}
+DEGREE_UPLOAD = {"max_bytes": int(MAX_DEGREE_UPLOAD_MB * MB), "allowed_types": DOCUMENT_TYPES}
+PROFILE_UPLOAD = {"max_bytes": int(MAX_PROFILE_UPLOAD_MB * MB), "allowed_types": IMAGE_TYPES}
+
+# Request bodies are capped before multipart parsing spools them to disk.
+# A small allowance covers the multipart boundaries and the other form fields.
+UPLOAD_ROUTE_LIMITS = {
+    "/api/patient/upload-scan": SCAN_UPLOAD["max_bytes"] + MB,
+    "/api/doctor/direct-analysis": SCAN_UPLOAD["max_bytes"] + MB,
+    "/api/auth/signup/doctor": DEGREE_UPLOAD["max_bytes"] + MB,
+    "/api/doctor/upload-profile-image": PROFILE_UPLOAD["max_bytes"] + MB,
+}
+REQUEST_TOO_LARGE = "Request body exceeds the upload limit for this endpoint."
+
+def sniff_file_type(head: bytes):
+    for signature, content_type, extension in FILE_SIGNATURES:
+        if head.startswith(signature):
+            if content_type == "image/webp" and head[8:12] != b"WEBP":
+                continue
+            return content_type, extension
+    return None, None
+
+def _too_large(max_bytes: int):
+    return HTTPException(status_code=413, detail=f"File exceeds the {max_bytes // MB} MB upload limit.")
+
+def _stream_to_file(src, tmp_path: str, max_bytes: int):
+    hasher = new_hasher()
+    size = 0
+    head = b""
+
+    with open(tmp_path, "wb") as dst:
+        for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+            size += len(chunk)
+            if size > max_bytes:
+                raise _too_large(max_bytes)
+            if len(head) < 16:
+                head += chunk[:16 - len(head)]
+            hasher.update(chunk)
+            dst.write(chunk)
+
+    return hasher.hexdigest(), size, head
+
+# --- UPLOAD PIPELINE ---
+async def save_upload(upload: UploadFile, max_bytes: int, allowed_types: set) -> dict:
+    # Streams the upload to a temp file off the event loop, enforcing the size
+    # limit, hashing and sniffing the type in the same pass, then hands it to
+    # the blob store under its content hash. The result holds one reference to
+    # the blob; release it (blob_store.release) when the referencing document
+    # goes away. Re-uploaded bytes are not stored again.
+    tmp_path = blob_store.incoming_path()
+    try:
+        with span("upload.write"):
+            content_hash, size, head = await run_in_threadpool(_stream_to_file, upload.file, tmp_path, max_bytes)
+
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Uploaded file is empty.")
+
+        content_type, extension = sniff_file_type(head)
+        if content_type not in allowed_types:
+            raise HTTPException(status_code=415, detail="Unsupported file type.")
+
+        blob = await blob_store.store(tmp_path, content_hash, extension, content_type, size)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return {
+        "path": blob["path"],
+        "url": blob["url"],
+        "key": blob["key"],
+        "hash": content_hash,
+        "size": size,
+        "contentType": content_type,
+        # True when the same bytes were uploaded before and already have derivatives
+        "derivatives": blob["derivatives"]
+    }
+
+# --- REQUEST SIZE GUARD ---
+class UploadLimitMiddleware:
+    # Rejects oversized upload requests with 413 from the Content-Length header,
+    # or as soon as a chunked body crosses the route's limit.
+    def __init__(self, app, limits: dict = UPLOAD_ROUTE_LIMITS):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > limit:
+                return await self._reject(send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=REQUEST_TOO_LARGE)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def _reject(self, send):
+        body = f'{{"detail":"{REQUEST_TOO_LARGE}"}}'.encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,65 @@
+from pymongo import UpdateOne
+
+from app.core.database import user_collection, scan_collection, stage_history_collection
+
+BACKFILL_BATCH_SIZE = 500
+
+# --- NAME LOOKUP KEY ---
+# Profiles are looked up by name, case-insensitively. Instead of an anchored
+# `$regex` with `$options: "i"` (which cannot use an index and treats the
+# input as a pattern) every user carries a normalized `nameKey` that is
+# matched exactly against the `nameKey_role` index.
+def normalize_name(name: str) -> str:
+    return " ".join((name or "").split()).casefold()
+
+async def backfill_name_keys() -> int:
+    # Idempotent migration for users created before `nameKey` existed
+    updated = 0
+    batch = []
+    cursor = user_collection.find({"nameKey": {"$exists": False}}, {"fullName": 1})
+
+    async for user in cursor:
+        batch.append(UpdateOne({"_id": user["_id"]}, {"$set": {"nameKey": normalize_name(user.get("fullName"))}}))
+        if len(batch) >= BACKFILL_BATCH_SIZE:
+            updated += (await user_collection.bulk_write(batch, ordered=False)).modified_count
+            batch = []
+
+    if batch:
+        updated += (await user_collection.bulk_write(batch, ordered=False)).modified_count
+    return updated
+
+
+# --- OWNER IDS ---
+# Display names are not unique across older accounts, so records are tied to
+# accounts by id. Signup rejects a name already taken within the role.
+async def name_taken(name: str, role: str) -> bool:
+    return await user_collection.find_one({"nameKey": normalize_name(name), "role": role}, {"_id": 1}) is not None
+
+async def resolve_user_id(name: str, role: str):
+    # The id of the one account with this name, or None when there is no such
+    # account or several share the name
+    users = await user_collection.find({"nameKey": normalize_name(name), "role": role}, {"_id": 1}).to_list(length=2)
+    return str(users[0]["_id"]) if len(users) == 1 else None
+
+# (id field, name field, role, scans still to migrate). Direct analyses used
+# to store doctorId "Direct" instead of the doctor's id
+_SCAN_OWNERS = (
+    ("patientId", "patientName", "patient", {"patientId": {"$exists": False}}),
+    ("doctorId", "doctorName", "doctor", {"$or": [{"doctorId": {"$exists": False}}, {"doctorId": "Direct"}]})
+)
+
+async def backfill_scan_owners() -> int:
+    # Idempotent migration for scans (and their stage history points) stored
+    # before owner ids existed. A name that matches no account, or several,
+    # gets None: such scans are then only reachable by admins.
+    updated = 0
+    for id_field, name_field, role, missing in _SCAN_OWNERS:
+        for name in await scan_collection.distinct(name_field, missing):
+            user_id = await resolve_user_id(name, role)
+            result = await scan_collection.update_many({**missing, name_field: name}, {"$set": {id_field: user_id}})
+            updated += result.modified_count
+            await stage_history_collection.update_many(
+                {f"meta.{name_field}": name, f"meta.{id_field}": {"$exists": False}},
+                {"$set": {f"meta.{id_field}": user_id}}
+            )
+    return updated
@@ -1,24 +1,106 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
+from pymongo.errors import ConnectionFailure, PyMongoError
 
-from app.core.database import db
+from app.core.config import MONGO_BOOTSTRAP_RETRY_SECONDS
+from app.core.dashboard_stats import ensure_dashboard_stats
+from app.core.database import close_database, connect_database, database_status, ping_database
+from app.core.indexes import ensure_indexes
+from app.core.mailer import mail_sender
+from app.core.metrics import MetricsMiddleware, render_metrics
+from app.core.model_registry import model_registry
+from app.core.prediction_cache import backfill_prediction_usage
+from app.core.security import password_hasher
+from app.core.tokens import revocation_list
+from app.core.uploads import UploadLimitMiddleware
+from app.core.users import backfill_name_keys, backfill_scan_owners
 from app.api.auth import router as auth_router
 from app.api.admin import router as admin_router
 from app.api.patient import router as patient_router
-from app.api.doctor import router as doctor_router
+from app.api.doctor import router as doctor_router, inference_engine, inference_executor, scan_workers
+from app.api.media import router as media_router
 
-app = FastAPI(title="HFD AI Backend")
+# --- DATABASE SETUP ---
+# Indexes and idempotent migrations. They run before serving when MongoDB is
+# up; otherwise the server starts anyway and retries them in the background,
+# and /health/ready stays 503 until they have completed.
+database_setup = {"state": "pending", "error": None}
 
+async def set_up_database():
+    await ensure_indexes()
+    if await backfill_name_keys():
+        print("🔁 Backfilled user name lookup keys.")
+    if await backfill_scan_owners():
+        print("🔁 Linked older scans to their owners' accounts.")
+    if await backfill_prediction_usage():
+        print("🔁 Scheduled older stored predictions for expiry.")
+    if await ensure_dashboard_stats():
+        print("📊 Built dashboard statistics.")
+    database_setup.update(state="done", error=None)
+
+async def retry_database_setup():
+    while True:
+        await asyncio.sleep(MONGO_BOOTSTRAP_RETRY_SECONDS)
+        try:
+            await set_up_database()
+            print("✅ Database setup completed.")
+            return
+        except PyMongoError as e:
+            database_setup["error"] = str(e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    print("🚀 FastAPI Server Started!")
+    # The model loads and warms up in the background; /health/ready reports when it is serving
+    model_registry.start_background_load()
+    setup_task = None
+    try:
+        if not await connect_database():
+            raise PyMongoError("server not reachable")
+        await set_up_database()
+    except PyMongoError as e:
+        print(f"⚠️ Database setup deferred, retrying every {MONGO_BOOTSTRAP_RETRY_SECONDS:g}s: {e}")
+        database_setup["error"] = str(e)
+        setup_task = asyncio.create_task(retry_database_setup())
+    # Each of these retries its own database work
+    revocation_list.start()
+    scan_workers.start()
+    mail_sender.start()
+
+    yield
+
+    if setup_task is not None:
+        setup_task.cancel()
+        await asyncio.gather(setup_task, return_exceptions=True)
+    await scan_workers.stop()
+    await mail_sender.stop()
+    await revocation_list.stop()
+    await model_registry.stop()
+    await inference_engine.stop()
+    inference_executor.shutdown()
+    password_hasher.shutdown()
+    # Last, so the background tasks above could finish their writes
+    close_database()
+
+app = FastAPI(title="HFD AI Backend", lifespan=lifespan)
+
+app.add_middleware(UploadLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"], 
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
+# Outermost, so rejected uploads and CORS preflights are measured too
+app.add_middleware(MetricsMiddleware)
 
 os.makedirs("static", exist_ok=True)
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -27,12 +109,32 @@ app.include_router(auth_router, prefix="/api/auth", tags=["Auth"])
 app.include_router(admin_router, prefix="/api/admin", tags=["Admin"])
 app.include_router(patient_router, prefix="/api/patient", tags=["Patient"])
 app.include_router(doctor_router, prefix="/api/doctor", tags=["Doctor"])
+# Content-addressed uploads; /static keeps serving files stored before the blob store
+app.include_router(media_router, prefix="/media", tags=["Media"])
 
-@app.on_event("startup")
-async def startup_db_client():
-    print("🚀 FastAPI Server Started!")
-    print("🔌 Database connected successfully.")
+@app.exception_handler(ConnectionFailure)
+async def database_unavailable(request, exc):
+    # MongoDB down or unreachable: a retryable outage, not a server bug
+    return JSONResponse(status_code=503, content={"detail": "Database is unavailable. Please try again shortly."})
 
 @app.get("/")
 async def root():
-    return {"status": "online", "message": "Welcome to the HFD AI!"}
\ No newline at end of file
+    return {"status": "online", "message": "Welcome to the HFD AI!"}
+
+@app.get("/health")
+async def health():
+    return {"status": "online", "model": model_registry.status(), "database": {**database_status(), "setup": database_setup}}
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health/ready")
+async def readiness():
+    # Ready once the model is serving, MongoDB answers a ping and the
+    # database setup has run
+    database_ok = await ping_database()
+    body = {"model": model_registry.status(), "database": {**database_status(), "reachable": database_ok, "setup": database_setup}}
+    if not (model_registry.ready and database_ok and database_setup["state"] == "done"):
+        return JSONResponse(status_code=503, content={"status": "not_ready", **body})
+    return {"status": "ready", **body}
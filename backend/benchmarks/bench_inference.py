@@ -0,0 +1,109 @@
+# Micro-benchmarks for the analysis hot path: preprocessing and model predict.
+#
+#   python -m benchmarks.bench_inference
+#   python -m benchmarks.bench_inference --model ai_model/hair_model.dynamic.tflite --batch-sizes 1,8,32
+#   python -m benchmarks.bench_inference --output results/inference.json
+#
+# Preprocessing is timed from a synthetic JPEG per --image-sizes entry (decode +
+# resize) and from the stored .npy tensor scans get at upload time. predict()
+# is timed per batch size on the configured model; it is skipped when the model
+# file or its runtime is missing. The JSON output is meant to be diffed between runs.
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from app.core.config import MODEL_PATH, MODEL_BACKEND
+from app.core.derivatives import generate_derivatives, load_tensor
+from app.core.model_backends import load_backend
+from app.core.preprocessing import MODEL_INPUT_SHAPE, load_model_input
+from benchmarks.bench_preprocessing import make_synthetic_jpeg
+from benchmarks.stats import latency_summary
+
+
+def time_calls(fn, runs: int) -> list:
+    fn()  # warm-up
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def bench_preprocessing(image_sizes, runs: int) -> list:
+    out = np.empty(MODEL_INPUT_SHAPE, dtype=np.float32)
+    results = []
+    for width, height in image_sizes:
+        workdir = tempfile.mkdtemp()
+        image_path = shutil.move(make_synthetic_jpeg(width, height), os.path.join(workdir, "scan.jpg"))
+        tensor_path = generate_derivatives(image_path)["tensor"]
+
+        results.append({
+            "stage": "decode+resize", "image": f"{width}x{height}",
+            **latency_summary(time_calls(lambda: load_model_input(image_path, out=out), runs))
+        })
+        # np.copyto forces the memory-mapped pages to actually be read
+        results.append({
+            "stage": "stored_tensor", "image": f"{width}x{height}",
+            **latency_summary(time_calls(lambda: np.copyto(out, load_tensor(tensor_path)), runs))
+        })
+        shutil.rmtree(workdir)
+    return results
+
+def bench_predict(model_path: str, backend_name: str, batch_sizes, runs: int) -> dict:
+    start = time.perf_counter()
+    backend = load_backend(model_path, backend_name)
+    load_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    results = []
+    for batch_size in batch_sizes:
+        batch = rng.random((batch_size,) + MODEL_INPUT_SHAPE, dtype=np.float32)
+        results.append({
+            "batch_size": batch_size,
+            **latency_summary(time_calls(lambda: backend.predict(batch), runs), items_per_call=batch_size)
+        })
+    return {"model": model_path, "backend": backend.name, "load_seconds": round(load_seconds, 2), "batches": results}
+
+def main():
+    parser = argparse.ArgumentParser(description="Preprocessing and predict micro-benchmarks")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--backend", default=MODEL_BACKEND)
+    parser.add_argument("--batch-sizes", default="1,2,4,8,16,32")
+    parser.add_argument("--image-sizes", default="1600x1200,4000x3000")
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    image_sizes = [tuple(int(n) for n in size.split("x")) for size in args.image_sizes.split(",")]
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+
+    report = {
+        "benchmark": "inference",
+        "timestamp": datetime.utcnow().isoformat(),
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "runs": args.runs,
+        "preprocessing": bench_preprocessing(image_sizes, args.runs)
+    }
+    if not os.path.exists(args.model):
+        report["predict"] = {"skipped": f"model file not found: {args.model}"}
+    else:
+        try:
+            report["predict"] = bench_predict(args.model, args.backend, batch_sizes, args.runs)
+        except ImportError as e:
+            report["predict"] = {"skipped": f"model runtime not installed: {e}"}
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+if __name__ == "__main__":
+    main()
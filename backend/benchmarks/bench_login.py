@@ -0,0 +1,131 @@
+# Credential verification benchmarks: scrypt cost per parameter set, and
+# concurrent verification throughput with the event-loop stall it causes.
+#
+#   python -m benchmarks.bench_login
+#   python -m benchmarks.bench_login --costs 13,14,15 --concurrency 1,8,64 --workers 1,2,4
+#   python -m benchmarks.bench_login --output results/login.json
+#
+# "inline" runs scrypt directly in the coroutine, which is what a naive login
+# handler does; "pool" goes through the PasswordHasher the API uses. While the
+# verifies run, a ticker coroutine measures how late the loop wakes it up,
+# i.e. how long every other request would have waited. End-to-end login
+# throughput through the API is measured by `benchmarks.load_test --scenarios login`.
+import argparse
+import asyncio
+import json
+import os
+import platform
+import time
+from datetime import datetime
+
+from app.core.config import PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P
+from app.core.security import PasswordHasher, _scrypt, hash_password, verify_password
+from benchmarks.stats import latency_summary
+
+PASSWORD = "Bench#Pass1"
+TICK_SECONDS = 0.005
+
+
+def bench_costs(log2_costs, runs: int) -> list:
+    results = []
+    for log2_n in log2_costs:
+        n = 2 ** log2_n
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            _scrypt(PASSWORD, b"0123456789abcdef", n, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+            timings.append(time.perf_counter() - start)
+        results.append({
+            "n": n, "r": PASSWORD_SCRYPT_R, "p": PASSWORD_SCRYPT_P,
+            "memory_mb": round(128 * n * PASSWORD_SCRYPT_R / 2 ** 20, 1),
+            **latency_summary(timings)
+        })
+    return results
+
+async def measure_loop_lag(stop: asyncio.Event) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        worst = max(worst, time.perf_counter() - start - TICK_SECONDS)
+    return worst
+
+async def bench_verify(mode: str, stored: str, concurrency: int, requests: int, workers: int) -> dict:
+    hasher = PasswordHasher(max_workers=workers, max_pending=requests + concurrency)
+    indexes = iter(range(requests))
+    timings = []
+
+    async def verify():
+        if mode == "inline":
+            return verify_password(PASSWORD, stored)
+        return await hasher.verify(PASSWORD, stored)
+
+    async def client_loop():
+        for _ in indexes:
+            start = time.perf_counter()
+            await verify()
+            timings.append(time.perf_counter() - start)
+
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_loop_lag(stop))
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    worst_lag = await ticker
+    hasher.shutdown()
+
+    summary = latency_summary(timings, elapsed)
+    return {
+        "mode": mode,
+        "workers": workers if mode == "pool" else None,
+        "concurrency": concurrency,
+        "verifies_per_sec": summary.pop("per_sec"),
+        "max_loop_lag_ms": round(worst_lag * 1000, 2),
+        **summary
+    }
+
+async def run_verify_benchmarks(concurrency_levels, worker_counts, requests: int) -> list:
+    stored = hash_password(PASSWORD)
+    results = []
+    for concurrency in concurrency_levels:
+        runs = [("inline", 1)] + [("pool", workers) for workers in worker_counts]
+        for mode, workers in runs:
+            result = await bench_verify(mode, stored, concurrency, requests, workers)
+            results.append(result)
+            print(f"⏱️ verify {mode}{'' if mode == 'inline' else f' x{workers}'} @ {concurrency}: "
+                  f"{result['verifies_per_sec']} verifies/s, p99 {result['p99_ms']} ms, loop lag {result['max_loop_lag_ms']} ms")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Password hashing and verification benchmarks")
+    parser.add_argument("--costs", default="12,13,14,15,16", help="log2 of the scrypt N values to time")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--workers", default="1,2,4", help="pool sizes to compare")
+    parser.add_argument("--requests", type=int, default=64, help="verifies per mode and concurrency level")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    log2_costs = [int(cost) for cost in args.costs.split(",")]
+    concurrency_levels = [int(level) for level in args.concurrency.split(",")]
+    worker_counts = [int(count) for count in args.workers.split(",")]
+
+    report = {
+        "benchmark": "login",
+        "timestamp": datetime.utcnow().isoformat(),
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "config": {"n": PASSWORD_SCRYPT_N, "r": PASSWORD_SCRYPT_R, "p": PASSWORD_SCRYPT_P, "requests": args.requests},
+        "costs": bench_costs(log2_costs, args.runs),
+        "verify": asyncio.run(run_verify_benchmarks(concurrency_levels, worker_counts, args.requests))
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+if __name__ == "__main__":
+    main()
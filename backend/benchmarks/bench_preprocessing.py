@@ -0,0 +1,119 @@
+# Compares the legacy full-decode preprocessing with app.core.preprocessing.
+#
+#   python -m benchmarks.bench_preprocessing [--image scan.jpg] [--runs 20]
+#
+# Without --image a synthetic 12 MP (4000x3000) JPEG is generated. Each variant
+# runs in its own subprocess so the peak RSS it reports is not polluted by the
+# other variant.
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from app.core.preprocessing import MODEL_INPUT_SHAPE, load_model_input
+
+
+def legacy_preprocess(image_path: str) -> np.ndarray:
+    img = Image.open(image_path).convert("RGB")
+    img = img.resize((224, 224))
+    return np.array(img) / 255.0
+
+def fast_preprocess(image_path: str, out=np.empty(MODEL_INPUT_SHAPE, dtype=np.float32)) -> np.ndarray:
+    return load_model_input(image_path, out=out)
+
+VARIANTS = {"legacy": legacy_preprocess, "fast": fast_preprocess}
+
+def _max_rss_mb() -> float:
+    # VmHWM is reset on exec; ru_maxrss can carry over the parent's peak
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_variant(name: str, image_path: str, runs: int) -> dict:
+    fn = VARIANTS[name]
+    rss_before = _max_rss_mb()
+
+    fn(image_path)  # warm-up: codecs, page cache
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(image_path)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    fn(image_path)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "variant": name,
+        "runs": runs,
+        "mean_ms": round(float(np.mean(timings)), 2),
+        "p50_ms": round(float(np.percentile(timings, 50)), 2),
+        "p95_ms": round(float(np.percentile(timings, 95)), 2),
+        "numpy_peak_mb": round(traced_peak / 1024 / 1024, 2),
+        "rss_growth_mb": round(_max_rss_mb() - rss_before, 2)
+    }
+
+def make_synthetic_jpeg(width: int = 4000, height: int = 3000) -> str:
+    rng = np.random.default_rng(0)
+    # Smooth gradients plus noise compress like a real photo, unlike pure noise
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x % 256, y % 256, (x + y) % 256], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+
+    fd, path = tempfile.mkstemp(suffix=".jpg")
+    os.close(fd)
+    Image.fromarray(pixels).save(path, quality=90)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--image", help="JPEG to preprocess (default: synthetic 12 MP photo)")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.image, args.runs)))
+        return
+
+    image_path = args.image or make_synthetic_jpeg()
+    with Image.open(image_path) as img:
+        print(f"Image: {image_path} ({img.width}x{img.height} {img.format})")
+
+    results = []
+    for name in VARIANTS:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_preprocessing", "--variant", name, "--image", image_path, "--runs", str(args.runs)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results.append(json.loads(output))
+
+    legacy, fast = (np.asarray(VARIANTS[name](image_path), dtype=np.float32) for name in VARIANTS)
+    print(json.dumps({
+        "results": results,
+        "speedup": round(results[0]["mean_ms"] / results[1]["mean_ms"], 2),
+        "max_abs_pixel_diff": round(float(np.abs(legacy - fast).max()), 4),
+        "mean_abs_pixel_diff": round(float(np.abs(legacy - fast).mean()), 4)
+    }, indent=2))
+
+    if not args.image:
+        os.remove(image_path)
+
+if __name__ == "__main__":
+    main()
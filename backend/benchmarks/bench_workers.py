@@ -0,0 +1,252 @@
+# Multi-worker inference benchmark: N API-worker processes each loading the
+# model (INFERENCE_MODE=local, the current deployment) against N workers
+# sending tensors to one shared inference service (INFERENCE_MODE=remote,
+# scripts/serve.py).
+#
+#   python -m benchmarks.bench_workers
+#   python -m benchmarks.bench_workers --workers 1,2,4,8 --concurrency 8 --requests 200
+#   python -m benchmarks.bench_workers --stand-in-model --output results/workers.json
+#
+# Each worker is a fresh (spawned) process that runs --requests predictions on
+# a fixed model-input tensor from --concurrency concurrent callers; all workers
+# start together. Reported per run: throughput and latency over every worker,
+# the resident memory (VmRSS) of each worker and of the service, and whether a
+# model runtime was imported in the workers. Only the inference path is
+# measured (no HTTP, no Mongo). Without the model file or its runtime, a
+# stand-in model with a fixed --stand-in-ms per batch is served instead, which
+# still shows the batching effect but not the memory of a real runtime.
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from app.core.config import MODEL_PATH
+from app.core.preprocessing import MODEL_INPUT_SHAPE
+from benchmarks.stats import latency_summary
+
+MODES = ["local", "remote"]
+RUNTIME_MODULES = ("tensorflow", "tflite_runtime", "onnxruntime")
+SERVICE_STARTUP_SECONDS = 60
+
+
+def rss_mb(pid="self") -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return None
+
+async def load_registry(args):
+    from app.core.model_registry import ModelRegistry
+    from benchmarks.load_test import StandInBackend
+
+    registry = ModelRegistry()
+    if not args.stand_in_model:
+        try:
+            await registry.load()
+            return registry
+        except (FileNotFoundError, ImportError) as e:
+            print(f"⚠️ Using the stand-in model: {e}")
+    registry._current = (StandInBackend(args.stand_in_ms), "stand-in")
+    return registry
+
+
+# --- INFERENCE SERVICE PROCESS ---
+async def run_service(args):
+    from app.core.inference_remote import serve
+
+    task = asyncio.current_task()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+    registry = await load_registry(args)
+    try:
+        await serve(args.socket, registry)
+    except asyncio.CancelledError:
+        pass
+
+def start_service(args) -> subprocess.Popen:
+    # Its own interpreter, as under scripts/serve.py: a multiprocessing child
+    # would share the workers' resource tracker, which then loses track of
+    # their shared-memory blocks when the service detaches from them
+    command = [sys.executable, "-m", "benchmarks.bench_workers", "--service", "--socket", args.socket,
+               "--stand-in-ms", str(args.stand_in_ms)]
+    if args.stand_in_model:
+        command.append("--stand-in-model")
+    process = subprocess.Popen(command)
+    wait_for_service(args.socket, process)
+    return process
+
+def wait_for_service(socket_path: str, process: subprocess.Popen):
+    deadline = time.monotonic() + SERVICE_STARTUP_SECONDS
+    while True:
+        if process.poll() is not None:
+            raise SystemExit("❌ The inference service exited during startup.")
+        try:
+            with socket.socket(socket.AF_UNIX) as probe:
+                probe.connect(socket_path)
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise SystemExit(f"❌ The inference service did not open {socket_path} in time.")
+            time.sleep(0.1)
+
+
+# --- API WORKER PROCESS ---
+async def run_worker(mode: str, args, barrier) -> dict:
+    executor = None
+    if mode == "remote":
+        from app.core.inference_remote import RemoteInferenceEngine
+        engine = RemoteInferenceEngine(args.socket)
+    else:
+        from app.core.inference import BatchInferenceEngine, InferenceExecutor
+        registry = await load_registry(args)
+        executor = InferenceExecutor()
+        engine = BatchInferenceEngine(registry.predict, executor)
+
+    tensor = np.random.default_rng(0).random(MODEL_INPUT_SHAPE, dtype=np.float32)
+    # Warm-up, which also connects to the service in remote mode
+    await engine.predict(tensor)
+    barrier.wait()
+
+    timings = []
+    errors = 0
+
+    async def client_loop(calls: int):
+        nonlocal errors
+        for _ in range(calls):
+            start = time.perf_counter()
+            try:
+                await engine.predict(tensor)
+            except Exception:
+                errors += 1
+            timings.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop(len(range(i, args.requests, args.concurrency))) for i in range(args.concurrency)))
+    finished = time.perf_counter()
+
+    await engine.stop()
+    if executor is not None:
+        executor.shutdown()
+    return {
+        "timings": timings,
+        "errors": errors,
+        "started": started,
+        "finished": finished,
+        "rssMb": rss_mb(),
+        "runtimes": [name for name in RUNTIME_MODULES if name in sys.modules]
+    }
+
+def worker_main(mode: str, args, barrier, results):
+    results.put(asyncio.run(run_worker(mode, args, barrier)))
+
+
+# --- RUNS ---
+def run_workers(context, mode: str, workers: int, args) -> list:
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker_main, args=(mode, args, barrier, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return reports
+
+def summarize(mode: str, workers: int, reports: list, service_rss: float, args) -> dict:
+    # time.perf_counter() is the system-wide monotonic clock on Linux, so the
+    # wall-clock window spans every worker
+    timings = [timing for report in reports for timing in report["timings"]]
+    elapsed = max(report["finished"] for report in reports) - min(report["started"] for report in reports)
+    summary = latency_summary(timings, elapsed)
+    worker_rss = [report["rssMb"] for report in reports]
+    return {
+        "mode": mode,
+        "workers": workers,
+        "concurrency": args.concurrency,
+        "requests": summary.pop("count"),
+        "errors": sum(report["errors"] for report in reports),
+        "req_per_sec": summary.pop("per_sec"),
+        **summary,
+        "workerRssMb": worker_rss,
+        "meanWorkerRssMb": round(float(np.mean(worker_rss)), 1),
+        "serviceRssMb": service_rss,
+        "totalRssMb": round(sum(worker_rss) + (service_rss or 0), 1),
+        "runtimesInWorkers": sorted({name for report in reports for name in report["runtimes"]})
+    }
+
+def run(args) -> dict:
+    # Spawned, not forked: a worker must not inherit the parent's imports
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for mode in args.modes:
+        service = None
+        if mode == "remote":
+            service = start_service(args)
+        try:
+            for workers in args.workers:
+                reports = run_workers(context, mode, workers, args)
+                service_rss = rss_mb(service.pid) if service is not None else None
+                result = summarize(mode, workers, reports, service_rss, args)
+                results.append(result)
+                print(f"⏱️ {mode} x{workers}: {result['req_per_sec']} req/s, p95 {result['p95_ms']} ms, "
+                      f"{result['meanWorkerRssMb']} MB per worker, {result['totalRssMb']} MB total")
+        finally:
+            if service is not None:
+                service.terminate()
+                service.wait()
+
+    return {
+        "benchmark": "inference_workers",
+        "timestamp": datetime.utcnow().isoformat(),
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "config": {
+            "model": "stand-in" if args.stand_in_model else MODEL_PATH,
+            "requests": args.requests,
+            "concurrency": args.concurrency
+        },
+        "results": results
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Local vs shared inference service across API workers")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--workers", default="1,2,4", help="API worker process counts")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent callers per worker")
+    parser.add_argument("--requests", type=int, default=100, help="predictions per worker")
+    parser.add_argument("--socket", default=os.path.join(tempfile.gettempdir(), f"hfd-bench-{os.getpid()}.sock"))
+    parser.add_argument("--stand-in-model", action="store_true", help="serve a fixed-latency stand-in instead of the real model")
+    parser.add_argument("--stand-in-ms", type=float, default=20)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--service", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.service:
+        asyncio.run(run_service(args))
+        return
+    args.modes = [mode for mode in args.modes.split(",") if mode]
+    args.workers = [int(count) for count in args.workers.split(",")]
+    unknown = set(args.modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(sorted(unknown))}")
+    if args.concurrency < 1 or args.requests < 1:
+        parser.error("--concurrency and --requests must be at least 1")
+
+    report = run(args)
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# Accuracy parity and latency/throughput/memory comparison of inference backends.
+#
+#   python -m benchmarks.compare_backends ai_model/hair_model.h5 ai_model/hair_model.dynamic.tflite
+#
+# The first model is the reference. Parity is measured on up to --samples
+# stored scans (random inputs if the database has none): top-1 agreement and
+# the largest absolute probability difference. Latency is measured per batch
+# size, and memory as the RSS growth caused by loading each backend, each in a
+# fresh subprocess so runtimes do not share memory.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from app.core.model_backends import load_backend
+from app.core.preprocessing import MODEL_INPUT_SHAPE
+from benchmarks.bench_preprocessing import _max_rss_mb
+from scripts.export_model import iter_scan_inputs
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return _max_rss_mb()
+
+def load_inputs(samples: int) -> np.ndarray:
+    inputs = list(iter_scan_inputs(samples))
+    if not inputs:
+        print("⚠️ No stored scans found; parity is measured on random inputs.", file=sys.stderr)
+        return np.random.default_rng(0).random((samples,) + MODEL_INPUT_SHAPE, dtype=np.float32)
+    return np.stack(inputs)
+
+def profile_backend(path: str, inputs_path: str, batch_sizes, runs: int) -> dict:
+    inputs = np.load(inputs_path)
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    backend = load_backend(path)
+    backend.predict(inputs[:1])
+    load_seconds = time.perf_counter() - start
+
+    predictions = np.concatenate([backend.predict(inputs[i:i + 16]) for i in range(0, len(inputs), 16)])
+
+    latency = {}
+    for batch_size in batch_sizes:
+        batch = np.resize(inputs, (batch_size,) + inputs.shape[1:])
+        backend.predict(batch)
+        timings = []
+        for _ in range(runs):
+            t = time.perf_counter()
+            backend.predict(batch)
+            timings.append(time.perf_counter() - t)
+        latency[batch_size] = {
+            "p50_ms": round(float(np.percentile(timings, 50)) * 1000, 2),
+            "p95_ms": round(float(np.percentile(timings, 95)) * 1000, 2),
+            "images_per_sec": round(batch_size / float(np.mean(timings)), 1)
+        }
+
+    return {
+        "model": path,
+        "backend": backend.name,
+        "load_seconds": round(load_seconds, 2),
+        "rss_growth_mb": round(current_rss_mb() - rss_before, 1),
+        "latency": latency,
+        "predictions": predictions.tolist()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare inference backends against a reference model")
+    parser.add_argument("models", nargs="+", help="reference model first, then candidates")
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--batch-sizes", default="1,4,16")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--profile", nargs=2, metavar=("MODEL", "INPUTS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+
+    if args.profile:
+        print(json.dumps(profile_backend(args.profile[0], args.profile[1], batch_sizes, args.runs)))
+        return
+
+    fd, inputs_path = tempfile.mkstemp(suffix=".npy")
+    os.close(fd)
+    np.save(inputs_path, load_inputs(args.samples))
+
+    results = []
+    for model in args.models:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.compare_backends", *args.models,
+             "--batch-sizes", args.batch_sizes, "--runs", str(args.runs), "--profile", model, inputs_path],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    os.remove(inputs_path)
+
+    reference = np.asarray(results[0]["predictions"])
+    for result in results:
+        predictions = np.asarray(result.pop("predictions"))
+        result["top1_agreement"] = round(float(np.mean(predictions.argmax(1) == reference.argmax(1))), 4)
+        result["max_abs_prob_diff"] = round(float(np.abs(predictions - reference).max()), 4)
+
+    print(json.dumps({"samples": int(len(reference)), "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+# Concurrent-client load test of the API, driven in-process over httpx's ASGI
+# transport (no server, no network).
+#
+#   python -m benchmarks.load_test --mongomock
+#   python -m benchmarks.load_test --concurrency 1,8,32 --requests 200 --output results/api.json
+#   python -m benchmarks.load_test --scenarios login,dashboard --stand-in-model
+#
+# Against a local mongod (the default, MONGO_URL in app.core.config) every
+# synthetic user and scan is tagged with a per-run prefix and removed at the
+# end, along with its stage history and whatever it added to the dashboard
+# counters, so it can run next to real data. --mongomock uses mongomock-motor
+# (pip install mongomock-motor) instead; it has no real query planner, so only
+# compare mongomock runs with mongomock runs.
+#
+# The background scan workers and mail sender are not started, so nothing
+# competes with the measured requests. Without the model file or its runtime,
+# a stand-in model with a fixed --stand-in-ms per batch is served instead.
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import re
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from benchmarks.bench_preprocessing import make_synthetic_jpeg
+from benchmarks.stats import latency_summary
+
+PASSWORD = "Bench#Pass1"
+SCENARIOS = ["login", "upload_scan", "process_scan", "doctor_dashboard", "patient_dashboard"]
+
+
+class StandInBackend:
+    name = "stand-in"
+
+    def __init__(self, ms_per_batch: float):
+        self.seconds_per_batch = ms_per_batch / 1000
+
+    def predict(self, batch):
+        import numpy as np
+
+        time.sleep(self.seconds_per_batch)
+        out = np.zeros((len(batch), 7), dtype=np.float32)
+        out[:, 2] = 1
+        return out
+
+
+# --- SYNTHETIC DATA ---
+class Fixture:
+    def __init__(self, client, image_bytes: bytes):
+        self.client = client
+        self.image_bytes = image_bytes
+        self.prefix = f"bench-{uuid.uuid4().hex[:8]}"
+        self.doctor_name = f"{self.prefix} doctor"
+        self.doctor_id = None
+        self.doctor_headers = {}
+        self.patients = []
+        self.patient_headers = []
+        self.pending_scan_ids = []
+        self._sample_scan = None
+
+    async def setup(self, patients: int, seed_scans: int):
+        from app.core.dashboard_stats import record_user_changes
+        from app.core.database import user_collection, scan_collection
+        from app.core.users import normalize_name
+
+        from app.core.tokens import issue_access_token
+
+        doctor = {
+            "fullName": self.doctor_name, "nameKey": normalize_name(self.doctor_name),
+            "email": f"{self.prefix}-doctor@example.com", "role": "doctor", "status": "Approved"
+        }
+        result = await user_collection.insert_one(doctor)
+        # Counted like a signup, so cleanup can take every fixture user back out
+        await record_user_changes([(None, doctor)])
+        self.doctor_id = str(result.inserted_id)
+        self.doctor_headers = _bearer(issue_access_token(doctor)[0])
+
+        # Patients go through the real signup endpoint so login measures
+        # whatever credential scheme the API currently uses
+        for i in range(patients):
+            patient = {"fullName": f"{self.prefix} patient {i}", "email": f"{self.prefix}-p{i}@example.com", "phone": "0000000000", "password": PASSWORD}
+            response = await self.client.post("/api/auth/signup/patient", json=patient)
+            response.raise_for_status()
+            self.patients.append(patient)
+            response = await self.client.post("/api/auth/login", json={"email": patient["email"], "password": PASSWORD})
+            response.raise_for_status()
+            self.patient_headers.append(_bearer(response.json()["accessToken"]))
+            patient["id"] = str((await user_collection.find_one({"email": patient["email"]}, {"_id": 1}))["_id"])
+
+        # One real upload provides the image and derivatives every seeded scan points at
+        response = await self.upload_scan(0)
+        response.raise_for_status()
+        self._sample_scan = await scan_collection.find_one({"_id": _object_id(response.json()["scanId"])})
+
+        scans = [self._scan_doc(i, "Processed" if i % 3 else "Pending") for i in range(seed_scans)]
+        if scans:
+            await scan_collection.insert_many(scans)
+
+    async def seed_pending(self, count: int):
+        from app.core.database import scan_collection
+        from app.core.jobs import NEW_JOB_FIELDS
+
+        # A distinct imageHash per scan defeats the prediction cache, so every
+        # process-scan call runs the model
+        scans = [{**self._scan_doc(i, "Pending"), **NEW_JOB_FIELDS, "imageHash": f"{self.prefix}-{uuid.uuid4().hex}"} for i in range(count)]
+        result = await scan_collection.insert_many(scans)
+        self.pending_scan_ids = [str(scan_id) for scan_id in result.inserted_ids]
+
+    def _scan_doc(self, i: int, status: str) -> dict:
+        sample = self._sample_scan
+        patient = self.patients[i % len(self.patients)]
+        return {
+            "patientName": patient["fullName"],
+            "patientId": patient["id"],
+            "doctorId": self.doctor_id,
+            "doctorName": self.doctor_name,
+            "imagePath": sample["imagePath"],
+            "thumbnailPath": sample.get("thumbnailPath"),
+            "tensorPath": sample.get("tensorPath"),
+            "imageHash": sample.get("imageHash"),
+            "status": status,
+            "baldnessStage": "Norwood Stage 3" if status == "Processed" else None,
+            "date": datetime.utcnow().isoformat()
+        }
+
+    def upload_scan(self, i: int):
+        patient = i % len(self.patients)
+        return self.client.post(
+            "/api/patient/upload-scan",
+            data={"patientName": self.patients[patient]["fullName"], "doctorId": self.doctor_id},
+            files={"image": ("scan.jpg", self.image_bytes, "image/jpeg")},
+            headers=self.patient_headers[patient]
+        )
+
+    async def cleanup(self):
+        from app.core.dashboard_stats import record_user_changes
+        from app.core.database import user_collection, scan_collection, prediction_collection, stage_history_collection
+        from app.core.storage import blob_store
+
+        # Every synthetic scan points at the one uploaded image blob
+        images = await scan_collection.distinct("imagePath", {"doctorName": self.doctor_name})
+        for url in images:
+            await blob_store.purge(url)
+
+        await scan_collection.delete_many({"doctorName": self.doctor_name})
+        await stage_history_collection.delete_many({"meta.doctorName": self.doctor_name})
+        users = await user_collection.find({"email": {"$regex": f"^{self.prefix}-"}}).to_list(length=None)
+        await user_collection.delete_many({"_id": {"$in": [user["_id"] for user in users]}})
+        await record_user_changes([(user, None) for user in users])
+        await self._remove_scan_counters()
+        await prediction_collection.delete_many({"imageHash": {"$regex": f"^{self.prefix}-"}})
+
+    async def _remove_scan_counters(self):
+        from app.core.dashboard_stats import GLOBAL_SCOPE, doctor_scope
+        from app.core.database import stats_collection
+
+        # Every scan counter the run moved went to the fixture doctor's scope
+        # and to the global one alike, so subtracting the doctor's documents
+        # (summary and per-day) from their global twins undoes the run exactly
+        scope = doctor_scope(self.doctor_id)
+        scope_ids = {"_id": {"$regex": f"^{re.escape(scope)}(:|$)"}}
+        async for doc in stats_collection.find(scope_ids):
+            counts = _counters(doc)
+            if counts:
+                await stats_collection.update_one(
+                    {"_id": GLOBAL_SCOPE + doc["_id"][len(scope):]},
+                    {"$inc": {field: -value for field, value in counts.items()}}
+                )
+        await stats_collection.delete_many(scope_ids)
+
+def _counters(doc: dict, prefix: str = "") -> dict:
+    # {"byStatus": {"Pending": 2}} -> {"byStatus.Pending": 2}
+    counts = {}
+    for field, value in doc.items():
+        if field == "_id":
+            continue
+        if isinstance(value, dict):
+            counts.update(_counters(value, f"{prefix}{field}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            counts[f"{prefix}{field}"] = value
+    return counts
+
+def _bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+def _object_id(value: str):
+    from bson import ObjectId
+    return ObjectId(value)
+
+
+# --- SCENARIOS ---
+def scenario_requests(fixture: Fixture) -> dict:
+    client = fixture.client
+
+    def login(i):
+        patient = fixture.patients[i % len(fixture.patients)]
+        return client.post("/api/auth/login", json={"email": patient["email"], "password": PASSWORD})
+
+    def process_scan(i):
+        return client.put(f"/api/doctor/process-scan/{fixture.pending_scan_ids[i]}", headers=fixture.doctor_headers)
+
+    def doctor_dashboard(i):
+        return client.get(f"/api/doctor/data/{fixture.doctor_name}", headers=fixture.doctor_headers)
+
+    def patient_dashboard(i):
+        patient = i % len(fixture.patients)
+        return client.get(f"/api/patient/data/{fixture.patients[patient]['fullName']}", headers=fixture.patient_headers[patient])
+
+    return {
+        "login": login,
+        "upload_scan": fixture.upload_scan,
+        "process_scan": process_scan,
+        "doctor_dashboard": doctor_dashboard,
+        "patient_dashboard": patient_dashboard
+    }
+
+async def run_scenario(request_fn, concurrency: int, requests: int) -> dict:
+    indexes = iter(range(requests))
+    timings = []
+    statuses = Counter()
+
+    async def client_loop():
+        for i in indexes:
+            start = time.perf_counter()
+            try:
+                response = await request_fn(i)
+                statuses[response.status_code] += 1
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+            timings.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    summary = latency_summary(timings, elapsed)
+    errors = sum(count for status, count in statuses.items() if not (isinstance(status, int) and status < 400))
+    return {
+        "requests": summary.pop("count"),
+        "errors": errors,
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "req_per_sec": summary.pop("per_sec"),
+        **summary
+    }
+
+
+async def run(args) -> dict:
+    # App modules are imported only now, after --mongomock has had a chance
+    # to replace the Motor client they create at import time
+    import httpx
+    from app.core.config import MODEL_PATH
+    from app.core.indexes import ensure_indexes
+    from app.core.model_registry import model_registry
+    from app.api.doctor import inference_engine, inference_executor
+    from app.main import app
+
+    model = "stand-in"
+    if not args.stand_in_model:
+        try:
+            await model_registry.load()
+            model = f"{model_registry.backend}:{model_registry.version}"
+        except (FileNotFoundError, ImportError) as e:
+            print(f"⚠️ Using the stand-in model: {e}")
+    if model == "stand-in":
+        model_registry._current = (StandInBackend(args.stand_in_ms), "stand-in")
+    await ensure_indexes()
+
+    image_path = args.image or make_synthetic_jpeg(1600, 1200)
+    with open(image_path, "rb") as f:
+        image_bytes = f.read()
+    if not args.image:
+        os.remove(image_path)
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        fixture = Fixture(client, image_bytes)
+        try:
+            await fixture.setup(args.patients, args.seed_scans)
+            requests = scenario_requests(fixture)
+            for scenario in args.scenarios:
+                for concurrency in args.concurrency:
+                    if scenario == "process_scan":
+                        await fixture.seed_pending(args.requests)
+                    result = await run_scenario(requests[scenario], concurrency, args.requests)
+                    results.append({"scenario": scenario, "concurrency": concurrency, **result})
+                    print(f"⏱️ {scenario} x{concurrency}: p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, {result['req_per_sec']} req/s, {result['errors']} error(s)")
+        finally:
+            await fixture.cleanup()
+            await inference_engine.stop()
+            inference_executor.shutdown()
+
+    return {
+        "benchmark": "api_load",
+        "timestamp": datetime.utcnow().isoformat(),
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "config": {
+            "store": "mongomock" if args.mongomock else "mongod",
+            "model": model,
+            "modelPath": MODEL_PATH,
+            "requests": args.requests,
+            "patients": args.patients,
+            "seedScans": args.seed_scans
+        },
+        "results": results
+    }
+
+def use_mongomock():
+    import mongomock.collection
+    import motor.motor_asyncio
+    from mongomock_motor import AsyncMongoMockClient
+
+    motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+    # pymongo >= 4.11 passes `sort` to bulk updates (UpdateOne in bulk_write),
+    # which mongomock's bulk builder does not accept; it is never set here
+    builder = mongomock.collection.BulkOperationBuilder
+    add_update = builder.add_update
+    if "sort" not in inspect.signature(add_update).parameters:
+        def add_update_without_sort(self, *args, sort=None, **kwargs):
+            return add_update(self, *args, **kwargs)
+        builder.add_update = add_update_without_sort
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process API load test")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario and concurrency level")
+    parser.add_argument("--patients", type=int, default=20)
+    parser.add_argument("--seed-scans", type=int, default=500, help="scans listed by the dashboard scenarios")
+    parser.add_argument("--image", help="JPEG used for uploads (default: synthetic 1600x1200 photo)")
+    parser.add_argument("--mongomock", action="store_true", help="use mongomock-motor instead of a local mongod")
+    parser.add_argument("--stand-in-model", action="store_true", help="serve a fixed-latency stand-in instead of the real model")
+    parser.add_argument("--stand-in-ms", type=float, default=20)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    args.scenarios = [name for name in args.scenarios.split(",") if name]
+    args.concurrency = [int(level) for level in args.concurrency.split(",")]
+    if args.patients < 1:
+        parser.error("--patients must be at least 1")
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    if args.mongomock:
+        use_mongomock()
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+import numpy as np
+
+
+def latency_summary(timings: list, elapsed: float = None, items_per_call: int = 1) -> dict:
+    # `timings` are per-call seconds; throughput uses the wall-clock `elapsed`
+    # when calls overlapped, otherwise the sum of the timings
+    timings_ms = np.asarray(timings) * 1000
+    elapsed = elapsed if elapsed is not None else float(np.sum(timings))
+    return {
+        "count": int(len(timings_ms)),
+        "mean_ms": round(float(np.mean(timings_ms)), 2),
+        "p50_ms": round(float(np.percentile(timings_ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(timings_ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(timings_ms, 99)), 2),
+        "per_sec": round(len(timings_ms) * items_per_call / elapsed, 1) if elapsed else None
+    }
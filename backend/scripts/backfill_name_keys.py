@@ -0,0 +1,17 @@
+# Adds the normalized `nameKey` lookup field to users created before it existed.
+#
+#   python -m scripts.backfill_name_keys
+#
+# Safe to re-run: only users without a `nameKey` are touched. The API also runs
+# this on startup, so the script is only needed to migrate ahead of a deploy.
+import asyncio
+
+from app.core.users import backfill_name_keys
+
+
+def main():
+    updated = asyncio.run(backfill_name_keys())
+    print(f"✅ Backfilled nameKey on {updated} user(s).")
+
+if __name__ == "__main__":
+    main()
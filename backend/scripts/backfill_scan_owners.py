@@ -0,0 +1,20 @@
+# Links scans stored before owner ids existed to their patient and doctor
+# accounts (`patientId`, `doctorId`, and the same fields on their stage
+# history points).
+#
+#   python -m scripts.backfill_scan_owners
+#
+# A name shared by several accounts, or by none, is linked to no one: those
+# scans stay reachable by admins only. Safe to re-run. The API also runs this
+# on startup, so the script is only needed to migrate ahead of a deploy.
+import asyncio
+
+from app.core.users import backfill_scan_owners
+
+
+def main():
+    updated = asyncio.run(backfill_scan_owners())
+    print(f"✅ Linked {updated} scan(s) to their owners.")
+
+if __name__ == "__main__":
+    main()
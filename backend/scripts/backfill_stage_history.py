@@ -0,0 +1,48 @@
+# Records a stage history point for every processed scan that has none yet
+# (scans analysed before the progression endpoints existed, or whose point
+# failed to write).
+#
+#   python -m scripts.backfill_stage_history
+#
+# Creates the time-series collection if needed. Safe to re-run.
+import argparse
+import asyncio
+
+from app.core.database import scan_collection, stage_history_collection
+from app.core.indexes import ensure_time_series
+from app.core.progression import stage_point
+
+SCAN_FIELDS = {"patientName": 1, "patientId": 1, "doctorName": 1, "doctorId": 1, "date": 1, "baldnessStage": 1, "confidence": 1, "modelVersion": 1, "finishedAt": 1}
+
+
+async def backfill(batch_size: int) -> int:
+    await ensure_time_series()
+    recorded = set(await stage_history_collection.distinct("scanId"))
+
+    inserted, batch = 0, []
+    async for scan in scan_collection.find({"status": "Processed"}, SCAN_FIELDS):
+        if str(scan["_id"]) in recorded:
+            continue
+        point = stage_point(scan, scan.get("finishedAt"))
+        if point is None:
+            continue
+        batch.append(point)
+        if len(batch) == batch_size:
+            await stage_history_collection.insert_many(batch, ordered=False)
+            inserted += len(batch)
+            batch = []
+    if batch:
+        await stage_history_collection.insert_many(batch, ordered=False)
+        inserted += len(batch)
+    return inserted
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill the stage history time series")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    inserted = asyncio.run(backfill(args.batch_size))
+    print(f"📈 Recorded {inserted} stage history point(s).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Reports the query plan MongoDB picks for each endpoint's hot query.
+#
+#   python -m scripts.explain_queries [--doctor "Dr X"] [--patient "p"] [--email a@b.c]
+#
+# Exits with status 1 if any query falls back to a collection scan, so it can
+# run in CI against a seeded database to catch index regressions.
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+
+from app.core.database import MONGO_URL, db
+from app.core.users import normalize_name
+
+
+def endpoint_queries(args):
+    year_ago = datetime.utcnow() - timedelta(days=365)
+    return [
+        ("POST /api/auth/login", "users", {"email": args.email}, None),
+        ("POST /api/auth/signup/*", "users", {"email": args.email}, None),
+        ("POST /api/auth/reset-password/{token}", "users", {"reset_token": "sample-token"}, None),
+        ("GET /api/patient/doctors", "users", {"role": "doctor", "status": "Approved"}, None),
+        ("GET /api/doctor/all-doctors", "users", {"role": "doctor"}, None),
+        ("GET /api/doctor/profile/{doctor_name}", "users", {"nameKey": normalize_name(args.doctor), "role": "doctor"}, None),
+        ("GET /api/admin/users", "users", {}, [("_id", -1)]),
+        ("GET /api/admin/users?role=doctor", "users", {"role": "doctor"}, [("_id", -1)]),
+        ("GET /api/doctor/data/{doctor_name}", "scans", {"doctorName": args.doctor, "status": "Pending"}, [("_id", -1)]),
+        ("GET /api/patient/data/{username}", "scans", {"patientName": args.patient}, [("_id", -1)]),
+        ("scan worker claim", "scans", {"status": "Pending"}, [("date", 1)]),
+        ("prediction cache lookup", "predictions", {"imageHash": "0" * 64, "modelVersion": "sample"}, None),
+        ("GET /api/patient/progression/{username}/*", "stage_history", {"meta.patientName": args.patient, "date": {"$gte": year_ago}}, None),
+        ("GET /api/doctor/progression/{doctor_name}/*", "stage_history", {"meta.doctorName": args.doctor, "date": {"$gte": year_ago}}, None),
+    ]
+
+def _stages(plan):
+    yield plan
+    for key in ("inputStage", "outerStage", "innerStage"):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+def summarize(explain: dict) -> dict:
+    winning = explain["queryPlanner"]["winningPlan"]
+    winning = winning.get("queryPlan", winning)  # SBE plans nest the classic tree
+    stages = list(_stages(winning))
+    stats = explain.get("executionStats", {})
+    return {
+        "stages": " <- ".join(stage["stage"] for stage in stages),
+        "index": next((stage["indexName"] for stage in stages if "indexName" in stage), "-"),
+        "collscan": any(stage["stage"] == "COLLSCAN" for stage in stages),
+        "keysExamined": stats.get("totalKeysExamined", 0),
+        "docsExamined": stats.get("totalDocsExamined", 0),
+        "returned": stats.get("nReturned", 0)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Explain plans for endpoint queries")
+    parser.add_argument("--doctor", default="Sample Doctor")
+    parser.add_argument("--patient", default="Sample Patient")
+    parser.add_argument("--email", default="sample@example.com")
+    args = parser.parse_args()
+
+    database = MongoClient(MONGO_URL)[db.name]
+    regressions = 0
+
+    print(f"{'endpoint':42} {'index':20} {'keys':>6} {'docs':>6} {'ret':>5}  plan")
+    for endpoint, collection, query, sort in endpoint_queries(args):
+        cursor = database[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = summarize(cursor.explain())
+        regressions += plan["collscan"]
+
+        flag = "  ❌ COLLSCAN" if plan["collscan"] else ""
+        print(f"{endpoint:42} {plan['index']:20} {plan['keysExamined']:>6} {plan['docsExamined']:>6} {plan['returned']:>5}  {plan['stages']}{flag}")
+
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
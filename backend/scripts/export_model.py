@@ -0,0 +1,109 @@
+# Exports the Keras model to a lightweight CPU runtime format.
+#
+#   python -m scripts.export_model --format tflite --quantize dynamic
+#   python -m scripts.export_model --format tflite --quantize int8 --calibration-size 200
+#   python -m scripts.export_model --format onnx
+#
+# int8 calibration uses real scans from the `scans` collection, preprocessed
+# exactly like the API does. Serve the result by pointing MODEL_PATH at it (the
+# backend is picked from the extension) or by hot-reloading it through
+# POST /api/admin/model/reload. Check it first with benchmarks.compare_backends.
+import argparse
+import os
+
+import numpy as np
+from pymongo import MongoClient
+
+from app.core.config import MODEL_PATH
+from app.core.database import MONGO_URL, db
+from app.core.derivatives import load_tensor
+from app.core.preprocessing import load_model_input
+from app.core.storage import blob_store
+
+QUANTIZATION_MODES = ["none", "dynamic", "float16", "int8"]
+
+
+def iter_scan_inputs(limit: int):
+    # Yields preprocessed model inputs for stored scans, newest first, skipping
+    # files that are missing on this machine
+    scans = MongoClient(MONGO_URL)[db.name].scans
+    cursor = scans.find({}, {"imagePath": 1, "tensorPath": 1}).sort("_id", -1)
+
+    produced = 0
+    for scan in cursor:
+        if produced >= limit:
+            break
+        tensor_path = blob_store.resolve_local_path(scan.get("tensorPath"))
+        if tensor_path and os.path.exists(tensor_path):
+            yield np.array(load_tensor(tensor_path))
+        else:
+            image_path = blob_store.resolve_local_path(scan.get("imagePath"))
+            if not (image_path and os.path.exists(image_path)):
+                continue
+            yield load_model_input(image_path)
+        produced += 1
+
+def export_tflite(model, output: str, quantize: str, calibration_size: int):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize != "none":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantize == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    if quantize == "int8":
+        samples = list(iter_scan_inputs(calibration_size))
+        if not samples:
+            raise SystemExit("❌ int8 quantization needs stored scans for calibration; none were found.")
+        print(f"📐 Calibrating on {len(samples)} stored scan(s)...")
+
+        def representative_dataset():
+            for sample in samples:
+                yield [sample[np.newaxis]]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+
+    with open(output, "wb") as f:
+        f.write(converter.convert())
+
+def export_onnx(model, output: str, quantize: str):
+    import tensorflow as tf
+    import tf2onnx
+
+    spec = (tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, output_path=output)
+
+    if quantize == "dynamic":
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(output, output, weight_type=QuantType.QInt8)
+    elif quantize != "none":
+        raise SystemExit(f"❌ ONNX export supports --quantize none or dynamic, not {quantize}.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the hair model for the TFLite/ONNX backends")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--format", choices=["tflite", "onnx"], default="tflite")
+    parser.add_argument("--quantize", choices=QUANTIZATION_MODES, default="none")
+    parser.add_argument("--calibration-size", type=int, default=200)
+    parser.add_argument("--output", help="default: next to the model, e.g. hair_model.dynamic.tflite")
+    args = parser.parse_args()
+
+    import tensorflow as tf
+
+    stem = os.path.splitext(args.model)[0]
+    suffix = "" if args.quantize == "none" else f".{args.quantize}"
+    output = args.output or f"{stem}{suffix}.{args.format}"
+
+    model = tf.keras.models.load_model(args.model)
+    if args.format == "tflite":
+        export_tflite(model, output, args.quantize, args.calibration_size)
+    else:
+        export_onnx(model, output, args.quantize)
+
+    print(f"✅ Exported {args.model} -> {output} ({os.path.getsize(output) / 1024 / 1024:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+# Deletes stored files (and their thumbnails and tensors) that no scan or user
+# references any more.
+#
+#   python -m scripts.gc_blobs
+#   python -m scripts.gc_blobs --grace-seconds 86400
+#
+# A blob becomes collectable once its reference count reaches zero and it has
+# stayed unreferenced for the grace period (BLOB_GC_GRACE_SECONDS by default).
+# Run it from cron in a quiet period.
+import argparse
+import asyncio
+
+from app.core.config import BLOB_GC_GRACE_SECONDS
+from app.core.storage import blob_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete unreferenced blobs")
+    parser.add_argument("--grace-seconds", type=float, default=BLOB_GC_GRACE_SECONDS)
+    args = parser.parse_args()
+
+    deleted = asyncio.run(blob_store.collect_garbage(args.grace_seconds))
+    print(f"🧹 Deleted {deleted} unreferenced blob(s).")
+
+if __name__ == "__main__":
+    main()
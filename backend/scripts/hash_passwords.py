@@ -0,0 +1,58 @@
+# Hashes every password still stored in plaintext, without waiting for each
+# user to log in again.
+#
+#   python -m scripts.hash_passwords
+#   python -m scripts.hash_passwords --workers 8 --dry-run
+#
+# Login already upgrades legacy records one at a time; this clears the rest in
+# one pass. Each update is conditional on the old value, so a password changed
+# while the script runs is left alone. Safe to re-run.
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import MongoClient, UpdateOne
+
+from app.core.database import MONGO_URL, db
+from app.core.security import HASH_PATTERN, hash_password
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hash legacy plaintext passwords")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--dry-run", action="store_true", help="only count the plaintext records")
+    args = parser.parse_args()
+
+    users = MongoClient(MONGO_URL)[db.name].users
+    # The same shape check login uses (security.is_hashed)
+    query = {"password": {"$type": "string", "$not": HASH_PATTERN}}
+    if args.dry_run:
+        print(f"🔎 {users.count_documents(query)} user(s) still have a plaintext password.")
+        return
+
+    updated = 0
+    # scrypt releases the GIL, so threads hash in parallel
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        cursor = users.find(query, {"password": 1}).batch_size(args.batch_size)
+        batch = []
+        for user in cursor:
+            batch.append(user)
+            if len(batch) == args.batch_size:
+                updated += hash_batch(users, pool, batch)
+                batch = []
+        if batch:
+            updated += hash_batch(users, pool, batch)
+
+    print(f"✅ Hashed {updated} password(s).")
+
+def hash_batch(users, pool, batch: list) -> int:
+    hashes = pool.map(hash_password, [user["password"] for user in batch])
+    operations = [
+        UpdateOne({"_id": user["_id"], "password": user["password"]}, {"$set": {"password": new_hash}})
+        for user, new_hash in zip(batch, hashes)
+    ]
+    return users.bulk_write(operations, ordered=False).modified_count
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# Moves files uploaded before the blob store (UPLOAD_ROOT, served from /static)
+# into it and repoints the scans and users that reference them.
+#
+#   python -m scripts.migrate_uploads --dry-run
+#   python -m scripts.migrate_uploads
+#   python -m scripts.migrate_uploads --delete-legacy
+#
+# Duplicates collapse into one blob with one reference per document. Scan
+# thumbnails and tensors are regenerated next to each blob (once per distinct
+# image). Documents whose file is missing are reported and left as they are.
+# Legacy files are only removed with --delete-legacy. Safe to re-run.
+import argparse
+import asyncio
+import os
+import shutil
+
+from app.core.database import scan_collection, user_collection
+from app.core.derivatives import create_scan_derivatives, derivative_paths
+from app.core.hashing import hash_file
+from app.core.storage import blob_store
+from app.core.uploads import sniff_file_type
+
+LEGACY_PREFIX = "/static/"
+USER_FIELDS = ("degree_path", "profileImage")
+
+
+async def store_legacy_file(url: str):
+    # Returns the upload-like blob dict, or None when the file is missing
+    path = url.lstrip("/")
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "rb") as f:
+        head = f.read(16)
+    content_type, extension = sniff_file_type(head)
+    if content_type is None:
+        return None
+
+    tmp_path = blob_store.incoming_path()
+    shutil.copyfile(path, tmp_path)
+    content_hash = hash_file(tmp_path)
+    blob = await blob_store.store(tmp_path, content_hash, extension, content_type, os.path.getsize(tmp_path))
+    return {**blob, "hash": content_hash}
+
+def remove_legacy(urls: list):
+    for url in urls:
+        path = (url or "").lstrip("/")
+        if url and url.startswith(LEGACY_PREFIX) and os.path.exists(path):
+            os.remove(path)
+
+async def migrate_scans(dry_run: bool, delete_legacy: bool):
+    migrated = missing = 0
+    async for scan in scan_collection.find({"imagePath": {"$regex": f"^{LEGACY_PREFIX}"}}, {"imagePath": 1}):
+        if dry_run:
+            migrated += 1
+            continue
+        upload = await store_legacy_file(scan["imagePath"])
+        if upload is None:
+            print(f"⚠️ Scan {scan['_id']}: file missing or unreadable: {scan['imagePath']}")
+            missing += 1
+            continue
+        try:
+            derivatives = await create_scan_derivatives(upload)
+        except Exception as e:
+            # create_scan_derivatives already released the reference
+            print(f"⚠️ Scan {scan['_id']}: {getattr(e, 'detail', e)}")
+            missing += 1
+            continue
+
+        await scan_collection.update_one({"_id": scan["_id"]}, {"$set": {"imagePath": upload["url"], **derivatives}})
+        if delete_legacy:
+            remove_legacy([scan["imagePath"], *derivative_paths(scan["imagePath"]).values()])
+        migrated += 1
+    return migrated, missing
+
+async def migrate_users(dry_run: bool, delete_legacy: bool):
+    migrated = missing = 0
+    query = {"$or": [{field: {"$regex": f"^{LEGACY_PREFIX}"}} for field in USER_FIELDS]}
+    async for user in user_collection.find(query, {field: 1 for field in USER_FIELDS}):
+        for field in USER_FIELDS:
+            url = user.get(field)
+            if not (url and url.startswith(LEGACY_PREFIX)):
+                continue
+            if dry_run:
+                migrated += 1
+                continue
+            upload = await store_legacy_file(url)
+            if upload is None:
+                print(f"⚠️ User {user['_id']}: {field} missing or unreadable: {url}")
+                missing += 1
+                continue
+            update = {field: upload["url"]}
+            if field == "profileImage":
+                # The reference taken here is the one the profile holds
+                update["profileImageRef"] = upload["url"]
+            await user_collection.update_one({"_id": user["_id"]}, {"$set": update})
+            if delete_legacy:
+                remove_legacy([url])
+            migrated += 1
+    return migrated, missing
+
+async def migrate(dry_run: bool, delete_legacy: bool):
+    scans = await migrate_scans(dry_run, delete_legacy)
+    users = await migrate_users(dry_run, delete_legacy)
+    return scans, users
+
+def main():
+    parser = argparse.ArgumentParser(description="Move legacy uploads into the blob store")
+    parser.add_argument("--dry-run", action="store_true", help="only count the legacy files")
+    parser.add_argument("--delete-legacy", action="store_true", help="remove each legacy file once migrated")
+    args = parser.parse_args()
+
+    (scans, scans_missing), (files, files_missing) = asyncio.run(migrate(args.dry_run, args.delete_legacy))
+    verb = "Would migrate" if args.dry_run else "Migrated"
+    print(f"✅ {verb} {scans} scan image(s) and {files} user file(s); {scans_missing + files_missing} skipped.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+# Recomputes the dashboard counters in `dashboard_stats` from the scans and
+# users collections with $merge pipelines.
+#
+#   python -m scripts.rebuild_dashboard_stats
+#
+# The API keeps the counters up to date on its own and builds them on first
+# start; run this after editing scans or users outside the API. Counter updates
+# made while it runs can be lost, so run it in a quiet period.
+import asyncio
+
+from app.core.dashboard_stats import rebuild_dashboard_stats
+
+
+def main():
+    asyncio.run(rebuild_dashboard_stats())
+    print("✅ Dashboard statistics rebuilt.")
+
+if __name__ == "__main__":
+    main()
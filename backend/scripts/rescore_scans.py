@@ -0,0 +1,213 @@
+# Re-scores the stored scan archive with a (re)trained model, outside the API.
+#
+#   python -m scripts.rescore_scans
+#   python -m scripts.rescore_scans --model ai_model/hair_model.v2.tflite --workers 6
+#   python -m scripts.rescore_scans --doctor "Dr Smith" --limit 1000 --dry-run
+#
+# Scans are streamed from Mongo in _id order and decoded in a process pool that
+# keeps --prefetch batches ahead of the model (the memory-mapped tensors saved
+# at upload time are used when present; files come through the blob store).
+# Each batch is one forward pass and one bulk_write, which also warms the
+# API's prediction cache for the new version and adds a stage history point
+# per scan. Heatmaps are not drawn here.
+# The last finished _id is checkpointed after every batch, so an interrupted run
+# picks up where it stopped; scans already carrying the model version are
+# skipped either way. The dashboard stage counters are rebuilt at the end.
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+from multiprocessing import Pool
+
+import numpy as np
+from bson import ObjectId
+from pymongo import MongoClient, UpdateOne
+
+from app.core.config import MODEL_PATH, MODEL_BACKEND
+from app.core.dashboard_stats import rebuild_dashboard_stats
+from app.core.database import MONGO_URL, db
+from app.core.derivatives import load_tensor
+from app.core.inference import format_prediction
+from app.core.model_backends import load_backend
+from app.core.model_registry import model_version_for
+from app.core.preprocessing import MODEL_INPUT_SHAPE, load_model_input
+from app.core.progression import stage_point
+from app.core.storage import blob_store
+
+SCAN_FIELDS = {"imagePath": 1, "tensorPath": 1, "imageHash": 1, "patientName": 1, "patientId": 1, "doctorName": 1, "doctorId": 1, "date": 1}
+
+
+# --- DECODING (pool workers) ---
+def decode_batch(scans: list):
+    # Returns the stacked model inputs, the scans they belong to, and the scans
+    # whose files could not be read
+    inputs = np.empty((len(scans),) + MODEL_INPUT_SHAPE, dtype=np.float32)
+    decoded, failed = [], []
+    for scan in scans:
+        try:
+            # The original is only fetched when the stored tensor is missing
+            tensor_path = blob_store.resolve_local_path(scan.get("tensorPath"))
+            if tensor_path and os.path.exists(tensor_path):
+                inputs[len(decoded)] = load_tensor(tensor_path)
+            else:
+                load_model_input(blob_store.resolve_local_path(scan.get("imagePath")), out=inputs[len(decoded)])
+            decoded.append(scan)
+        except Exception as e:
+            failed.append((scan["_id"], str(e)))
+    return inputs[:len(decoded)], decoded, failed
+
+
+# --- CHECKPOINTS ---
+def load_checkpoint(path: str, model_version: str) -> dict:
+    if os.path.exists(path):
+        with open(path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("modelVersion") == model_version:
+            return checkpoint
+    return {"modelVersion": model_version, "lastId": None, "processed": 0, "failed": 0}
+
+def save_checkpoint(path: str, checkpoint: dict):
+    tmp_path = f"{path}.part"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+# --- ARCHIVE STREAMING ---
+def iter_scan_batches(scans, query: dict, batch_size: int, limit: int):
+    cursor = scans.find(query, SCAN_FIELDS).sort("_id", 1).batch_size(batch_size * 4)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    batch = []
+    for scan in cursor:
+        batch.append(scan)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def write_results(database, decoded: list, predictions: np.ndarray, model_version: str):
+    now = datetime.utcnow()
+    scan_updates, cache_updates, history_points = [], [], []
+    for scan, row in zip(decoded, predictions):
+        result = format_prediction(row, model_version)
+        history_points.append(stage_point({**scan, **result}, now))
+        scan_updates.append(UpdateOne(
+            {"_id": scan["_id"]},
+            {
+                "$set": {
+                    "baldnessStage": result["baldnessStage"], "confidence": result["confidence"],
+                    "topStages": result["topStages"], "probabilities": result["probabilities"],
+                    "modelVersion": model_version, "rescoredAt": now
+                },
+                # Overlays belong to the previous model; the next explained analysis redraws them
+                "$unset": {"heatmapPath": ""}
+            }
+        ))
+        if scan.get("imageHash"):
+            cache_updates.append(UpdateOne(
+                {"imageHash": scan["imageHash"], "modelVersion": model_version},
+                {"$set": {"result": result, "createdAt": now}},
+                upsert=True
+            ))
+
+    if scan_updates:
+        database.scans.bulk_write(scan_updates, ordered=False)
+    if cache_updates:
+        database.predictions.bulk_write(cache_updates, ordered=False)
+    history_points = [point for point in history_points if point]
+    if history_points:
+        database.stage_history.insert_many(history_points, ordered=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score stored scans with the current model")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--backend", default=MODEL_BACKEND)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--prefetch", type=int, help="decoded batches kept ahead of the model (default: 2 per worker)")
+    parser.add_argument("--doctor", help="only re-score this doctor's scans")
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--checkpoint", help="default: rescore-<modelVersion>.json")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="predict but do not write results")
+    args = parser.parse_args()
+    prefetch = args.prefetch or args.workers * 2
+
+    if not os.path.exists(args.model):
+        raise SystemExit(f"❌ AI Model file not found at: {args.model}")
+
+    model_version = model_version_for(args.model)
+    checkpoint_path = args.checkpoint or f"rescore-{model_version}.json"
+    checkpoint = load_checkpoint(checkpoint_path, model_version)
+    if args.restart:
+        checkpoint.update(lastId=None, processed=0, failed=0)
+
+    query = {"status": "Processed", "modelVersion": {"$ne": model_version}}
+    if args.doctor:
+        query["doctorName"] = args.doctor
+    if checkpoint["lastId"]:
+        query["_id"] = {"$gt": ObjectId(checkpoint["lastId"])}
+        print(f"↩️ Resuming after {checkpoint['lastId']} ({checkpoint['processed']} scan(s) already done)")
+
+    # The pool is forked before the Mongo client and the model runtime exist,
+    # so workers inherit neither sockets nor threads
+    with Pool(args.workers) as pool:
+        database = MongoClient(MONGO_URL)[db.name]
+        backend = load_backend(args.model, args.backend)
+        print(f"🧠 Re-scoring with {backend.name} model version {model_version} ({args.workers} decode worker(s))")
+
+        batches = iter_scan_batches(database.scans, query, args.batch_size, args.limit)
+        in_flight = deque()
+
+        def fill():
+            while len(in_flight) < prefetch:
+                batch = next(batches, None)
+                if batch is None:
+                    return
+                in_flight.append((batch[-1]["_id"], pool.apply_async(decode_batch, (batch,))))
+
+        started = time.perf_counter()
+        processed = failed = 0
+        fill()
+        while in_flight:
+            last_id, pending = in_flight.popleft()
+            inputs, decoded, skipped = pending.get()
+            fill()
+
+            if len(inputs):
+                predictions = backend.predict(inputs)
+                if not args.dry_run:
+                    write_results(database, decoded, predictions, model_version)
+            for scan_id, error in skipped:
+                print(f"⚠️ Skipped scan {scan_id}: {error}")
+
+            processed += len(decoded)
+            failed += len(skipped)
+            if not args.dry_run:
+                checkpoint.update(
+                    lastId=str(last_id),
+                    processed=checkpoint["processed"] + len(decoded),
+                    failed=checkpoint["failed"] + len(skipped)
+                )
+                save_checkpoint(checkpoint_path, checkpoint)
+
+            elapsed = time.perf_counter() - started
+            print(f"⏱️ {processed} scan(s) re-scored, {failed} skipped, {processed / elapsed:.1f} images/sec")
+
+    elapsed = time.perf_counter() - started
+    rate = processed / elapsed if elapsed else 0.0
+    print(f"✅ Re-scored {processed} scan(s) in {elapsed:.1f}s ({rate:.1f} images/sec), {failed} skipped.")
+
+    if processed and not args.dry_run:
+        asyncio.run(rebuild_dashboard_stats())
+        print("📊 Dashboard statistics rebuilt.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# Runs the API in the multi-worker deployment mode: one inference service
+# loads the model, and N uvicorn workers started with INFERENCE_MODE=remote
+# hand it their tensors through shared memory. The workers never import a
+# model runtime, so adding one costs an API process, not a model copy.
+#
+#   python -m scripts.serve --workers 4
+#   python -m scripts.serve --workers 8 --host 0.0.0.0 --port 8000
+#   python -m scripts.serve --inference-only     # the model service alone (e.g. its own systemd unit)
+#
+# The service listens on INFERENCE_SOCKET and loads MODEL_PATH in the
+# background; /health/ready on the API reports when it is serving.
+# Ctrl+C or SIGTERM stops both, as does either one exiting.
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from app.core.config import INFERENCE_SOCKET
+
+STARTUP_TIMEOUT_SECONDS = 30
+
+
+async def run_inference_service(socket_path: str):
+    from app.core.inference_remote import serve
+
+    task = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, task.cancel)
+    try:
+        await serve(socket_path)
+    except asyncio.CancelledError:
+        print("🛑 Inference service stopped.")
+
+def wait_for_service(socket_path: str, process: subprocess.Popen):
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while True:
+        if process.poll() is not None:
+            raise SystemExit("❌ The inference service exited during startup.")
+        try:
+            with socket.socket(socket.AF_UNIX) as probe:
+                probe.connect(socket_path)
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise SystemExit(f"❌ The inference service did not open {socket_path} in time.")
+            time.sleep(0.1)
+
+def stop(process: subprocess.Popen):
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API with a shared inference service")
+    parser.add_argument("--workers", type=int, default=4, help="uvicorn API worker processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--socket", default=INFERENCE_SOCKET)
+    parser.add_argument("--inference-only", action="store_true", help="run only the inference service")
+    args = parser.parse_args()
+
+    if args.inference_only:
+        asyncio.run(run_inference_service(args.socket))
+        return
+
+    env = {**os.environ, "INFERENCE_SOCKET": args.socket}
+    service = api = None
+    # SIGTERM ends the supervising loop the same way Ctrl+C does
+    signal.signal(signal.SIGTERM, lambda *_: (_ for _ in ()).throw(KeyboardInterrupt))
+    try:
+        service = subprocess.Popen([sys.executable, "-m", "scripts.serve", "--inference-only", "--socket", args.socket], env=env)
+        wait_for_service(args.socket, service)
+        api = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--host", args.host, "--port", str(args.port), "--workers", str(args.workers)],
+            env={**env, "INFERENCE_MODE": "remote"}
+        )
+        print(f"🚀 {args.workers} API worker(s) on http://{args.host}:{args.port}, inference service on {args.socket}")
+        while service.poll() is None and api.poll() is None:
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop(api)
+        stop(service)
+
+if __name__ == "__main__":
+    main()
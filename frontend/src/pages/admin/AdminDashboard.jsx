@@ -1,12 +1,18 @@
 import React, { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
 import axios from "axios";
+import { endSession } from "../../session";
 import Swal from "sweetalert2";
 import styles from "./AdminDashboard.module.css";
 
+const USERS_URL = "http://localhost:8000/api/admin/users";
+
 export default function AdminDashboard() {
   const navigate = useNavigate();
   const [users, setUsers] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [summary, setSummary] = useState(null);
   const [activeTab, setActiveTab] = useState("doctors");
   const [loading, setLoading] = useState(true);
 
@@ -17,21 +23,44 @@ export default function AdminDashboard() {
       return;
     }
     fetchUsers();
-  }, [navigate]);
+  }, [navigate, activeTab]);
+
+  // Each tab lists one role, a page at a time; the cursor for the next page
+  // comes back in the X-Next-Cursor header
+  const tabRole = activeTab === "doctors" ? "doctor" : "patient";
 
   const fetchUsers = async () => {
     setLoading(true);
     try {
-      const response = await axios.get("http://localhost:8000/api/admin/users");
+      const [response, summaryRes] = await Promise.all([
+        axios.get(USERS_URL, { params: { role: tabRole } }),
+        axios.get("http://localhost:8000/api/admin/summary"),
+      ]);
       setUsers(Array.isArray(response.data) ? response.data : []);
+      setNextCursor(response.headers["x-next-cursor"] || null);
+      setSummary(summaryRes.data);
     } catch (error) {
       console.error("Fetch error:", error);
       setUsers([]);
+      setNextCursor(null);
     } finally {
       setLoading(false);
     }
   };
 
+  const loadMoreUsers = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await axios.get(USERS_URL, { params: { role: tabRole, after: nextCursor } });
+      setUsers((prev) => [...prev, ...(Array.isArray(response.data) ? response.data : [])]);
+      setNextCursor(response.headers["x-next-cursor"] || null);
+    } catch (error) {
+      console.error("Fetch error:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleAction = async (userId, action, status = null) => {
     const confirmText =
       action === "delete" ? "Delete this user?" : `Verify this doctor?`;
@@ -58,17 +87,25 @@ export default function AdminDashboard() {
     }
   };
 
-  const handleLogout = () => {
-    localStorage.clear();
+  const handleLogout = async () => {
+    await endSession();
     navigate("/", { replace: true });
   };
 
-  const stats = {
-    total: users.length,
-    patients: users.filter((u) => u.role === "patient").length,
-    pending: users.filter((u) => u.role === "doctor" && u.status === "Pending").length,
-    verified: users.filter((u) => u.role === "doctor" && u.status === "Approved").length,
-  };
+  // Counts come from the server-side summary; the user list may be paginated
+  const stats = summary
+    ? {
+        total: summary.users,
+        patients: summary.usersByRole.patient || 0,
+        pending: summary.doctorsByStatus.Pending || 0,
+        verified: summary.doctorsByStatus.Approved || 0,
+      }
+    : {
+        total: users.length,
+        patients: users.filter((u) => u.role === "patient").length,
+        pending: users.filter((u) => u.role === "doctor" && u.status === "Pending").length,
+        verified: users.filter((u) => u.role === "doctor" && u.status === "Approved").length,
+      };
 
   const filteredUsers = users.filter(
     (user) => user && (activeTab === "doctors" ? user.role === "doctor" : user.role === "patient")
@@ -217,6 +254,11 @@ export default function AdminDashboard() {
                   )}
                 </tbody>
               </table>
+              {nextCursor && (
+                <button onClick={loadMoreUsers} disabled={loadingMore} className={styles.loadMoreBtn}>
+                  {loadingMore ? "Loading..." : "Load More"}
+                </button>
+              )}
             </section>
           </>
         )}
@@ -1,6 +1,7 @@
 import React, { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
+import { saveSession } from '../../session';
 import Swal from 'sweetalert2';
 import styles from './AdminLogin.module.css'; 
 
@@ -23,8 +24,7 @@ export default function AdminLogin() {
       const { role, fullName } = response.data;
 
       if (role === 'admin') {
-        localStorage.setItem('userRole', role);
-        localStorage.setItem('userName', fullName);
+        saveSession(response.data);
         
         Swal.fire({
           icon: 'success',
@@ -1,6 +1,7 @@
 import React, { useState } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import axios from 'axios';
+import { saveSession } from '../../session';
 import Swal from 'sweetalert2'; 
 import styles from './Login.module.css';
 
@@ -21,7 +22,7 @@ export default function Login() {
         password
       });
 
-      const { role: userRole, fullName } = response.data;
+      const { role: userRole } = response.data;
 
       if (userRole !== role && userRole !== 'admin') {
         setLoading(false);
@@ -33,8 +34,7 @@ export default function Login() {
         });
       }
 
-      localStorage.setItem('userRole', userRole);
-      localStorage.setItem('userName', fullName);
+      saveSession(response.data);
 
       if (userRole === 'admin') navigate('/admin-dashboard', { replace: true });
       else if (userRole === 'doctor') navigate('/doctor-dashboard', { replace: true });
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
 import axios from "axios";
+import { endSession } from "../../session";
 import Swal from "sweetalert2";
 import { jsPDF } from "jspdf";
 import autoTable from "jspdf-autotable";
@@ -23,6 +24,10 @@ export default function DoctorDashboard() {
   const [isProcessing, setIsProcessing] = useState(false);
   const [portalReports, setPortalReports] = useState([]);
   const [directReports, setDirectReports] = useState([]);
+  const [nextScansCursor, setNextScansCursor] = useState(null);
+  const [nextReportsCursor, setNextReportsCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(null);
+  const [summary, setSummary] = useState(null);
   const [showProfile, setShowProfile] = useState(false);
 
   const [profileImage, setProfileImage] = useState("");
@@ -48,24 +53,57 @@ export default function DoctorDashboard() {
     setLoading(true);
 
     try {
-      const res = await axios.get(
-        `http://localhost:8000/api/doctor/data/${localStorage.getItem("userName")}`,
-      );
+      const [res, summaryRes] = await Promise.all([
+        axios.get(
+          `http://localhost:8000/api/doctor/data/${localStorage.getItem("userName")}`,
+        ),
+        axios.get(
+          `http://localhost:8000/api/doctor/summary/${localStorage.getItem("userName")}`,
+        ),
+      ]);
+      setSummary(summaryRes.data);
       const allReports = res.data.reports || [];
 
-      setPortalReports(allReports.filter((r) => r.doctorId !== "Direct"));
+      setPortalReports(allReports.filter((r) => !r.isDirectAnalysis));
 
-      setDirectReports(allReports.filter((r) => r.doctorId === "Direct"));
+      setDirectReports(allReports.filter((r) => r.isDirectAnalysis));
 
       setReports(allReports);
       setScans(res.data.scans || []);
       setReports(res.data.reports || []);
+      setNextScansCursor(res.data.nextScansCursor || null);
+      setNextReportsCursor(res.data.nextReportsCursor || null);
     } catch (err) {
       console.error("Sync error:", err);
     } finally {
       setLoading(false);
     }
   };
+
+  // Pending scans and reports are paged separately, each after its own cursor
+  const loadMore = async (kind) => {
+    setLoadingMore(kind);
+    try {
+      const res = await axios.get(
+        `http://localhost:8000/api/doctor/data/${localStorage.getItem("userName")}`,
+        { params: kind === "scans" ? { scansAfter: nextScansCursor } : { reportsAfter: nextReportsCursor } },
+      );
+      if (kind === "scans") {
+        setScans((prev) => [...prev, ...(res.data.scans || [])]);
+        setNextScansCursor(res.data.nextScansCursor || null);
+      } else {
+        const more = res.data.reports || [];
+        setReports((prev) => [...prev, ...more]);
+        setPortalReports((prev) => [...prev, ...more.filter((r) => !r.isDirectAnalysis)]);
+        setDirectReports((prev) => [...prev, ...more.filter((r) => r.isDirectAnalysis)]);
+        setNextReportsCursor(res.data.nextReportsCursor || null);
+      }
+    } catch (err) {
+      console.error("Sync error:", err);
+    } finally {
+      setLoadingMore(null);
+    }
+  };
   const fetchProfile = async () => {
     try {
       const res = await axios.get(
@@ -107,6 +145,10 @@ export default function DoctorDashboard() {
           ["Patient Name", data.patientName],
           ["Assigned Doctor", `Dr. ${doctorName}`],
           ["AI Analysis Result", data.baldnessStage],
+          ...(data.topStages || []).map((t, i) => [
+            i === 0 ? "Stage Confidences" : "",
+            `${t.stage}: ${Math.round(t.confidence * 100)}%`,
+          ]),
           ["Clinical Status", "Verified & Processed"],
           [
             "Report Date",
@@ -256,9 +298,8 @@ export default function DoctorDashboard() {
     }
   };
 
-  const handleLogout = () => {
-    localStorage.clear();
-
+  const handleLogout = async () => {
+    await endSession();
     navigate("/", { replace: true });
   };
 
@@ -436,19 +477,27 @@ export default function DoctorDashboard() {
           <div className={`${styles.statsCard} ${styles.cardBlue}`}>
             <p className={styles.cardLabel}>Online Patients</p>
 
-            <h1 className={styles.cardValue}>{portalReports.length}</h1>
+            <h1 className={styles.cardValue}>
+              {summary
+                ? (summary.byStatus.Processed || 0) - summary.direct
+                : portalReports.length}
+            </h1>
           </div>
 
           <div className={`${styles.statsCard} ${styles.cardGreen}`}>
             <p className={styles.cardLabel}>Direct Analysis</p>
 
-            <h1 className={styles.cardValue}>{directReports.length}</h1>
+            <h1 className={styles.cardValue}>
+              {summary ? summary.direct : directReports.length}
+            </h1>
           </div>
 
           <div className={`${styles.statsCard} ${styles.cardDark}`}>
             <p className={styles.cardLabel}>Total Reports</p>
 
-            <h1 className={styles.cardValue}>{reports.length}</h1>
+            <h1 className={styles.cardValue}>
+              {summary ? summary.byStatus.Processed || 0 : reports.length}
+            </h1>
           </div>
         </div>
 
@@ -514,6 +563,15 @@ export default function DoctorDashboard() {
                   No pending scans at the moment.
                 </div>
               )}
+              {!loading && nextScansCursor && (
+                <button
+                  onClick={() => loadMore("scans")}
+                  disabled={loadingMore === "scans"}
+                  className={styles.loadMoreBtn}
+                >
+                  {loadingMore === "scans" ? "Loading..." : "Load More"}
+                </button>
+              )}
             </section>
 
             {/* PATIENT PORTAL REPORTS */}
@@ -525,7 +583,7 @@ export default function DoctorDashboard() {
                 📄 Generated Clinical Reports
               </h2>
 
-              {reports.filter((r) => r.doctorId !== "Direct").length > 0 ? (
+              {reports.filter((r) => !r.isDirectAnalysis).length > 0 ? (
                 <div className={styles.tableResponsive}>
                   <table className={styles.userTable}>
                     <thead>
@@ -539,7 +597,7 @@ export default function DoctorDashboard() {
 
                     <tbody>
                       {reports
-                        .filter((r) => r.doctorId !== "Direct")
+                        .filter((r) => !r.isDirectAnalysis)
                         .map((r, i) => (
                           <tr key={i}>
                             <td>{r.patientName}</td>
@@ -554,6 +612,21 @@ export default function DoctorDashboard() {
                               <span className={styles.statusBadge}>
                                 {r.baldnessStage}
                               </span>
+                              {r.confidence != null && (
+                                <span title={(r.topStages || []).map((t) => `${t.stage}: ${Math.round(t.confidence * 100)}%`).join("\n")}>
+                                  {" "}{Math.round(r.confidence * 100)}%
+                                </span>
+                              )}
+                              {r.heatmapPath && (
+                                <a
+                                  href={`http://localhost:8000${r.heatmapPath}`}
+                                  target="_blank"
+                                  rel="noreferrer"
+                                  className={styles.reviewLink}
+                                >
+                                  {" "}Heatmap ↗
+                                </a>
+                              )}
                             </td>
 
                             <td>
@@ -574,6 +647,15 @@ export default function DoctorDashboard() {
                   No reports generated yet.
                 </div>
               )}
+              {!loading && nextReportsCursor && (
+                <button
+                  onClick={() => loadMore("reports")}
+                  disabled={loadingMore === "reports"}
+                  className={styles.loadMoreBtn}
+                >
+                  {loadingMore === "reports" ? "Loading..." : "Load More"}
+                </button>
+              )}
             </section>
           </div>
         ) : (
@@ -647,7 +729,7 @@ export default function DoctorDashboard() {
                 ⚡ Direct Analysis History
               </h2>
 
-              {reports.filter((r) => r.doctorId === "Direct").length > 0 ? (
+              {reports.filter((r) => r.isDirectAnalysis).length > 0 ? (
                 <div className={styles.tableResponsive}>
                   <table className={styles.userTable}>
                     <thead>
@@ -661,7 +743,7 @@ export default function DoctorDashboard() {
 
                     <tbody>
                       {reports
-                        .filter((r) => r.doctorId === "Direct")
+                        .filter((r) => r.isDirectAnalysis)
                         .map((r, i) => (
                           <tr key={i}>
                             <td>{r.patientName}</td>
@@ -676,6 +758,21 @@ export default function DoctorDashboard() {
                               <span className={styles.statusBadge}>
                                 {r.baldnessStage}
                               </span>
+                              {r.confidence != null && (
+                                <span title={(r.topStages || []).map((t) => `${t.stage}: ${Math.round(t.confidence * 100)}%`).join("\n")}>
+                                  {" "}{Math.round(r.confidence * 100)}%
+                                </span>
+                              )}
+                              {r.heatmapPath && (
+                                <a
+                                  href={`http://localhost:8000${r.heatmapPath}`}
+                                  target="_blank"
+                                  rel="noreferrer"
+                                  className={styles.reviewLink}
+                                >
+                                  {" "}Heatmap ↗
+                                </a>
+                              )}
                             </td>
 
                             <td>
@@ -696,6 +793,15 @@ export default function DoctorDashboard() {
                   No direct analysis history.
                 </div>
               )}
+              {!loading && nextReportsCursor && (
+                <button
+                  onClick={() => loadMore("reports")}
+                  disabled={loadingMore === "reports"}
+                  className={styles.loadMoreBtn}
+                >
+                  {loadingMore === "reports" ? "Loading..." : "Load More"}
+                </button>
+              )}
             </section>
           </div>
         )}
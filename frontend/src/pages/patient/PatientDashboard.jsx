@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
 import axios from "axios";
+import { endSession } from "../../session";
 import Swal from "sweetalert2";
 import { jsPDF } from "jspdf";
 import autoTable from "jspdf-autotable";
@@ -17,6 +18,8 @@ export default function PatientDashboard() {
   const [dataLoading, setDataLoading] = useState(true);
   const [myScans, setMyScans] = useState([]);
   const [myReports, setMyReports] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     if (!userName) {
@@ -35,6 +38,7 @@ export default function PatientDashboard() {
       const dataRes = await axios.get(`http://localhost:8000/api/patient/data/${userName}`);
       setMyScans(dataRes.data.scans || []);
       setMyReports(dataRes.data.reports || []);
+      setNextCursor(dataRes.data.nextCursor || null);
     } catch (err) {
       console.error(err);
     } finally {
@@ -42,6 +46,23 @@ export default function PatientDashboard() {
     }
   };
 
+  // Older scans come a page at a time, after the cursor of the last page
+  const loadMoreScans = async () => {
+    setLoadingMore(true);
+    try {
+      const dataRes = await axios.get(`http://localhost:8000/api/patient/data/${userName}`, {
+        params: { after: nextCursor },
+      });
+      setMyScans((prev) => [...prev, ...(dataRes.data.scans || [])]);
+      setMyReports((prev) => [...prev, ...(dataRes.data.reports || [])]);
+      setNextCursor(dataRes.data.nextCursor || null);
+    } catch (err) {
+      console.error(err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const downloadPDF = (report) => {
     try {
       const doc = new jsPDF();
@@ -105,8 +126,8 @@ export default function PatientDashboard() {
     }
   };
 
-  const handleLogout = () => {
-    localStorage.clear();
+  const handleLogout = async () => {
+    await endSession();
     navigate("/login", { replace: true });
   };
 
@@ -281,7 +302,7 @@ export default function PatientDashboard() {
               {myScans.map((s, idx) => (
                 <div key={idx} className={styles.scanCard}>
                   <img
-                    src={`http://localhost:8000${s.imagePath}`}
+                    src={`http://localhost:8000${s.thumbnailPath || s.imagePath}`}
                     alt="Scan"
                     className={styles.scanImage}
                   />
@@ -305,6 +326,11 @@ export default function PatientDashboard() {
           ) : (
             <div className={styles.emptyGallery}>No scans uploaded yet.</div>
           )}
+          {!dataLoading && nextCursor && (
+            <button onClick={loadMoreScans} disabled={loadingMore} className={styles.loadMoreBtn}>
+              {loadingMore ? "Loading..." : "Load More"}
+            </button>
+          )}
         </section>
       </main>
     </div>
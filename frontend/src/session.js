@@ -0,0 +1,67 @@
+import axios from "axios";
+
+const API_URL = "http://localhost:8000";
+// Renew the access token when it has less than this long to live
+const REFRESH_MARGIN_SECONDS = 300;
+
+let refreshing = null;
+
+// --- Session storage ---
+export function saveSession({ role, fullName, accessToken, expiresAt }) {
+  localStorage.setItem("userRole", role);
+  localStorage.setItem("userName", fullName);
+  localStorage.setItem("accessToken", accessToken);
+  localStorage.setItem("tokenExpiresAt", String(expiresAt));
+}
+
+export async function endSession() {
+  const token = localStorage.getItem("accessToken");
+  localStorage.clear();
+  if (token) {
+    // Revokes the token server-side; the local session is gone either way
+    await axios
+      .post(`${API_URL}/api/auth/logout`, null, { headers: { Authorization: `Bearer ${token}` }, skipSession: true })
+      .catch(() => {});
+  }
+}
+
+async function refreshSession(token) {
+  const res = await axios.post(`${API_URL}/api/auth/refresh`, null, {
+    headers: { Authorization: `Bearer ${token}` },
+    skipSession: true,
+  });
+  saveSession(res.data);
+  return res.data.accessToken;
+}
+
+// --- Axios interceptors ---
+// Every API call carries the bearer token; an expiring token is renewed first,
+// and a rejected one sends the user back to the login page.
+axios.interceptors.request.use(async (config) => {
+  // Login, signup and password reset never carry a session
+  if (config.skipSession || !config.url?.startsWith(API_URL) || config.url.includes("/api/auth/")) return config;
+
+  let token = localStorage.getItem("accessToken");
+  if (!token) return config;
+
+  const expiresAt = Number(localStorage.getItem("tokenExpiresAt") || 0);
+  if (expiresAt - Date.now() / 1000 < REFRESH_MARGIN_SECONDS) {
+    refreshing = refreshing || refreshSession(token).finally(() => (refreshing = null));
+    token = await refreshing.catch(() => token);
+  }
+
+  config.headers.Authorization = `Bearer ${token}`;
+  return config;
+});
+
+axios.interceptors.response.use(
+  (response) => response,
+  (error) => {
+    const config = error.config || {};
+    if (error.response?.status === 401 && !config.skipSession && config.headers?.Authorization) {
+      localStorage.clear();
+      window.location.assign("/login");
+    }
+    return Promise.reject(error);
+  }
+);